@@ -0,0 +1,138 @@
+"""
+Code paths timed by the benchmarks.
+
+Each case prepares its inputs outside of the timed section and returns the function to time. Cases which scale badly with the number of games have a maximum fixture size so that a full run finishes in a reasonable time.
+"""
+
+from prediction.history import get_game
+from typing import Callable, NamedTuple
+
+import benchmarks.fixtures as fixtures
+import data.repository as re
+import data.sync as sync
+import prediction.assignments as assignments
+import prediction.engines as engines
+import prediction.pmodel.pmodel as pmodel
+import stats.data as stats
+
+
+# Number of games (from the start of the fixture) used by the prediction cases
+PREDICTION_GAMES = 20
+
+
+class Case(NamedTuple):
+    name: str
+    # Receives the fixture folder (while the repository points at it) and returns the function to time
+    prepare: Callable[[str], Callable[[], object]]
+    # Largest fixture (in games) on which the case runs by default
+    max_games: int | None = None
+    # Whether the case needs the fixture spreadsheet
+    workbook: bool = False
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _prediction_inputs() -> list[tuple]:
+    """
+    Loads the first games of the fixture which the model can evaluate, along with their role assignments.
+    """
+    inputs = []
+    for game_id in range(1, PREDICTION_GAMES + 1):
+        _, players, leg_sessions, pres_actions = get_game(game_id, -1)
+        player_names = [p.name for p in players]
+        codes = assignments.code_array(len(player_names))
+        role_assignments = [assignments.to_dict(code, player_names) for code in codes]
+        try:
+            for ra in role_assignments:
+                pmodel.prob_game_given_roles(leg_sessions, pres_actions, ra)
+        except (IndexError, ValueError):
+            continue
+        inputs.append((leg_sessions, pres_actions, player_names, codes, role_assignments))
+    return inputs
+
+
+def _prob_game_given_roles(folder: str) -> Callable[[], object]:
+    inputs = _prediction_inputs()
+    def run() -> None:
+        pmodel.transition.cache_clear()
+        for (leg_sessions, pres_actions, _, _, role_assignments) in inputs:
+            for ra in role_assignments:
+                pmodel.prob_game_given_roles(leg_sessions, pres_actions, ra)
+    return run
+
+
+def _engine(engine: str) -> Callable[[str], Callable[[], object]]:
+    def prepare(folder: str) -> Callable[[], object]:
+        inputs = _prediction_inputs()
+        func = engines.ENGINES[engine]
+        def run() -> None:
+            pmodel.transition.cache_clear()
+            for (leg_sessions, pres_actions, player_names, codes, _) in inputs:
+                func(leg_sessions, pres_actions, player_names, codes, None)
+        return run
+    return prepare
+
+
+def _get_all_role_assignments(folder: str) -> Callable[[], object]:
+    player_names = [[f"Player {i}" for i in range(n)] for n in range(5, 11)]
+    return lambda: [assignments.get_all_role_assignments(names) for names in player_names]
+
+
+def _code_array(folder: str) -> Callable[[], object]:
+    return lambda: [assignments.code_array(n) for n in range(5, 11)]
+
+
+def _loader(loader: Callable) -> Callable[[str], Callable[[], object]]:
+    def prepare(folder: str) -> Callable[[], object]:
+        def run() -> object:
+            re.clear_cache()
+            return loader()
+        return run
+    return prepare
+
+
+def _get_game(folder: str) -> Callable[[], object]:
+    def run() -> object:
+        re.clear_cache()
+        return get_game(-1, -1)
+    return run
+
+
+def _read_spreadsheet(folder: str) -> Callable[[], object]:
+    return lambda: list(sync._read_spreadsheet(f"{folder}/{fixtures.WORKBOOK_FILE}"))
+
+
+def _parse_data(folder: str) -> Callable[[], object]:
+    rows = list(sync._read_spreadsheet(f"{folder}/{fixtures.WORKBOOK_FILE}"))
+    return lambda: sync._parse_data(rows)
+
+
+def _stats_table(table: str) -> Callable[[str], Callable[[], object]]:
+    def prepare(folder: str) -> Callable[[], object]:
+        # Load the data first so that only the statistics are timed
+        re.get_all_games()
+        re.get_all_players()
+        re.get_all_leg_sessions()
+        re.get_all_pres_actions()
+        return stats._data_source[table]
+    return prepare
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+CASES = [
+    Case("pmodel.prob_game_given_roles", _prob_game_given_roles, max_games=100),
+    *[Case(f"engines.{engine}", _engine(engine), max_games=100) for engine in engines.ENGINES],
+    Case("assignments.get_all_role_assignments", _get_all_role_assignments, max_games=100),
+    Case("assignments.code_array", _code_array, max_games=100),
+    Case("repository.get_all_games", _loader(re.get_all_games)),
+    Case("repository.get_all_players", _loader(re.get_all_players)),
+    Case("repository.get_all_leg_sessions", _loader(re.get_all_leg_sessions)),
+    Case("repository.get_all_pres_actions", _loader(re.get_all_pres_actions)),
+    Case("repository.get_game", _get_game),
+    Case("sync._read_spreadsheet", _read_spreadsheet, max_games=100, workbook=True),
+    Case("sync._parse_data", _parse_data, max_games=100, workbook=True),
+    *[Case(f"stats.{table}", _stats_table(table), max_games=100) for table in stats._data_source],
+]
@@ -0,0 +1,150 @@
+"""
+Generates the datasets used by the benchmarks.
+
+Each fixture is built deterministically by tiling the games in the example spreadsheet until the requested number of games is reached. Every copy of the example games gets new game IDs, later dates and relabelled player names, so that a large fixture looks like a long history from a growing group of players rather than the same games repeated.
+"""
+
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+from typing import Iterable, Iterator, Sequence
+
+import config
+import data.repository as re
+import data.sync as sync
+import hashlib
+import json
+import os
+
+
+# Bump this whenever the generated data changes so that old results are not compared with new ones
+FIXTURE_VERSION = 1
+
+FIXTURE_FOLDER = "benchmarks/fixtures"
+
+SIZES = {
+    "100": 100,
+    "10k": 10_000,
+    "100k": 100_000,
+}
+
+WORKBOOK_FILE = "workbook.xlsx"
+MANIFEST_FILE = "manifest.json"
+
+# Number of games generated at a time
+CHUNK_SIZE = 5000
+
+# Columns which contain player names
+NAME_COLUMNS = ["president", "chancellor", "target", "player"]
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _split_games(rows: Iterable[Sequence]) -> list[tuple[datetime, list[list]]]:
+    """
+    Splits the rows of a spreadsheet into the date and data rows of each game.
+    """
+    games = []
+    for row in rows:
+        if sync._is_empty(row):
+            continue
+        elif sync._is_date_row(row):
+            current_date = datetime.strptime(row[0], "%Y-%m-%d")
+        elif sync._is_header_row(row):
+            games.append((current_date, []))
+        else:
+            games[-1][1].append(list(row))
+    return games
+
+
+def _relabel(row: list, game_id: int, copy: int) -> list:
+    row = row.copy()
+    row[config.SPREADSHEET_HEADER.index("game")] = game_id
+    if copy > 0:
+        for column in NAME_COLUMNS:
+            index = config.SPREADSHEET_HEADER.index(column)
+            if row[index] is not None:
+                row[index] = f"{row[index]} {copy}"
+    return row
+
+
+def _tile(source: list[tuple[datetime, list[list]]], start: int, stop: int) -> Iterator[list]:
+    """
+    Generates the spreadsheet rows of games `start` to `stop` (exclusive, counting from 0) of a fixture.
+    """
+    first_date = source[0][0]
+    # Each copy starts a week after the previous one ends
+    period = source[-1][0] - first_date + timedelta(days=7)
+    empty_row = [None] * config.SPREADSHEET_NUM_COLS
+    for i in range(start, stop):
+        copy, index = divmod(i, len(source))
+        date, rows = source[index]
+        date += copy * period
+        yield [datetime.strftime(date, "%Y-%m-%d")] + [None] * (config.SPREADSHEET_NUM_COLS - 1)
+        yield empty_row
+        yield config.SPREADSHEET_HEADER
+        for row in rows:
+            yield _relabel(row, i + 1, copy)
+        yield empty_row
+
+
+def _checksum(file: str) -> str:
+    sha = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _write_workbook(rows: Iterator[list], file: str) -> None:
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(config.WORKSHEET_NAME)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(file)
+
+
+def _write_tables(source: list[tuple[datetime, list[list]]], num_games: int, folder: str) -> None:
+    with re.use_folder(folder):
+        # Parse a few thousand games at a time to keep the memory use down on large fixtures
+        with re.bulk_write() as add:
+            for start in range(0, num_games, CHUNK_SIZE):
+                rows = list(_tile(source, start, min(start + CHUNK_SIZE, num_games)))
+                add(*sync._parse_data(rows))
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def fixture_folder(size: str) -> str:
+    return f"{FIXTURE_FOLDER}/v{FIXTURE_VERSION}/{size}"
+
+
+def get_fixture(size: str, workbook: bool = False) -> dict:
+    """
+    Returns the manifest of the fixture with the given size, generating its tables (and its spreadsheet if requested) first if needed.
+    """
+    folder = fixture_folder(size)
+    manifest_file = f"{folder}/{MANIFEST_FILE}"
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+    else:
+        print(f"Generating the {size} fixture in '{folder}'.")
+        os.makedirs(folder, exist_ok=True)
+        source = _split_games(sync._read_spreadsheet(config.WORKBOOK_NAME))
+        _write_tables(source, SIZES[size], folder)
+        manifest = {
+            "version": FIXTURE_VERSION,
+            "size": size,
+            "games": SIZES[size],
+            "checksums": {file: _checksum(f"{folder}/{file}") for file in re.TABLE_FILES.values()},
+        }
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f, indent=2)
+    if workbook and not os.path.exists(f"{folder}/{WORKBOOK_FILE}"):
+        print(f"Generating the {size} spreadsheet in '{folder}'.")
+        source = _split_games(sync._read_spreadsheet(config.WORKBOOK_NAME))
+        _write_workbook(_tile(source, 0, SIZES[size]), f"{folder}/{WORKBOOK_FILE}")
+    manifest["folder"] = folder
+    return manifest
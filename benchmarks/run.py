@@ -0,0 +1,149 @@
+"""
+Runs the benchmarks and compares the results of two runs.
+"""
+
+from argparse import Namespace
+from benchmarks.cases import CASES, Case
+from contextlib import redirect_stdout
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import Callable
+
+import benchmarks.fixtures as fixtures
+import data.repository as re
+import io
+import json
+import os
+import pandas as pd
+import platform
+import subprocess
+import sys
+import time
+
+
+RESULT_FOLDER = "benchmarks/results"
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _commit() -> str | None:
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _time(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    times = []
+    # Hide progress bars and other output from the timed code
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return {"min": min(times), "mean": sum(times) / len(times), "repeat": repeat}
+
+
+def _selected_cases(patterns: list[str] | None) -> list[Case]:
+    if patterns is None:
+        return CASES
+    return [c for c in CASES if any(fnmatch(c.name, p) for p in patterns)]
+
+
+def _run_case(case: Case, manifest: dict, repeat: int) -> dict:
+    result = {"case": case.name, "size": manifest["size"]}
+    with re.use_folder(manifest["folder"]):
+        with redirect_stdout(io.StringIO()):
+            func = case.prepare(manifest["folder"])
+        result.update(_time(func, repeat))
+    return result
+
+
+def _read_results(file: str) -> dict:
+    with open(file, "r") as f:
+        return json.load(f)
+
+
+def _format_time(seconds: float | None) -> str:
+    if seconds is None:
+        return ""
+    if seconds < 1:
+        return f"{1000 * seconds:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def run(args: Namespace) -> None:
+    cases = _selected_cases(args.cases)
+    if len(cases) == 0:
+        print("No benchmark matches the given patterns. Valid benchmarks:")
+        for c in CASES:
+            print(f"  {c.name}")
+        sys.exit(1)
+    sizes = list(fixtures.SIZES.keys()) if args.sizes is None else args.sizes
+    invalid_sizes = [s for s in sizes if s not in fixtures.SIZES]
+    if invalid_sizes:
+        print(f"Invalid dataset size(s): {', '.join(invalid_sizes)}. Valid sizes: {', '.join(fixtures.SIZES)}.")
+        sys.exit(1)
+    output = args.output
+    if output is None:
+        output = f"{RESULT_FOLDER}/{_commit() or datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    report = {
+        "fixture_version": fixtures.FIXTURE_VERSION,
+        "commit": _commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fixtures": {},
+        "results": [],
+    }
+    for size in sizes:
+        num_games = fixtures.SIZES[size]
+        sized_cases = [c for c in cases if args.no_limits or c.max_games is None or num_games <= c.max_games]
+        if len(sized_cases) == 0:
+            continue
+        manifest = fixtures.get_fixture(size, workbook=any(c.workbook for c in sized_cases))
+        report["fixtures"][size] = manifest["checksums"]
+        for case in sized_cases:
+            print(f"{case.name} ({size} games)... ", end="", flush=True)
+            result = _run_case(case, manifest, args.repeat)
+            print(_format_time(result["min"]))
+            report["results"].append(result)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to '{output}'.")
+
+
+def compare(args: Namespace) -> None:
+    old = _read_results(args.old)
+    new = _read_results(args.new)
+    if old["fixture_version"] != new["fixture_version"]:
+        print(f"WARNING: the runs used different fixture versions ({old['fixture_version']} and {new['fixture_version']}).")
+    for (size, checksums) in new["fixtures"].items():
+        if size in old["fixtures"] and old["fixtures"][size] != checksums:
+            print(f"WARNING: the {size} fixture is not the same in both runs.")
+    old_results = {(r["case"], r["size"]): r for r in old["results"]}
+    data = []
+    regressions = 0
+    for r in new["results"]:
+        key = (r["case"], r["size"])
+        if key not in old_results:
+            data.append([r["case"], r["size"], "", _format_time(r["min"]), "", ""])
+            continue
+        old_time = old_results[key]["min"]
+        change = r["min"] / old_time - 1
+        regression = change > args.threshold
+        regressions += regression
+        data.append([r["case"], r["size"], _format_time(old_time), _format_time(r["min"]), f"{100 * change:+.1f}%", "REGRESSION" if regression else ""])
+    headers = ["Benchmark", "Size", f"Old ({old['commit']})", f"New ({new['commit']})", "Change", ""]
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+        print(pd.DataFrame(data, columns=headers).to_string(index=False))
+    if regressions > 0:
+        print(f"{regressions} benchmark(s) slower by more than {100 * args.threshold:.0f}%.")
+        sys.exit(1)
+    print(f"No benchmark slower by more than {100 * args.threshold:.0f}%.")
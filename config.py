@@ -17,3 +17,17 @@ GAME_FILE_PATH = f"{DATA_TABLE_FOLDER}/game.csv"
 PLAYER_FILE_PATH = f"{DATA_TABLE_FOLDER}/player.csv"
 LEG_SESSION_FILE_PATH = f"{DATA_TABLE_FOLDER}/legislative_session.csv"
 PRES_ACTION_FILE_PATH = f"{DATA_TABLE_FOLDER}/president_action.csv"
+SQLITE_FILE_PATH = f"{DATA_TABLE_FOLDER}/data.sqlite3"
+# Hash of each imported game, used by `import --incremental`
+IMPORT_MANIFEST_PATH = f"{DATA_TABLE_FOLDER}/import_manifest.json"
+# Where `simulate` saves the games unless told to replace the imported data
+SIMULATED_DATA_FOLDER = "data/simulated"
+
+# Whether to keep binary snapshots of the CSV tables (in a "snapshot" folder next to them) to load them faster
+USE_SNAPSHOTS = True
+
+# Where the repository stores the data: "csv" or "sqlite" (run `python manage.py migrate` before switching)
+STORAGE_BACKEND = "csv"
+
+# Names of the engines in `prediction.engines`, listed here so that the command-line parser does not have to import the model
+ENGINE_NAMES = ["batch", "prefix", "scalar"]
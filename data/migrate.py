@@ -0,0 +1,20 @@
+"""
+Copies the data from one storage backend to the other.
+"""
+
+from argparse import Namespace
+
+import data.repository as re
+
+
+def main(args: Namespace) -> None:
+    source = "csv" if args.to == "sqlite" else "sqlite"
+    with re.use_backend(source):
+        games = re.get_all_games()
+        players = re.get_all_players()
+        leg_sessions = re.get_all_leg_sessions()
+        pres_actions = re.get_all_pres_actions()
+    with re.use_backend(args.to):
+        re.save_all(games, players, leg_sessions, pres_actions)
+    print(f"Copied {len(games)} games, {len(players)} players, {len(leg_sessions)} legislative sessions and {len(pres_actions)} president actions from {source} to {args.to}.")
+    print(f"Set STORAGE_BACKEND = \"{args.to}\" in config.py to use the copy.")
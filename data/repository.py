@@ -1,14 +1,34 @@
 """
 Repository layer to read, write, and delete gameplay data.
+
+The data is stored in CSV files, or in a SQLite database (see `data.sqlite_repository`) if `config.STORAGE_BACKEND` is "sqlite". Both backends support the same queries.
+
+CSV tables are also cached as binary snapshots (see `data.snapshot`) unless `config.USE_SNAPSHOTS` is False, so that they only have to be parsed again after they change. The per-game and per-player queries look up the rows they need in the snapshot without decoding the others, while `get_all_*` decode the whole table once and return it as a list.
+
+The results of `get_all_*` are kept in memory. Each cached table records the generation of the data (a counter which every write through this module increments) and the size, modification time and inode of its file, and is checked against them on every read, so that changes made by this process or by others are seen without calling `clear_cache`. A CSV file which was only appended to since it was last read (everything read before hashes the same) is reloaded by parsing the new rows only.
 """
 
+from contextlib import contextmanager, ExitStack
 from data.models import Player, LegislativeSession, PresidentAction, Game, LegislativeOutcome, Party, PresidentActionType, Role, WinReason
 from datetime import datetime
-from functools import cache
-from typing import Callable
+from functools import wraps
+from typing import Callable, Iterable, Iterator, NamedTuple
 
 import config
 import csv
+import data.snapshot as snapshot
+import data.sqlite_repository as sql
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the swap is only protected by the journal
+    fcntl = None
 
 
 GAME_HEADER = ['id', 'date', 'winning_team', 'win_reason']
@@ -16,33 +36,258 @@ PLAYER_HEADER = ['game_id', 'name', 'role']
 LEG_SESSION_HEADER = ['game_id', 'round', 'president', 'chancellor', 'outcome', 'top_deck', 'pres_get_claim', 'pres_give_claim', 'chan_get_claim', 'pres_get_actual', 'chan_get_actual', 'veto_attempt', 'last_round']
 PRES_ACTION_HEADER = ['game_id', 'round', 'action', 'target', 'num_lib', 'accuse']
 
+# Name of the file of each table, as used in `config`
+TABLE_FILES = {
+    "GAME_FILE_PATH": "game.csv",
+    "PLAYER_FILE_PATH": "player.csv",
+    "LEG_SESSION_FILE_PATH": "legislative_session.csv",
+    "PRES_ACTION_FILE_PATH": "president_action.csv",
+}
+SQLITE_FILE = "data.sqlite3"
+IMPORT_MANIFEST_FILE = "import_manifest.json"
+# Lists the new file of each table while `bulk_write` moves them into place, so that an interrupted swap is completed by the next access
+TABLES_JOURNAL_FILE = "tables.journal"
+BACKENDS = ["csv", "sqlite"]
+
+class _CacheEntry(NamedTuple):
+    version: tuple
+    rows: list
+    # Number of bytes of the CSV file read so far, and their hash
+    offset: int
+    digest: bytes
+
+
+class CacheStats:
+    """
+    Counts how the `get_all_*` queries were answered: from memory, by reading only the rows added to the file since the last read, or by loading the whole table.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.appends = 0
+        self.misses = 0
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.appends} partial reloads, {self.misses} full loads"
+
+
+# Incremented by every write
+_generation = 0
+# Cached tables, by backend and file
+_tables: dict[tuple[str, str], _CacheEntry] = {}
+# Indexes of the cached tables, by name, with the list of objects they were built from
+_indexes: dict[str, tuple[list, dict]] = {}
+_stats = CacheStats()
+
 
 # ------------------------------------------------------------------------------
 # Helper functions
 # ------------------------------------------------------------------------------
-def _get_all(file: str, parse: Callable) -> list:
-    results = []
-    with open(file, "r", newline="") as f:
-        csv_reader = csv.reader(f)
-        # Skip header
-        next(csv_reader)
-        for row in csv_reader:
-            obj = parse(row)
-            results.append(obj)
+@contextmanager
+def _tables_lock(folder: str) -> Iterator[None]:
+    """
+    Holds the lock which `bulk_write` takes to move new tables into place in the folder (a lock on the folder itself, so that no file is added to it) for the duration of the block.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _apply_journal(folder: str) -> None:
+    """
+    Moves the files listed in the journal of the folder onto their tables and deletes the journal. Call with the lock held.
+    """
+    journal = os.path.join(folder, TABLES_JOURNAL_FILE)
+    try:
+        with open(journal, "r") as f:
+            new_files = json.load(f)
+    except FileNotFoundError:
+        return
+    for (name, new_file) in new_files.items():
+        try:
+            os.replace(os.path.join(folder, new_file), os.path.join(folder, name))
+        except FileNotFoundError:
+            # Already moved before the swap was interrupted
+            pass
+    os.remove(journal)
+
+
+def _file(attr: str) -> str:
+    """
+    Returns the file of the table whose path is the given `config` attribute, after completing a swap of the tables by `bulk_write` which is in progress or was interrupted, so that a table is never read or written while the others are still being replaced.
+    """
+    file = getattr(config, attr)
+    folder = os.path.dirname(file) or "."
+    if os.path.exists(os.path.join(folder, TABLES_JOURNAL_FILE)):
+        with _tables_lock(folder):
+            _apply_journal(folder)
+    return file
+
+
+def _version(file: str) -> tuple:
+    stat = os.stat(file)
+    return (_generation, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def _parse_csv(data: bytes, parse: Callable, skip_header: bool) -> list:
+    csv_reader = csv.reader(io.StringIO(data.decode(), newline=""))
+    if skip_header:
+        next(csv_reader, None)
+    return [parse(row) for row in csv_reader]
+
+
+def _get_all(attr: str, parse: Callable, table: str) -> list:
+    file = _file(attr)
+    key = ("csv", file)
+    version = _version(file)
+    entry = _tables.get(key)
+    if entry is not None and entry.version == version:
+        _stats.hits += 1
+        return entry.rows
+    if entry is None and config.USE_SNAPSHOTS:
+        # The snapshot records what identifies the data it was made from, so the file does not have to be read at all
+        loaded = snapshot.load(file, table)
+        if loaded is not None:
+            _stats.misses += 1
+            rows, offset, digest = loaded
+            _tables[key] = _CacheEntry(version, rows, offset, digest)
+            return rows
+    source = snapshot.source_stat(file)
+    with open(file, "rb") as f:
+        data = f.read()
+    # The snapshot can only stand for the data read if the file did not change in the meantime
+    use_snapshot = config.USE_SNAPSHOTS and len(data) == source["size"]
+    # Leave out a row which is still being written
+    data = data[:data.rfind(b"\n") + 1]
+    if entry is not None and len(data) >= entry.offset:
+        hasher = hashlib.sha1(data[:entry.offset])
+        appended = hasher.digest() == entry.digest
+    else:
+        appended = False
+    if appended:
+        # Everything read before is unchanged: only parse the rows added since
+        _stats.appends += 1
+        results = list(entry.rows) + _parse_csv(data[entry.offset:], parse, entry.offset == 0)
+        hasher.update(data[entry.offset:])
+    else:
+        _stats.misses += 1
+        hasher = hashlib.sha1(data)
+        loaded = snapshot.load(file, table) if use_snapshot else None
+        if loaded is not None:
+            results = loaded[0]
+        else:
+            results = _parse_csv(data, parse, True)
+            if use_snapshot:
+                snapshot.save(file, table, results, source, len(data), hasher.digest())
+    _tables[key] = _CacheEntry(version, results, len(data), hasher.digest())
     return results
 
 
+def _get_all_sqlite(table: str, query: Callable[[], list]) -> list:
+    key = ("sqlite", f"{config.SQLITE_FILE_PATH}:{table}")
+    # Make sure the file exists
+    sql.last_modified()
+    version = _version(config.SQLITE_FILE_PATH)
+    entry = _tables.get(key)
+    if entry is not None and entry.version == version:
+        _stats.hits += 1
+        return entry.rows
+    _stats.misses += 1
+    results = query()
+    _tables[key] = _CacheEntry(version, results, 0, b"")
+    return results
+
+
+def _decoded(objects: list) -> list:
+    """
+    Returns the objects as a list. Tables loaded from a snapshot are decoded the first time they are needed as a whole, and the list is kept with the snapshot.
+    """
+    return objects.to_list() if isinstance(objects, snapshot.Rows) else objects
+
+
+def _index(name: str, objects: list, build: Callable[[list], dict]) -> dict:
+    """
+    Returns the index built from the objects, which is rebuilt when the objects are reloaded.
+    """
+    cached = _indexes.get(name)
+    if cached is None or cached[0] is not objects:
+        cached = (objects, build(objects))
+        _indexes[name] = cached
+    return cached[1]
+
+
+def _bump() -> None:
+    global _generation
+    _generation += 1
+
+
+def _writes(func: Callable) -> Callable:
+    """
+    Increments the generation of the data once the write is done, so that the cached tables are checked again.
+    """
+    @wraps(func)
+    def write(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _bump()
+    return write
+
+
+def _use_sqlite() -> bool:
+    if config.STORAGE_BACKEND not in BACKENDS:
+        raise ValueError(f"Invalid storage backend '{config.STORAGE_BACKEND}'.")
+    return config.STORAGE_BACKEND == "sqlite"
+
+
+def _group_by_game(objects: list) -> dict[int, list]:
+    if isinstance(objects, snapshot.Rows):
+        return snapshot.Groups(objects, "game_id")
+    groups = {}
+    for obj in objects:
+        groups.setdefault(obj.game_id, []).append(obj)
+    return groups
+
+
 def _insert(row: list, file: str) -> None:
     with open(file, "a", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(row)
 
 
+def _insert_all(rows: Iterable[list], file: str) -> None:
+    with open(file, "a", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+
+
+def _splice(old: list, new_by_game: dict[int, list], game_ids: set[int]) -> Iterator:
+    """
+    Yields the old objects, with those of the given games replaced by the new ones at the position of the first old one. New objects of games which were not stored yet come last.
+    """
+    done = set()
+    for obj in old:
+        if obj.game_id not in game_ids:
+            yield obj
+        elif obj.game_id not in done:
+            done.add(obj.game_id)
+            yield from new_by_game.get(obj.game_id, [])
+    for (game_id, objects) in new_by_game.items():
+        if game_id not in done:
+            yield from objects
+
+
 # ------------------------------------------------------------------------------
 # Read queries
 # ------------------------------------------------------------------------------
-@cache
-def get_all_pres_actions() -> list[PresidentAction]:
+def _load_pres_actions() -> list[PresidentAction]:
+    if _use_sqlite():
+        return _get_all_sqlite("president_action", sql.get_all_pres_actions)
     def parse_pres_action(row: list[str]) -> PresidentAction:
         game_id = int(row[0])
         round_num = int(row[1])
@@ -58,11 +303,12 @@ def get_all_pres_actions() -> list[PresidentAction]:
         else:
             raise RuntimeError(f"Invalid value for PresidentAction.accuse: '{row[5]}'.")
         return PresidentAction(game_id, round_num, action, target_name, num_lib, accuse)
-    return _get_all(config.PRES_ACTION_FILE_PATH, parse_pres_action)
+    return _get_all("PRES_ACTION_FILE_PATH", parse_pres_action, "president_action")
 
 
-@cache
-def get_all_leg_sessions() -> list[LegislativeSession]:
+def _load_leg_sessions() -> list[LegislativeSession]:
+    if _use_sqlite():
+        return _get_all_sqlite("legislative_session", sql.get_all_leg_sessions)
     def parse_leg_session(row: list[str]) -> LegislativeSession:
         game_id = int(row[0])
         round_num = int(row[1])
@@ -89,88 +335,380 @@ def get_all_leg_sessions() -> list[LegislativeSession]:
         else:
             raise RuntimeError(f"Invalid value for legislative_session.last_round: '{row[12]}'.")
         return LegislativeSession(game_id, round_num, pres_name, chan_name, outcome, top_deck, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual, chan_get_actual, veto_attempt, last_round)
-    return _get_all(config.LEG_SESSION_FILE_PATH, parse_leg_session)
+    return _get_all("LEG_SESSION_FILE_PATH", parse_leg_session, "legislative_session")
 
 
-@cache
-def get_all_players() -> list[Player]:
+def _load_players() -> list[Player]:
+    if _use_sqlite():
+        return _get_all_sqlite("player", sql.get_all_players)
     def parse_player(row: list[str]) -> Player:
         game_id = int(row[0])
         name = row[1]
         role = Role(row[2])
         return Player(game_id, name, role)
-    return _get_all(config.PLAYER_FILE_PATH, parse_player)
+    return _get_all("PLAYER_FILE_PATH", parse_player, "player")
 
 
-@cache
-def get_all_games() -> list[Game]:
+def _load_games() -> list[Game]:
+    if _use_sqlite():
+        return _get_all_sqlite("game", sql.get_all_games)
     def parse_game(row: list[str]) -> Game:
         game_id = int(row[0])
         date = datetime.strptime(row[1], "%Y-%m-%d")
         winning_team = Party(row[2])
         win_reason = WinReason(row[3])
         return Game(game_id, date, winning_team, win_reason)
-    return _get_all(config.GAME_FILE_PATH, parse_game)
+    return _get_all("GAME_FILE_PATH", parse_game, "game")
+
+
+def get_all_pres_actions() -> list[PresidentAction]:
+    return _decoded(_load_pres_actions())
+
+
+def get_all_leg_sessions() -> list[LegislativeSession]:
+    return _decoded(_load_leg_sessions())
+
+
+def get_all_players() -> list[Player]:
+    return _decoded(_load_players())
+
+
+def get_all_games() -> list[Game]:
+    return _decoded(_load_games())
+
+
+# Indexes of the CSV data used by the per-game and per-player queries, which use the snapshots without decoding every row
+def _games_by_id() -> dict[int, list[Game]]:
+    return _index("games_by_id", _load_games(), _group_by_game)
+
+
+def _players_by_game() -> dict[int, list[Player]]:
+    return _index("players_by_game", _load_players(), _group_by_game)
+
+
+def _players_by_name() -> dict[str, list[Player]]:
+    def build(players: list[Player]) -> dict[str, list[Player]]:
+        if isinstance(players, snapshot.Rows):
+            return snapshot.Groups(players, "name")
+        groups = {}
+        for p in players:
+            groups.setdefault(p.name, []).append(p)
+        return groups
+    return _index("players_by_name", _load_players(), build)
+
+
+def _leg_sessions_by_game() -> dict[int, list[LegislativeSession]]:
+    return _index("leg_sessions_by_game", _load_leg_sessions(), _group_by_game)
+
+
+def _pres_actions_by_game() -> dict[int, list[PresidentAction]]:
+    return _index("pres_actions_by_game", _load_pres_actions(), _group_by_game)
+
+
+def get_game_by_id(game_id: int) -> Game | None:
+    if _use_sqlite():
+        return sql.get_game_by_id(game_id)
+    games = _games_by_id().get(game_id)
+    return games[-1] if games else None
+
+
+def get_games_by_id(game_id: int) -> list[Game]:
+    """
+    Returns every game stored with the given ID, so that callers can check that there is exactly one.
+    """
+    if _use_sqlite():
+        return sql.get_games_by_id(game_id)
+    return list(_games_by_id().get(game_id, []))
+
+
+def get_players_in_game(game_id: int) -> list[Player]:
+    if _use_sqlite():
+        return sql.get_players_in_game(game_id)
+    return list(_players_by_game().get(game_id, []))
+
+
+def get_players_by_name(name: str) -> list[Player]:
+    if _use_sqlite():
+        return sql.get_players_by_name(name)
+    return list(_players_by_name().get(name, []))
+
+
+def get_leg_sessions_in_game(game_id: int) -> list[LegislativeSession]:
+    if _use_sqlite():
+        return sql.get_leg_sessions_in_game(game_id)
+    return list(_leg_sessions_by_game().get(game_id, []))
+
+
+def get_pres_actions_in_game(game_id: int) -> list[PresidentAction]:
+    if _use_sqlite():
+        return sql.get_pres_actions_in_game(game_id)
+    return list(_pres_actions_by_game().get(game_id, []))
+
+
+def count_games() -> int:
+    if _use_sqlite():
+        return sql.count_games()
+    return len(_load_games())
+
+
+def clear_cache() -> None:
+    """
+    Forgets the results of previous read queries, so that the next queries load every table again. The cached tables are checked for changes on every read, so this is only needed to free memory or to reload a table in full.
+    """
+    _tables.clear()
+    _indexes.clear()
+
+
+def cache_stats() -> dict[str, int]:
+    """
+    Returns the number of `get_all_*` queries answered from memory ("hits"), by reading only the rows added to a CSV file ("appends"), and by loading the whole table ("misses"), as well as the current generation of the data.
+    """
+    return {"generation": _generation, "hits": _stats.hits, "appends": _stats.appends, "misses": _stats.misses}
+
+
+def last_modified() -> float:
+    """
+    Returns the last time any of the data files was modified.
+    """
+    if _use_sqlite():
+        return sql.last_modified()
+    files = [_file(attr) for attr in TABLE_FILES]
+    return max(os.path.getmtime(f) for f in files)
+
+
+def data_version() -> tuple:
+    """
+    Returns a value which changes whenever the data changes: the generation of the data and the size, modification time and inode of each data file. Unlike `last_modified`, it also changes when a file is rewritten within the resolution of the modification times.
+    """
+    if _use_sqlite():
+        # Make sure the file exists
+        sql.last_modified()
+        return _version(config.SQLITE_FILE_PATH)
+    files = [_file(attr) for attr in TABLE_FILES]
+    return (_generation, *[_version(f)[1:] for f in files])
+
+
+@contextmanager
+def use_folder(folder: str) -> Iterator[None]:
+    """
+    Reads and writes the tables in the given folder instead of the usual one for the duration of the block.
+    """
+    saved = {attr: getattr(config, attr) for attr in [*TABLE_FILES, "SQLITE_FILE_PATH", "IMPORT_MANIFEST_PATH"]}
+    for (attr, file) in TABLE_FILES.items():
+        setattr(config, attr, f"{folder}/{file}")
+    config.SQLITE_FILE_PATH = f"{folder}/{SQLITE_FILE}"
+    config.IMPORT_MANIFEST_PATH = f"{folder}/{IMPORT_MANIFEST_FILE}"
+    clear_cache()
+    try:
+        yield
+    finally:
+        for (attr, path) in saved.items():
+            setattr(config, attr, path)
+        clear_cache()
+
+
+@contextmanager
+def use_backend(backend: str) -> Iterator[None]:
+    """
+    Reads and writes the data with the given backend instead of the configured one for the duration of the block.
+    """
+    saved = config.STORAGE_BACKEND
+    config.STORAGE_BACKEND = backend
+    clear_cache()
+    try:
+        yield
+    finally:
+        config.STORAGE_BACKEND = saved
+        clear_cache()
 
 
 # ------------------------------------------------------------------------------
 # Write queries
 # ------------------------------------------------------------------------------
+def _game_row(g: Game) -> list:
+    return [g.game_id, datetime.strftime(g.date, "%Y-%m-%d"), g.winning_team, g.win_reason]
+
+
+def _player_row(p: Player) -> list:
+    return [p.game_id, p.name, p.role]
+
+
+def _leg_session_row(ls: LegislativeSession) -> list:
+    return [ls.game_id, ls.round_num, ls.pres_name, ls.chan_name, ls.outcome, ls.top_deck, ls.pres_get_claim,ls.pres_give_claim, ls.chan_get_claim, ls.pres_get_actual, ls.chan_get_actual, ls.veto_attempt, ls.last_round]
+
+
+def _pres_action_row(a: PresidentAction) -> list:
+    return [a.game_id, a.round_num, a.action, a.target_name, a.peek_claim, a.accuse]
+
+
+@_writes
 def save_game(g: Game) -> None:
-    row = [g.game_id, datetime.strftime(g.date, "%Y-%m-%d"), g.winning_team, g.win_reason]
-    _insert(row, config.GAME_FILE_PATH)
+    if _use_sqlite():
+        return sql.save_game(g)
+    _insert(_game_row(g), _file("GAME_FILE_PATH"))
 
 
+@_writes
 def save_player(p: Player) -> None:
-    row = [p.game_id, p.name, p.role]
-    _insert(row, config.PLAYER_FILE_PATH)
+    if _use_sqlite():
+        return sql.save_player(p)
+    _insert(_player_row(p), _file("PLAYER_FILE_PATH"))
 
 
+@_writes
 def save_leg_session(ls: LegislativeSession) -> None:
-    row = [ls.game_id, ls.round_num, ls.pres_name, ls.chan_name, ls.outcome, ls.top_deck, ls.pres_get_claim,ls.pres_give_claim, ls.chan_get_claim, ls.pres_get_actual, ls.chan_get_actual, ls.veto_attempt, ls.last_round]
-    _insert(row, config.LEG_SESSION_FILE_PATH)
+    if _use_sqlite():
+        return sql.save_leg_session(ls)
+    _insert(_leg_session_row(ls), _file("LEG_SESSION_FILE_PATH"))
 
 
+@_writes
 def save_pres_action(a: PresidentAction) -> None:
-    row = [a.game_id, a.round_num, a.action, a.target_name, a.peek_claim, a.accuse]
-    _insert(row, config.PRES_ACTION_FILE_PATH)
+    if _use_sqlite():
+        return sql.save_pres_action(a)
+    _insert(_pres_action_row(a), _file("PRES_ACTION_FILE_PATH"))
+
+
+@contextmanager
+def bulk_write() -> Iterator[Callable[..., None]]:
+    """
+    Replaces the contents of every table with the objects passed to the yielded function `add(games, players, leg_sessions, pres_actions)`, which can be called any number of times.
+
+    The new tables are written to temporary files, with one open file per table. Once the block has completed, the lock of the folder is taken and the temporary files are listed in a journal (see `TABLES_JOURNAL_FILE`) and moved onto the tables, which keep their usual names. Readers and writers which find the journal wait for the lock, so they see either all of the old tables or all of the new ones, and a swap interrupted by a crash is completed by the next access. If the block raises, the old tables are left untouched. With SQLite, everything is done in a single transaction.
+    """
+    if _use_sqlite():
+        with sql.bulk_write() as add:
+            yield add
+        _bump()
+        return
+    tables = [
+        ("GAME_FILE_PATH", GAME_HEADER, _game_row),
+        ("PLAYER_FILE_PATH", PLAYER_HEADER, _player_row),
+        ("LEG_SESSION_FILE_PATH", LEG_SESSION_HEADER, _leg_session_row),
+        ("PRES_ACTION_FILE_PATH", PRES_ACTION_HEADER, _pres_action_row),
+    ]
+    temp_files = []
+    try:
+        with ExitStack() as stack:
+            writers = []
+            for (attr, header, to_row) in tables:
+                # Unique names, so that concurrent writers do not overwrite each other's tables
+                folder, name = os.path.split(getattr(config, attr))
+                fd, temp_file = tempfile.mkstemp(dir=folder or ".", prefix=f"{name}.", suffix=".tmp")
+                temp_files.append(temp_file)
+                os.chmod(fd, 0o644)
+                writer = csv.writer(stack.enter_context(open(fd, "w", newline="")))
+                writer.writerow(header)
+                writers.append((writer, to_row))
+            def add(games: Iterable[Game] = (), players: Iterable[Player] = (), leg_sessions: Iterable[LegislativeSession] = (), pres_actions: Iterable[PresidentAction] = ()) -> None:
+                for ((writer, to_row), objects) in zip(writers, [games, players, leg_sessions, pres_actions]):
+                    writer.writerows(map(to_row, objects))
+            yield add
+    except BaseException:
+        for temp_file in temp_files:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        raise
+    _publish({attr: temp_file for ((attr, _, _), temp_file) in zip(tables, temp_files)})
+    _bump()
+
+
+def _publish(new_files: dict[str, str]) -> None:
+    """
+    Moves the given files onto the tables (by `config` attribute) through the journal of their folder.
+    """
+    by_folder = {}
+    for (attr, new_file) in new_files.items():
+        folder, name = os.path.split(getattr(config, attr))
+        by_folder.setdefault(folder or ".", {})[name] = os.path.basename(new_file)
+    for (folder, names) in by_folder.items():
+        with _tables_lock(folder):
+            # Complete an earlier swap first so that its journal is not overwritten
+            _apply_journal(folder)
+            fd, temp_file = tempfile.mkstemp(dir=folder, prefix=f"{TABLES_JOURNAL_FILE}.", suffix=".tmp")
+            with open(fd, "w") as f:
+                json.dump(names, f)
+            os.replace(temp_file, os.path.join(folder, TABLES_JOURNAL_FILE))
+            _apply_journal(folder)
+
+
+def save_all(games: Iterable[Game], players: Iterable[Player], leg_sessions: Iterable[LegislativeSession], pres_actions: Iterable[PresidentAction]) -> None:
+    """
+    Replaces the contents of every table (see `bulk_write`).
+    """
+    with bulk_write() as add:
+        add(games, players, leg_sessions, pres_actions)
+
+
+@_writes
+def replace_games(game_ids: Iterable[int], games: Iterable[Game], players: Iterable[Player], leg_sessions: Iterable[LegislativeSession], pres_actions: Iterable[PresidentAction]) -> None:
+    """
+    Deletes everything stored about the given games and saves the given objects, which should belong to those games. The other games are left as they are.
+
+    With CSV, new games are appended to the files. If stored games are replaced or deleted, the files are rewritten (see `bulk_write`) with the new rows of each replaced game where its old rows were.
+    """
+    if _use_sqlite():
+        return sql.replace_games(game_ids, games, players, leg_sessions, pres_actions)
+    game_ids = set(game_ids)
+    new = [list(games), list(players), list(leg_sessions), list(pres_actions)]
+    files = [_file(attr) for attr in TABLE_FILES]
+    to_rows = [_game_row, _player_row, _leg_session_row, _pres_action_row]
+    if game_ids.isdisjoint(_games_by_id()):
+        for (file, to_row, objects) in zip(files, to_rows, new):
+            _insert_all(map(to_row, objects), file)
+    else:
+        old = [_load_games(), _load_players(), _load_leg_sessions(), _load_pres_actions()]
+        with bulk_write() as add:
+            add(*[_splice(o, _group_by_game(n), game_ids) for (o, n) in zip(old, new)])
 
 
 # ------------------------------------------------------------------------------
 # Delete queries
 # ------------------------------------------------------------------------------
+@_writes
 def clear_pres_actions() -> None:
     """
     Clears all president actions and rewrites the file header.
     """
-    with open(config.PRES_ACTION_FILE_PATH, 'w', newline='') as pres_action_file:
+    if _use_sqlite():
+        return sql.clear_pres_actions()
+    with open(_file("PRES_ACTION_FILE_PATH"), 'w', newline='') as pres_action_file:
         pres_action_writer = csv.writer(pres_action_file)
         pres_action_writer.writerow(PRES_ACTION_HEADER)
 
 
+@_writes
 def clear_leg_sessions() -> None:
     """
     Clears all legislative sessions and rewrites the file header.
     """
-    with open(config.LEG_SESSION_FILE_PATH, 'w', newline='') as leg_session_file:
+    if _use_sqlite():
+        return sql.clear_leg_sessions()
+    with open(_file("LEG_SESSION_FILE_PATH"), 'w', newline='') as leg_session_file:
         leg_session_writer = csv.writer(leg_session_file)
         leg_session_writer.writerow(LEG_SESSION_HEADER)
 
 
+@_writes
 def clear_players() -> None:
     """
     Clears all players and rewrites the file header.
     """
-    with open(config.PLAYER_FILE_PATH, 'w', newline='') as player_file:
+    if _use_sqlite():
+        return sql.clear_players()
+    with open(_file("PLAYER_FILE_PATH"), 'w', newline='') as player_file:
         player_writer = csv.writer(player_file)
         player_writer.writerow(PLAYER_HEADER)
 
 
+@_writes
 def clear_games() -> None:
     """
     Clears all games and rewrites the file header.
     """
-    with open(config.GAME_FILE_PATH, 'w', newline='') as game_file:
+    if _use_sqlite():
+        return sql.clear_games()
+    with open(_file("GAME_FILE_PATH"), 'w', newline='') as game_file:
         game_writer = csv.writer(game_file)
         game_writer.writerow(GAME_HEADER)
 
@@ -0,0 +1,258 @@
+"""
+Binary columnar snapshots of the CSV tables, which load much faster than the CSV files.
+
+Each table is stored as a matrix of integers with one column per field (enums as the index of their value, dates as ordinals, missing values as -1) in a NumPy file, which is memory-mapped when it is loaded. Strings (player names) are stored as indices into a dictionary kept in a JSON manifest, along with the size and modification time of the CSV file the snapshot was made from and the length and hash of the data read from it (see `repository` for how they are used to detect appended rows). A snapshot is only used if the CSV file has not changed since.
+
+Loading a snapshot does not create any objects: `Groups` finds the rows with a given game ID or player name by binary search in the column and only decodes those, so looking up a few games is fast even in a large history. The whole table is decoded once, the first time it is needed as a list (see `Rows.to_list`).
+"""
+
+from __future__ import annotations
+from collections.abc import Mapping, Sequence
+from data.models import Player, LegislativeSession, PresidentAction, Game, LegislativeOutcome, Party, PresidentActionType, Role, WinReason
+from datetime import datetime
+from enum import Enum
+
+import gc
+import json
+import numpy as np
+import os
+import tempfile
+
+
+# Increment when the format changes so that old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+SNAPSHOT_FOLDER = "snapshot"
+
+# Missing values
+NONE = -1
+# Number of rows decoded at once when going through a table
+CHUNK_SIZE = 65536
+
+# Field kinds
+INT = "int"
+STR = "str"
+BOOL = "bool"
+DATE = "date"
+
+# Class and fields (in constructor order) of each table. Optional fields are marked with True.
+TABLES = {
+    "game": (Game, [("game_id", INT, False), ("date", DATE, False), ("winning_team", Party, False), ("win_reason", WinReason, False)]),
+    "player": (Player, [("game_id", INT, False), ("name", STR, False), ("role", Role, False)]),
+    "legislative_session": (LegislativeSession, [
+        ("game_id", INT, False), ("round_num", INT, False), ("pres_name", STR, False), ("chan_name", STR, False),
+        ("outcome", LegislativeOutcome, False), ("top_deck", Party, True),
+        ("pres_get_claim", INT, True), ("pres_give_claim", INT, True), ("chan_get_claim", INT, True), ("pres_get_actual", INT, True), ("chan_get_actual", INT, True),
+        ("veto_attempt", BOOL, False), ("last_round", BOOL, False),
+    ]),
+    "president_action": (PresidentAction, [("game_id", INT, False), ("round_num", INT, False), ("action", PresidentActionType, False), ("target_name", STR, True), ("peek_claim", INT, True), ("accuse", BOOL, True)]),
+}
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _paths(csv_file: str, table: str) -> tuple[str, str]:
+    folder = os.path.join(os.path.dirname(csv_file), SNAPSHOT_FOLDER)
+    return os.path.join(folder, f"{table}.npy"), os.path.join(folder, f"{table}.json")
+
+
+def _encode(value: object, kind: object, strings: dict[str, int]) -> int:
+    if value is None:
+        return NONE
+    if kind == INT or kind == BOOL:
+        return int(value)
+    if kind == DATE:
+        return value.toordinal()
+    if kind == STR:
+        return strings.setdefault(value, len(strings))
+    return list(kind).index(value)
+
+
+def _decode_column(column: list[int], kind: object, optional: bool, strings: list[str]) -> list:
+    if kind == INT:
+        values = column
+    elif kind == BOOL:
+        values = [v == 1 for v in column]
+    elif kind == DATE:
+        values = [datetime.fromordinal(v) if v != NONE else None for v in column]
+    elif kind == STR:
+        values = [strings[v] if v != NONE else None for v in column]
+    elif issubclass(kind, Enum):
+        members = list(kind)
+        values = [members[v] if v != NONE else None for v in column]
+    else:
+        raise ValueError(f"Invalid field kind '{kind}'.")
+    if optional and kind in [INT, BOOL]:
+        values = [None if c == NONE else v for (c, v) in zip(column, values)]
+    return values
+
+
+def _decode_rows(matrix: np.ndarray, table: str, strings: list[str]) -> list:
+    cls, fields = TABLES[table]
+    if len(matrix) == 0:
+        return []
+    columns = [_decode_column(matrix[:, j].tolist(), kind, optional, strings) for (j, (_, kind, optional)) in enumerate(fields)]
+    # Creating many objects at once triggers the garbage collector over and over, which takes longer than creating them
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return [cls(*row) for row in zip(*columns)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _write_atomic(file: str, write) -> None:
+    # A unique temporary file, so that concurrent writers do not overwrite each other's snapshots
+    fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(file), prefix=f"{os.path.basename(file)}.", suffix=".tmp")
+    try:
+        with open(fd, "wb") as f:
+            write(f)
+        os.replace(temp_file, file)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+class Rows(Sequence):
+    """
+    Rows of a table backed by its memory-mapped snapshot, which are decoded when they are accessed. `positions` selects some of the rows of the matrix, in order (all of them by default). Slices are returned as lists.
+    """
+    def __init__(self, matrix: np.ndarray, table: str, strings: list[str], positions: np.ndarray | None = None):
+        self.matrix = matrix
+        self.table = table
+        self.strings = strings
+        self.positions = positions
+        # Every row, once `to_list` has decoded them
+        self.decoded = None
+
+    def __len__(self) -> int:
+        return len(self.matrix) if self.positions is None else len(self.positions)
+
+    def __getitem__(self, i: int | slice) -> object:
+        if self.decoded is not None:
+            return self.decoded[i]
+        if isinstance(i, slice):
+            matrix = self.matrix[i] if self.positions is None else self.matrix[self.positions[i]]
+            return _decode_rows(matrix, self.table, self.strings)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Row index out of range.")
+        return self[i:i + 1][0]
+
+    def __iter__(self):
+        if self.decoded is not None:
+            yield from self.decoded
+            return
+        for start in range(0, len(self), CHUNK_SIZE):
+            yield from self[start:start + CHUNK_SIZE]
+
+    def to_list(self) -> list:
+        """
+        Returns every row as a list, which is decoded the first time and kept, so that later calls, indexing and iteration return the same objects without decoding them again.
+        """
+        if self.decoded is None:
+            self.decoded = self[:]
+        return self.decoded
+
+    def column(self, attr: str) -> np.ndarray:
+        """
+        Returns the encoded values of a field, without decoding them.
+        """
+        _, fields = TABLES[self.table]
+        j = [name for (name, _, _) in fields].index(attr)
+        return self.matrix[:, j] if self.positions is None else self.matrix[self.positions, j]
+
+
+class Groups(Mapping):
+    """
+    Rows grouped by the value of a field (an integer or a string), in their original order within each group, like a dict of lists. The column is sorted once and each group is found by binary search when it is looked up.
+    """
+    def __init__(self, rows: Rows, attr: str):
+        _, fields = TABLES[rows.table]
+        self.rows = rows
+        self.kind = {name: kind for (name, kind, _) in fields}[attr]
+        column = np.asarray(rows.column(attr))
+        # The tables are usually already sorted by game ID
+        if len(column) > 0 and not (column[1:] >= column[:-1]).all():
+            self.order = np.argsort(column, kind="stable")
+            column = column[self.order]
+        else:
+            self.order = None
+        self.keys = column
+        self.string_codes = {s: i for (i, s) in enumerate(rows.strings)} if self.kind == STR else None
+
+    def _encode(self, key: object) -> int | None:
+        if self.kind == STR:
+            return self.string_codes.get(key)
+        return key if isinstance(key, (int, np.integer)) and not isinstance(key, bool) else None
+
+    def __getitem__(self, key: object) -> Rows | list:
+        code = self._encode(key)
+        if code is None:
+            raise KeyError(key)
+        lo = int(np.searchsorted(self.keys, code, "left"))
+        hi = int(np.searchsorted(self.keys, code, "right"))
+        if lo == hi:
+            raise KeyError(key)
+        positions = np.arange(lo, hi) if self.order is None else self.order[lo:hi]
+        if self.rows.decoded is not None:
+            # Reuse the objects already decoded
+            return [self.rows.decoded[p] for p in positions.tolist()]
+        if self.rows.positions is not None:
+            positions = self.rows.positions[positions]
+        return Rows(self.rows.matrix, self.rows.table, self.rows.strings, positions)
+
+    def __iter__(self):
+        for code in np.unique(self.keys).tolist():
+            yield self.rows.strings[code] if self.kind == STR else code
+
+    def __len__(self) -> int:
+        return len(np.unique(self.keys))
+
+
+def source_stat(csv_file: str) -> dict:
+    """
+    Returns what identifies the current contents of the CSV file. Take it before reading the file and pass it to `save`, so that changes made while reading invalidate the snapshot.
+    """
+    stat = os.stat(csv_file)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load(csv_file: str, table: str) -> tuple[Rows, int, bytes] | None:
+    """
+    Returns the rows of the table from its snapshot (see `Rows`) with the length and SHA-1 digest of the data they were read from, or None if there is no snapshot or the CSV file has changed since it was made.
+    """
+    matrix_file, manifest_file = _paths(csv_file, table)
+    try:
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+        if manifest["version"] != SNAPSHOT_VERSION or manifest["source"] != source_stat(csv_file):
+            return None
+        matrix = np.load(matrix_file, mmap_mode="r")
+        offset, digest = manifest["offset"], bytes.fromhex(manifest["digest"])
+    except (OSError, ValueError, KeyError):
+        return None
+    return Rows(matrix, table, manifest["strings"]), offset, digest
+
+
+def save(csv_file: str, table: str, rows: list, source: dict, offset: int, digest: bytes) -> None:
+    """
+    Saves a snapshot of the rows read from the CSV file, whose stat (from `source_stat`) was taken before reading it, along with the length and SHA-1 digest of the data they were parsed from. Failures are ignored since the snapshot is only a cache.
+    """
+    matrix_file, manifest_file = _paths(csv_file, table)
+    _, fields = TABLES[table]
+    strings = {}
+    matrix = np.array([[_encode(getattr(r, attr), kind, strings) for (attr, kind, _) in fields] for r in rows], dtype=np.int64).reshape(len(rows), len(fields))
+    manifest = {"version": SNAPSHOT_VERSION, "source": source, "offset": offset, "digest": digest.hex(), "strings": list(strings)}
+    try:
+        os.makedirs(os.path.dirname(matrix_file), exist_ok=True)
+        # The manifest is written last so that it never points to an incomplete matrix
+        _write_atomic(matrix_file, lambda f: np.save(f, matrix))
+        _write_atomic(manifest_file, lambda f: f.write(json.dumps(manifest).encode()))
+    except OSError:
+        pass
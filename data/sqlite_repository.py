@@ -0,0 +1,281 @@
+"""
+SQLite implementation of the repository layer. Used by `data.repository` when `config.STORAGE_BACKEND` is "sqlite".
+
+The tables have the same columns as the CSV files. Rows are returned in insertion order, as with the CSV files, and are indexed by game, by (game, round), and by player name so that per-game and per-player queries do not scan every row. As with the CSV files, game IDs are not required to be unique: `get_games_by_id` returns every game with an ID, and `get_game_by_id` the last one saved.
+"""
+
+from contextlib import contextmanager
+from data.models import Player, LegislativeSession, PresidentAction, Game, LegislativeOutcome, Party, PresidentActionType, Role, WinReason
+from datetime import datetime
+from typing import Callable, Iterable, Iterator
+
+import config
+import os
+import sqlite3
+
+
+# Stored in the "user_version" of the database. Increment when the schema changes, and upgrade older databases in `_upgrade`.
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS game (
+    id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    winning_team TEXT NOT NULL,
+    win_reason TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS player (
+    game_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS legislative_session (
+    game_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    president TEXT NOT NULL,
+    chancellor TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    top_deck TEXT,
+    pres_get_claim INTEGER,
+    pres_give_claim INTEGER,
+    chan_get_claim INTEGER,
+    pres_get_actual INTEGER,
+    chan_get_actual INTEGER,
+    veto_attempt INTEGER NOT NULL,
+    last_round INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS president_action (
+    game_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    target TEXT,
+    num_lib INTEGER,
+    accuse INTEGER
+);
+CREATE INDEX IF NOT EXISTS game_id ON game (id);
+CREATE INDEX IF NOT EXISTS player_game_id ON player (game_id);
+CREATE INDEX IF NOT EXISTS player_name ON player (name);
+CREATE INDEX IF NOT EXISTS legislative_session_game_round ON legislative_session (game_id, round);
+CREATE INDEX IF NOT EXISTS president_action_game_round ON president_action (game_id, round);
+"""
+
+GAME_COLUMNS = "id, date, winning_team, win_reason"
+PLAYER_COLUMNS = "game_id, name, role"
+LEG_SESSION_COLUMNS = "game_id, round, president, chancellor, outcome, top_deck, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual, chan_get_actual, veto_attempt, last_round"
+PRES_ACTION_COLUMNS = "game_id, round, action, target, num_lib, accuse"
+
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """
+    Opens the database, creating or upgrading the tables if needed. Everything done in the block is committed at the end, or rolled back if it raises.
+    """
+    conn = sqlite3.connect(config.SQLITE_FILE_PATH)
+    try:
+        # Checked on every connection, since the file may have been deleted or replaced since the last one
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            _upgrade(conn)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _upgrade(conn: sqlite3.Connection) -> None:
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Another process may have upgraded the database in the meantime
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            return
+        if any(column[5] for column in conn.execute("PRAGMA table_info(game)")):
+            # Databases created before the schema was versioned made the game ID the primary key, which the CSV backend does not enforce
+            conn.execute("ALTER TABLE game RENAME TO game_old")
+            conn.execute(SCHEMA[:SCHEMA.index(";")])
+            conn.execute(f"INSERT INTO game ({GAME_COLUMNS}) SELECT {GAME_COLUMNS} FROM game_old ORDER BY rowid")
+            conn.execute("DROP TABLE game_old")
+        for statement in SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _optional(value: object, convert: type) -> object:
+    return None if value is None else convert(value)
+
+
+def _to_game(row: tuple) -> Game:
+    return Game(row[0], datetime.strptime(row[1], "%Y-%m-%d"), Party(row[2]), WinReason(row[3]))
+
+
+def _to_player(row: tuple) -> Player:
+    return Player(row[0], row[1], Role(row[2]))
+
+
+def _to_leg_session(row: tuple) -> LegislativeSession:
+    return LegislativeSession(row[0], row[1], row[2], row[3], LegislativeOutcome(row[4]), _optional(row[5], Party), row[6], row[7], row[8], row[9], row[10], bool(row[11]), bool(row[12]))
+
+
+def _to_pres_action(row: tuple) -> PresidentAction:
+    return PresidentAction(row[0], row[1], PresidentActionType(row[2]), row[3], row[4], _optional(row[5], bool))
+
+
+def _game_row(g: Game) -> tuple:
+    return (g.game_id, datetime.strftime(g.date, "%Y-%m-%d"), str(g.winning_team), str(g.win_reason))
+
+
+def _player_row(p: Player) -> tuple:
+    return (p.game_id, p.name, str(p.role))
+
+
+def _leg_session_row(ls: LegislativeSession) -> tuple:
+    # Missing names are stored as empty strings, which is what the CSV backend reads them back as
+    return (ls.game_id, ls.round_num, ls.pres_name or "", ls.chan_name or "", str(ls.outcome), _optional(ls.top_deck, str), ls.pres_get_claim, ls.pres_give_claim, ls.chan_get_claim, ls.pres_get_actual, ls.chan_get_actual, ls.veto_attempt, ls.last_round)
+
+
+def _pres_action_row(a: PresidentAction) -> tuple:
+    return (a.game_id, a.round_num, str(a.action), a.target_name, a.peek_claim, a.accuse)
+
+
+def _select(query: str, params: tuple = ()) -> list[tuple]:
+    with _connect() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def _placeholders(columns: str) -> str:
+    return ", ".join("?" for _ in columns.split(","))
+
+
+# ------------------------------------------------------------------------------
+# Read queries
+# ------------------------------------------------------------------------------
+def get_all_pres_actions() -> list[PresidentAction]:
+    return [_to_pres_action(r) for r in _select(f"SELECT {PRES_ACTION_COLUMNS} FROM president_action ORDER BY rowid")]
+
+
+def get_all_leg_sessions() -> list[LegislativeSession]:
+    return [_to_leg_session(r) for r in _select(f"SELECT {LEG_SESSION_COLUMNS} FROM legislative_session ORDER BY rowid")]
+
+
+def get_all_players() -> list[Player]:
+    return [_to_player(r) for r in _select(f"SELECT {PLAYER_COLUMNS} FROM player ORDER BY rowid")]
+
+
+def get_all_games() -> list[Game]:
+    return [_to_game(r) for r in _select(f"SELECT {GAME_COLUMNS} FROM game ORDER BY rowid")]
+
+
+def get_game_by_id(game_id: int) -> Game | None:
+    rows = _select(f"SELECT {GAME_COLUMNS} FROM game WHERE id = ? ORDER BY rowid DESC LIMIT 1", (game_id,))
+    return _to_game(rows[0]) if rows else None
+
+
+def get_games_by_id(game_id: int) -> list[Game]:
+    return [_to_game(r) for r in _select(f"SELECT {GAME_COLUMNS} FROM game WHERE id = ? ORDER BY rowid", (game_id,))]
+
+
+def get_players_in_game(game_id: int) -> list[Player]:
+    return [_to_player(r) for r in _select(f"SELECT {PLAYER_COLUMNS} FROM player WHERE game_id = ? ORDER BY rowid", (game_id,))]
+
+
+def get_players_by_name(name: str) -> list[Player]:
+    return [_to_player(r) for r in _select(f"SELECT {PLAYER_COLUMNS} FROM player WHERE name = ? ORDER BY rowid", (name,))]
+
+
+def get_leg_sessions_in_game(game_id: int) -> list[LegislativeSession]:
+    return [_to_leg_session(r) for r in _select(f"SELECT {LEG_SESSION_COLUMNS} FROM legislative_session WHERE game_id = ? ORDER BY rowid", (game_id,))]
+
+
+def get_pres_actions_in_game(game_id: int) -> list[PresidentAction]:
+    return [_to_pres_action(r) for r in _select(f"SELECT {PRES_ACTION_COLUMNS} FROM president_action WHERE game_id = ? ORDER BY rowid", (game_id,))]
+
+
+def count_games() -> int:
+    return _select("SELECT COUNT(*) FROM game")[0][0]
+
+
+def last_modified() -> float:
+    # Make sure the file exists
+    with _connect():
+        pass
+    return os.path.getmtime(config.SQLITE_FILE_PATH)
+
+
+# ------------------------------------------------------------------------------
+# Write queries
+# ------------------------------------------------------------------------------
+def save_game(g: Game) -> None:
+    with _connect() as conn:
+        conn.execute(f"INSERT INTO game ({GAME_COLUMNS}) VALUES ({_placeholders(GAME_COLUMNS)})", _game_row(g))
+
+
+def save_player(p: Player) -> None:
+    with _connect() as conn:
+        conn.execute(f"INSERT INTO player ({PLAYER_COLUMNS}) VALUES ({_placeholders(PLAYER_COLUMNS)})", _player_row(p))
+
+
+def save_leg_session(ls: LegislativeSession) -> None:
+    with _connect() as conn:
+        conn.execute(f"INSERT INTO legislative_session ({LEG_SESSION_COLUMNS}) VALUES ({_placeholders(LEG_SESSION_COLUMNS)})", _leg_session_row(ls))
+
+
+def save_pres_action(a: PresidentAction) -> None:
+    with _connect() as conn:
+        conn.execute(f"INSERT INTO president_action ({PRES_ACTION_COLUMNS}) VALUES ({_placeholders(PRES_ACTION_COLUMNS)})", _pres_action_row(a))
+
+
+@contextmanager
+def bulk_write() -> Iterator[Callable[..., None]]:
+    """
+    Replaces the contents of every table with the objects passed to the yielded function `add(games, players, leg_sessions, pres_actions)` in a single transaction, so readers see either the old data or the new data.
+    """
+    with _connect() as conn:
+        for table in ["game", "player", "legislative_session", "president_action"]:
+            conn.execute(f"DELETE FROM {table}")
+        def add(games: Iterable[Game] = (), players: Iterable[Player] = (), leg_sessions: Iterable[LegislativeSession] = (), pres_actions: Iterable[PresidentAction] = ()) -> None:
+            conn.executemany(f"INSERT INTO game ({GAME_COLUMNS}) VALUES ({_placeholders(GAME_COLUMNS)})", map(_game_row, games))
+            conn.executemany(f"INSERT INTO player ({PLAYER_COLUMNS}) VALUES ({_placeholders(PLAYER_COLUMNS)})", map(_player_row, players))
+            conn.executemany(f"INSERT INTO legislative_session ({LEG_SESSION_COLUMNS}) VALUES ({_placeholders(LEG_SESSION_COLUMNS)})", map(_leg_session_row, leg_sessions))
+            conn.executemany(f"INSERT INTO president_action ({PRES_ACTION_COLUMNS}) VALUES ({_placeholders(PRES_ACTION_COLUMNS)})", map(_pres_action_row, pres_actions))
+        yield add
+
+
+def replace_games(game_ids: Iterable[int], games: Iterable[Game], players: Iterable[Player], leg_sessions: Iterable[LegislativeSession], pres_actions: Iterable[PresidentAction]) -> None:
+    """
+    Deletes everything stored about the given games and saves the given objects in a single transaction.
+    """
+    game_ids = [(game_id,) for game_id in game_ids]
+    with _connect() as conn:
+        conn.executemany("DELETE FROM game WHERE id = ?", game_ids)
+        for table in ["player", "legislative_session", "president_action"]:
+            conn.executemany(f"DELETE FROM {table} WHERE game_id = ?", game_ids)
+        conn.executemany(f"INSERT INTO game ({GAME_COLUMNS}) VALUES ({_placeholders(GAME_COLUMNS)})", map(_game_row, games))
+        conn.executemany(f"INSERT INTO player ({PLAYER_COLUMNS}) VALUES ({_placeholders(PLAYER_COLUMNS)})", map(_player_row, players))
+        conn.executemany(f"INSERT INTO legislative_session ({LEG_SESSION_COLUMNS}) VALUES ({_placeholders(LEG_SESSION_COLUMNS)})", map(_leg_session_row, leg_sessions))
+        conn.executemany(f"INSERT INTO president_action ({PRES_ACTION_COLUMNS}) VALUES ({_placeholders(PRES_ACTION_COLUMNS)})", map(_pres_action_row, pres_actions))
+
+
+# ------------------------------------------------------------------------------
+# Delete queries
+# ------------------------------------------------------------------------------
+def _clear(table: str) -> None:
+    with _connect() as conn:
+        conn.execute(f"DELETE FROM {table}")
+
+
+def clear_pres_actions() -> None:
+    _clear("president_action")
+
+
+def clear_leg_sessions() -> None:
+    _clear("legislative_session")
+
+
+def clear_players() -> None:
+    _clear("player")
+
+
+def clear_games() -> None:
+    _clear("game")
@@ -2,25 +2,65 @@ from argparse import Namespace
 from data.models import is_valid, Game, LegislativeSession, LegislativeOutcome, Party, Player, PresidentAction, PresidentActionType, Role, WinReason
 from datetime import datetime
 from openpyxl import load_workbook
+from typing import Iterable, Iterator, NamedTuple, Sequence
 
 import config
 import data.repository as repo
+import glob
+import hashlib
+import json
+import os
+import tempfile
 
 
-def _read_spreadsheet(file: str) -> list[list]:
-    workbook = load_workbook(filename=file, data_only=True)
-    worksheet = workbook[config.WORKSHEET_NAME]
-    if worksheet.max_column != config.SPREADSHEET_NUM_COLS:
-        raise ValueError(f"Wrong number of columns in spreadsheet. Expected {config.SPREADSHEET_NUM_COLS} but received {worksheet.max_column}.")
-    data = []
-    for row in range(1, worksheet.max_row + 1):
-        row_data = [worksheet.cell(row=row, column=col).value for col in range(1, worksheet.max_column + 1)]
-        data.append(row_data)
-    return data
+# Increment when the hashes change so that old manifests are ignored
+MANIFEST_VERSION = 1
 
+# Position of each column in the spreadsheet
+COLUMNS = {column: i for (i, column) in enumerate(config.SPREADSHEET_HEADER) if column is not None}
 
-def _is_empty(row: list) -> bool:
-    return all([x is None for x in row])
+
+class GameData(NamedTuple):
+    """
+    Everything parsed from the block of rows of a single game.
+    """
+    games: list[Game]
+    players: list[Player]
+    leg_sessions: list[LegislativeSession]
+    pres_actions: list[PresidentAction]
+
+
+class ImportReport(NamedTuple):
+    inserted: list[int]
+    replaced: list[int]
+    deleted: list[int]
+    unchanged: int
+
+    def __str__(self) -> str:
+        lines = [f"Inserted {len(self.inserted)}, replaced {len(self.replaced)} and deleted {len(self.deleted)} games ({self.unchanged} unchanged)."]
+        for (label, game_ids) in [("Inserted", self.inserted), ("Replaced", self.replaced), ("Deleted", self.deleted)]:
+            if game_ids:
+                lines.append(f"{label}: {', '.join(str(g) for g in game_ids)}")
+        return "\n".join(lines)
+
+
+def _read_spreadsheet(file: str, sheet: str = config.WORKSHEET_NAME) -> Iterator[tuple]:
+    """
+    Yields the values in each row of the worksheet. The workbook is opened in read-only mode so that rows are read from the file as they are needed instead of all at once.
+    """
+    workbook = load_workbook(filename=file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet]
+        # Workbooks saved in write-only mode do not record their dimensions, in which case the rows are cut or padded to the expected width
+        if worksheet.max_column is not None and worksheet.max_column != config.SPREADSHEET_NUM_COLS:
+            raise ValueError(f"Wrong number of columns in spreadsheet. Expected {config.SPREADSHEET_NUM_COLS} but received {worksheet.max_column}.")
+        yield from worksheet.iter_rows(max_col=config.SPREADSHEET_NUM_COLS, values_only=True)
+    finally:
+        workbook.close()
+
+
+def _is_empty(row: Sequence) -> bool:
+    return all(x is None for x in row)
 
 
 def _is_date(date_str: str) -> bool:
@@ -33,26 +73,25 @@ def _is_date(date_str: str) -> bool:
         return False
 
 
-def _is_date_row(row: list[str]) -> bool:
+def _is_date_row(row: Sequence) -> bool:
     return _is_date(row[0]) and _is_empty(row[1:])
 
 
-def _is_header_row(row: list[str]) -> bool:
-    return row == config.SPREADSHEET_HEADER
+def _is_header_row(row: Sequence) -> bool:
+    return row[0] == config.SPREADSHEET_HEADER[0] and list(row) == config.SPREADSHEET_HEADER
 
 
-def _get_value(row: list, column: str):
-    index = config.SPREADSHEET_HEADER.index(column)
-    return row[index]
+def _get_value(row: Sequence, column: str):
+    return row[COLUMNS[column]]
 
 
-def _parse_data(data: list[list]) -> tuple[list[Game], list[Player], list[LegislativeSession], list[PresidentAction]]:
-    games = []
-    players = []
-    leg_sessions = []
-    pres_actions = []
+def _parse_rows(rows: Iterable[Sequence]) -> Iterator[GameData]:
+    """
+    Parses the rows of the spreadsheet one at a time and yields the objects of each game as soon as all of its rows have been read.
+    """
+    game_data = None
     new_game = False
-    for row in data:
+    for row in rows:
         if _is_empty(row):
             continue
         elif _is_date_row(row):
@@ -60,18 +99,20 @@ def _parse_data(data: list[list]) -> tuple[list[Game], list[Player], list[Legisl
         elif _is_header_row(row):
             new_game = True
         else:
-            # Save the new game
+            # Start the new game
             if new_game:
+                if game_data is not None:
+                    yield game_data
                 game_id = _get_value(row, "game")
                 winning_team = Party(_get_value(row, "winning_team"))
                 win_reason = WinReason(_get_value(row, "win_reason"))
-                games.append(Game(game_id, current_date, winning_team, win_reason))
+                game_data = GameData([Game(game_id, current_date, winning_team, win_reason)], [], [], [])
                 new_game = False
             # Add player if present
             player_name = _get_value(row, "player")
             player_role = _get_value(row, "role")
             if player_name is not None or player_role is not None:
-                players.append(Player(game_id, player_name, Role(player_role)))
+                game_data.players.append(Player(game_id, player_name, Role(player_role)))
             # Add legislative session if present
             round_num = _get_value(row, "round")
             if round_num is not None:
@@ -89,7 +130,7 @@ def _parse_data(data: list[list]) -> tuple[list[Game], list[Player], list[Legisl
                 last_round = False if not last_round_raw else last_round_raw
                 pres_get_actual = _get_value(row, "pres_get_actual")
                 chan_get_actual = _get_value(row, "chan_get_actual")
-                leg_sessions.append(LegislativeSession(game_id, round_num, pres_name, chan_name, outcome, top_deck, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual, chan_get_actual, veto_attempt, last_round))
+                game_data.leg_sessions.append(LegislativeSession(game_id, round_num, pres_name, chan_name, outcome, top_deck, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual, chan_get_actual, veto_attempt, last_round))
                 # Add president action if present
                 pres_action = _get_value(row, "pres_action")
                 if pres_action is not None:
@@ -97,27 +138,153 @@ def _parse_data(data: list[list]) -> tuple[list[Game], list[Player], list[Legisl
                     target_name = _get_value(row, "target")
                     num_lib = _get_value(row, "num_lib")
                     accuse = _get_value(row, "accuse")
-                    pres_actions.append(PresidentAction(game_id, round_num, action, target_name, num_lib, accuse))
+                    game_data.pres_actions.append(PresidentAction(game_id, round_num, action, target_name, num_lib, accuse))
+    if game_data is not None:
+        yield game_data
+
+
+def _parse_data(data: Iterable[Sequence]) -> tuple[list[Game], list[Player], list[LegislativeSession], list[PresidentAction]]:
+    games = []
+    players = []
+    leg_sessions = []
+    pres_actions = []
+    for game_data in _parse_rows(data):
+        games.extend(game_data.games)
+        players.extend(game_data.players)
+        leg_sessions.extend(game_data.leg_sessions)
+        pres_actions.extend(game_data.pres_actions)
     return games, players, leg_sessions, pres_actions
 
 
+def _validate(games: Iterable[GameData]) -> Iterator[GameData]:
+    for game_data in games:
+        if not is_valid(*game_data):
+            raise ValueError(f"Invalid data for game {game_data.games[0].game_id}.")
+        yield game_data
+
+
+def _hash_game(game_data: GameData) -> str:
+    """
+    Hashes everything parsed from a game's block of the spreadsheet, including the date of the game.
+    """
+    content = [[sorted((k, repr(v)) for (k, v) in vars(obj).items()) for obj in objects] for objects in game_data]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+def _load_manifest() -> dict[int, str] | None:
+    """
+    Returns the hash of each stored game, or None if they are unknown or the data was changed by something other than an import since they were saved.
+    """
+    try:
+        with open(config.IMPORT_MANIFEST_PATH, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("data_version") != repo.last_modified():
+        return None
+    return {int(game_id): h for (game_id, h) in manifest["games"].items()}
+
+
+def _save_manifest(hashes: dict[int, str]) -> None:
+    manifest = {"version": MANIFEST_VERSION, "data_version": repo.last_modified(), "games": hashes}
+    # A unique temporary file, so that concurrent imports do not overwrite each other's manifest before it is complete
+    folder, name = os.path.split(config.IMPORT_MANIFEST_PATH)
+    fd, temp_file = tempfile.mkstemp(dir=folder or ".", prefix=f"{name}.", suffix=".tmp")
+    try:
+        with open(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_file, config.IMPORT_MANIFEST_PATH)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+
+
+def import_incremental(games: Iterable[GameData], old_hashes: dict[int, str]) -> ImportReport:
+    """
+    Saves only the games whose content changed since the last import, given the hashes saved by that import, and deletes the games that are no longer in the spreadsheet. Only the changed games are kept in memory.
+    """
+    new_hashes = {}
+    changed = []
+    for game_data in games:
+        game_id = game_data.games[0].game_id
+        new_hashes[game_id] = _hash_game(game_data)
+        if new_hashes[game_id] != old_hashes.get(game_id):
+            changed.append(game_data)
+    inserted = [g.games[0].game_id for g in changed if g.games[0].game_id not in old_hashes]
+    replaced = [g.games[0].game_id for g in changed if g.games[0].game_id in old_hashes]
+    deleted = [g for g in old_hashes if g not in new_hashes]
+    if changed or deleted:
+        new_objects = [[obj for game_data in changed for obj in game_data[i]] for i in range(len(GameData._fields))]
+        repo.replace_games(inserted + replaced + deleted, *new_objects)
+    _save_manifest(new_hashes)
+    return ImportReport(inserted, replaced, deleted, len(new_hashes) - len(changed))
+
+
+def import_all(games: Iterable[GameData]) -> list[int]:
+    """
+    Replaces all the stored data, writing each game as soon as it has been parsed. Returns the number of games, players, legislative sessions and president actions saved.
+    """
+    hashes = {}
+    counts = [0, 0, 0, 0]
+    with repo.bulk_write() as add:
+        for game_data in games:
+            add(*game_data)
+            hashes[game_data.games[0].game_id] = _hash_game(game_data)
+            counts = [c + len(objects) for (c, objects) in zip(counts, game_data)]
+    _save_manifest(hashes)
+    return counts
+
+
+def _find_sources(files: list[str], sheets: list[str]) -> list[tuple[str, str]]:
+    """
+    Returns every (file, worksheet) pair to import. Glob patterns are expanded in alphabetical order.
+    """
+    found = []
+    for pattern in files:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise ValueError(f"No file matches '{pattern}'.")
+        found.extend(f for f in matches if f not in found)
+    return [(file, sheet) for file in found for sheet in sheets]
+
+
+def _parse_sheet(file: str, sheet: str) -> list[GameData]:
+    return list(_parse_rows(_read_spreadsheet(file, sheet)))
+
+
+def _read_sources(sources: list[tuple[str, str]], workers: int) -> Iterator[GameData]:
+    """
+    Yields the games in the worksheets. A single worksheet is streamed. Several worksheets are parsed in parallel and their games are merged in order of game ID. Raises an error if a game ID is used more than once.
+    """
+    if len(sources) == 1:
+        games = ((sources[0], g) for g in _parse_rows(_read_spreadsheet(*sources[0])))
+    else:
+        # Only needed (and only worth its import time) for several worksheets
+        import prediction.parallel as parallel
+        workers = min(parallel.num_workers(workers), len(sources))
+        parsed = parallel.imap(_parse_sheet, sources, workers, initializer=None)
+        games = sorted([(source, g) for (source, sheet_games) in zip(sources, parsed) for g in sheet_games], key=lambda x: x[1].games[0].game_id)
+    seen = {}
+    for ((file, sheet), game_data) in games:
+        game_id = game_data.games[0].game_id
+        if game_id in seen:
+            other_file, other_sheet = seen[game_id]
+            raise ValueError(f"Game {game_id} is in both sheet '{other_sheet}' of '{other_file}' and sheet '{sheet}' of '{file}'.")
+        seen[game_id] = (file, sheet)
+        yield game_data
+
+
 def main(args: Namespace) -> None:
-    file = args.file
-    print(f"Starting to import data from '{file}'.")
-    data = _read_spreadsheet(file)
-    games, players, leg_sessions, pres_actions = _parse_data(data)
-    if is_valid(games, players, leg_sessions, pres_actions):
-        repo.clear_all()
-        print(f"Saving {len(games)} games.")
-        for g in games:
-            repo.save_game(g)
-        print(f"Saving {len(players)} players.")
-        for p in players:
-            repo.save_player(p)
-        print(f"Saving {len(leg_sessions)} legislative sessions.")
-        for ls in leg_sessions:
-            repo.save_leg_session(ls)
-        print(f"Saving {len(pres_actions)} president actions.")
-        for a in pres_actions:
-            repo.save_pres_action(a)
+    sources = _find_sources(args.file, args.sheet)
+    for (file, sheet) in sources:
+        print(f"Starting to import data from sheet '{sheet}' of '{file}'.")
+    games = _validate(_read_sources(sources, args.workers))
+    old_hashes = _load_manifest() if args.incremental else None
+    if old_hashes is not None:
+        print(import_incremental(games, old_hashes))
+    else:
+        if args.incremental:
+            print("The stored data was not imported from a spreadsheet or was changed since: importing everything.")
+        num_games, num_players, num_leg_sessions, num_pres_actions = import_all(games)
+        print(f"Saved {num_games} games, {num_players} players, {num_leg_sessions} legislative sessions and {num_pres_actions} president actions.")
     print("Import complete.")
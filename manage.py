@@ -1,12 +1,20 @@
 from __future__ import annotations
-from argparse import _SubParsersAction, ArgumentParser
+from argparse import _SubParsersAction, ArgumentParser, Namespace
+from typing import Callable
 
 import argparse
 import config
-import data.sync as sync
+import importlib
 import os
-import prediction.predict as predict
-import stats.display_stats as display_stats
+
+
+def _lazy(module: str, func: str) -> Callable[[Namespace], None]:
+    """
+    Returns a function which imports the module only when the subcommand runs, so that each subcommand only loads its own dependencies.
+    """
+    def run(args: Namespace) -> None:
+        getattr(importlib.import_module(module), func)(args)
+    return run
 
 
 def _try_add_private_subparsers(subparsers: _SubParsersAction[ArgumentParser]) -> None:
@@ -22,29 +30,117 @@ def _try_add_private_subparsers(subparsers: _SubParsersAction[ArgumentParser]) -
 
 def _add_import_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
     import_parser = subparsers.add_parser("import", help="Import data from a spreadsheet.")
-    import_parser.add_argument("--file", "-f", required=False, default=config.WORKBOOK_NAME, help="File from which to import the data.")
-    import_parser.set_defaults(func=sync.main)
+    import_parser.add_argument("--file", "-f", nargs="+", required=False, default=[config.WORKBOOK_NAME], help="Files (or glob patterns) from which to import the data.")
+    import_parser.add_argument("--sheet", "-s", nargs="+", default=[config.WORKSHEET_NAME], help="Worksheets to import from each file.")
+    import_parser.add_argument("--workers", "-w", type=int, default=0, help="Number of worker processes parsing the worksheets when there are several (0 for one per CPU core).")
+    import_parser.add_argument("--incremental", "-i", action="store_true", help="Only save the games which changed since the last import.")
+    import_parser.set_defaults(func=_lazy("data.sync", "main"))
+
+
+def _add_migrate_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
+    migrate_parser = subparsers.add_parser("migrate", help="Copy the data to another storage backend.")
+    migrate_parser.add_argument("--to", choices=["sqlite", "csv"], default="sqlite", help="Backend to which to copy the data (from the other one).")
+    migrate_parser.set_defaults(func=_lazy("data.migrate", "main"))
 
 
 def _add_predict_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
     predict_parser = subparsers.add_parser("predict", help="Predict roles in a game.")
     predict_parser.add_argument("--game", "-g", type=int, default=-1, help="Game for which to make the prediction")
     predict_parser.add_argument("--round", "-r", type=int, default=-1, help="Number of rounds to use in the prediction.")
-    predict_parser.set_defaults(func=predict.main)
+    predict_parser.add_argument("--engine", "-e", choices=config.ENGINE_NAMES, default=None, help="How to evaluate the role assignments (batch by default).")
+    predict_parser.add_argument("--workers", "-w", type=int, default=1, help="Number of worker processes (0 for one per CPU core).")
+    predict_parser.add_argument("--fascists", type=int, default=None, help="Number of Fascists other than Hitler, for house-rule games (standard for the number of players by default).")
+    approximate_group = predict_parser.add_mutually_exclusive_group()
+    approximate_group.add_argument("--samples", type=int, default=0, help="Estimate the probabilities from this many sampled role assignments instead of evaluating all of them (0 to evaluate all of them).")
+    approximate_group.add_argument("--beam", type=int, default=0, help="Keep only this many partial role assignments after each round (0 to evaluate every assignment).")
+    predict_parser.add_argument("--chains", type=int, default=None, help="Number of independent sampling chains (8 by default).")
+    predict_parser.add_argument("--beam-ratio", type=float, default=None, help="With --beam, also discard partial role assignments whose log-probability is more than this below the best one (no limit by default).")
+    predict_parser.add_argument("--seed", type=int, default=None, help="Seed for sampling (0 by default).")
+    predict_parser.add_argument("--no-prune", action="store_true", help="Evaluate every role assignment, including those ruled out by the game record.")
+    predict_parser.add_argument("--follow", action="store_true", help="Keep running and update the prediction as new rounds are saved. Cannot be combined with --round, --engine, --workers, --samples, --beam, --chains, --seed, --beam-ratio, --no-prune or --output show.")
+    predict_parser.add_argument("--interval", type=float, default=2.0, help="Seconds between checks for new rounds in follow mode.")
+    predict_parser.add_argument("--output", "-o", choices=["show", "json", "csv", "png", "none"], default=None, help="Show the chart in a window, save the prediction as JSON, CSV or a PNG chart, or only print the tables (show by default, none with --follow).")
+    predict_parser.add_argument("--file", "-f", default=None, help="File in which to save the prediction (prediction.<output> by default).")
+    predict_parser.set_defaults(func=_lazy("prediction.predict", "main"))
+
+
+def _add_backtest_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
+    backtest_parser = subparsers.add_parser("backtest", help="Score predictions for stored games against the true roles.")
+    backtest_parser.add_argument("--start", type=int, default=0, help="First game to include.")
+    backtest_parser.add_argument("--end", type=int, default=-1, help="Last game to include (all remaining games by default).")
+    backtest_parser.add_argument("--rounds", default="last", help="Round to predict in each game: 'last', 'half', or a round number.")
+    backtest_parser.add_argument("--engine", "-e", choices=config.ENGINE_NAMES, default="batch", help="How to evaluate the role assignments.")
+    backtest_parser.add_argument("--workers", "-w", type=int, default=0, help="Number of worker processes (0 for one per CPU core).")
+    backtest_parser.add_argument("--no-prune", action="store_true", help="Evaluate every role assignment, including those ruled out by the game record.")
+    backtest_parser.add_argument("--checkpoint", "-c", default=None, help="File in which to save results as they are computed. Games already in the file are skipped.")
+    backtest_parser.set_defaults(func=_lazy("prediction.backtest", "main"))
+
+
+def _add_benchmark_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
+    benchmark_parser = subparsers.add_parser("benchmark", help="Time the app on generated datasets.")
+    benchmark_subparsers = benchmark_parser.add_subparsers()
+    run_parser = benchmark_subparsers.add_parser("run", help="Run the benchmarks and save the results.")
+    run_parser.add_argument("--sizes", "-s", nargs="+", default=None, help="Datasets on which to run the benchmarks: 100, 10k or 100k (all of them by default).")
+    run_parser.add_argument("--cases", nargs="+", default=None, help="Patterns (e.g. 'repository.*') selecting the benchmarks to run.")
+    run_parser.add_argument("--repeat", "-n", type=int, default=3, help="Number of times to run each benchmark. The fastest run is kept.")
+    run_parser.add_argument("--no-limits", action="store_true", help="Also run slow benchmarks on datasets larger than their default limit.")
+    run_parser.add_argument("--output", "-o", default=None, help="File in which to save the results (named after the current commit by default).")
+    run_parser.set_defaults(func=_lazy("benchmarks.run", "run"))
+    compare_parser = benchmark_subparsers.add_parser("compare", help="Compare the results of two runs.")
+    compare_parser.add_argument("old", help="Results of the reference run.")
+    compare_parser.add_argument("new", help="Results of the run to check.")
+    compare_parser.add_argument("--threshold", "-t", type=float, default=0.1, help="Relative slowdown above which a benchmark is reported as a regression.")
+    compare_parser.set_defaults(func=_lazy("benchmarks.run", "compare"))
+
+
+def _add_simulate_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
+    simulate_parser = subparsers.add_parser("simulate", help="Generate synthetic games from the probability model.")
+    simulate_parser.add_argument("--games", "-n", type=int, default=1000, help="Number of games to generate.")
+    simulate_parser.add_argument("--seed", "-s", type=int, default=0, help="Seed of the random number generator. The same seed always gives the same games.")
+    simulate_parser.add_argument("--players", "-p", type=int, nargs="+", choices=range(5, 11), default=list(range(5, 11)), help="Possible numbers of players in each game.")
+    simulate_parser.add_argument("--workers", "-w", type=int, default=1, help="Number of worker processes (0 for one per CPU core).")
+    output_group = simulate_parser.add_mutually_exclusive_group()
+    output_group.add_argument("--output", "-o", default=config.SIMULATED_DATA_FOLDER, help=f"Folder in which to save the games ({config.SIMULATED_DATA_FOLDER} by default).")
+    output_group.add_argument("--replace-data", action="store_true", help="Save the games in place of the imported data.")
+    simulate_parser.set_defaults(func=_lazy("prediction.simulate", "main"))
+
+
+def _add_serve_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
+    serve_parser = subparsers.add_parser("serve", help="Answer prediction requests over HTTP, keeping the data and model in memory.")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address on which to listen.")
+    serve_parser.add_argument("--port", "-p", type=int, default=8765, help="Port on which to listen.")
+    serve_parser.add_argument("--workers", "-w", type=int, default=1, help="Number of worker processes computing predictions (0 for one per CPU core).")
+    serve_parser.set_defaults(func=_lazy("prediction.server", "serve"))
+
+
+def _add_client_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
+    client_parser = subparsers.add_parser("client", help="Request a prediction from a running server.")
+    client_parser.add_argument("--game", "-g", type=int, default=-1, help="Game for which to make the prediction")
+    client_parser.add_argument("--round", "-r", type=int, default=-1, help="Number of rounds to use in the prediction.")
+    client_parser.add_argument("--engine", "-e", choices=config.ENGINE_NAMES, default="batch", help="How to evaluate the role assignments.")
+    client_parser.add_argument("--host", default="127.0.0.1", help="Address of the server.")
+    client_parser.add_argument("--port", "-p", type=int, default=8765, help="Port of the server.")
+    client_parser.set_defaults(func=_lazy("prediction.client", "main"))
 
 
 def _add_stats_parser(subparsers: _SubParsersAction[ArgumentParser]) -> None:
     stats_parser = subparsers.add_parser("stats", help="Display stats.")
     stats_parser.add_argument("table", type=str, help="Which statistics to display.")
-    stats_parser.set_defaults(func=display_stats.main)
+    stats_parser.set_defaults(func=_lazy("stats.display_stats", "main"))
 
 
 def main():
     parser = argparse.ArgumentParser(description="Predict player roles in Secret Hitler.")
     subparsers = parser.add_subparsers()
     _add_import_parser(subparsers)
+    _add_migrate_parser(subparsers)
     _add_predict_parser(subparsers)
+    _add_backtest_parser(subparsers)
+    _add_simulate_parser(subparsers)
+    _add_serve_parser(subparsers)
+    _add_client_parser(subparsers)
     _add_stats_parser(subparsers)
+    _add_benchmark_parser(subparsers)
     _try_add_private_subparsers(subparsers)
     args = parser.parse_args()
     args.func(args)
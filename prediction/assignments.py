@@ -0,0 +1,189 @@
+"""
+Enumerates the possible role assignments in a game.
+
+A role assignment is encoded as a single integer: the index of Hitler in the list of players in the lowest `HITLER_BITS` bits, and a bitmask of the vanilla Fascists (bit i is set if player i is Fascist) in the bits above. The assignments are ordered by Hitler and then by the set of Fascists in lexicographic order, and `rank` and `unrank` convert between an assignment and its position in that order, so any range of assignments can be generated (e.g. by a worker process) without generating the ones before it.
+"""
+
+from data.models import Role
+from typing import Iterator
+from utils.game import num_players_with_role
+
+import math
+import numpy as np
+import prediction.pmodel.utils as utils
+
+
+# Number of bits used to store the index of Hitler
+HITLER_BITS = 6
+HITLER_MASK = (1 << HITLER_BITS) - 1
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _default_num_fas(num_players: int, num_fas: int | None) -> int:
+    return num_players_with_role(Role.FAS, num_players) if num_fas is None else num_fas
+
+
+def _rank_combination(combination: list[int], n: int) -> int:
+    """
+    Returns the position of the given combination (in increasing order) among all combinations of the same size of `n` items, in lexicographic order.
+    """
+    k = len(combination)
+    rank = 0
+    previous = -1
+    for (i, c) in enumerate(combination):
+        # Number of combinations whose i-th item is between the previous item and c (exclusive)
+        rank += math.comb(n - previous - 1, k - i) - math.comb(n - c, k - i)
+        previous = c
+    return rank
+
+
+def _unrank_combination(rank: int, n: int, k: int) -> list[int]:
+    combination = []
+    c = 0
+    for i in range(k):
+        while True:
+            count = math.comb(n - c - 1, k - i - 1)
+            if rank < count:
+                break
+            rank -= count
+            c += 1
+        combination.append(c)
+        c += 1
+    return combination
+
+
+def _next_combination(combination: list[int], n: int) -> bool:
+    """
+    Replaces the combination with the next one in lexicographic order. Returns False if it was the last one.
+    """
+    k = len(combination)
+    i = k - 1
+    while i >= 0 and combination[i] == n - k + i:
+        i -= 1
+    if i < 0:
+        return False
+    combination[i] += 1
+    for j in range(i + 1, k):
+        combination[j] = combination[j - 1] + 1
+    return True
+
+
+def _fas_mask(combination: list[int], hitler: int) -> int:
+    # The combination indexes the players other than Hitler
+    mask = 0
+    for c in combination:
+        mask |= 1 << (c if c < hitler else c + 1)
+    return mask
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def encode(hitler: int, fas_mask: int) -> int:
+    return hitler | (fas_mask << HITLER_BITS)
+
+
+def decode(code: int) -> tuple[int, int]:
+    """
+    Returns the index of Hitler and the bitmask of the Fascists.
+    """
+    return code & HITLER_MASK, code >> HITLER_BITS
+
+
+def is_valid(code: int, num_players: int, num_fas: int | None = None) -> bool:
+    """
+    Returns True if the given code is one of the assignments generated for the given number of players.
+    """
+    num_fas = _default_num_fas(num_players, num_fas)
+    hitler, fas_mask = decode(code)
+    return hitler < num_players and fas_mask >> num_players == 0 and not fas_mask >> hitler & 1 and bin(fas_mask).count("1") == num_fas
+
+
+def num_role_assignments(num_players: int, num_fas: int | None = None) -> int:
+    num_fas = _default_num_fas(num_players, num_fas)
+    return num_players * math.comb(num_players - 1, num_fas)
+
+
+def rank(code: int, num_players: int, num_fas: int | None = None) -> int:
+    """
+    Returns the position of the given assignment in the enumeration order.
+    """
+    num_fas = _default_num_fas(num_players, num_fas)
+    hitler, fas_mask = decode(code)
+    combination = [i if i < hitler else i - 1 for i in range(num_players) if fas_mask >> i & 1]
+    return hitler * math.comb(num_players - 1, num_fas) + _rank_combination(combination, num_players - 1)
+
+
+def unrank(index: int, num_players: int, num_fas: int | None = None) -> int:
+    """
+    Returns the assignment at the given position in the enumeration order.
+    """
+    num_fas = _default_num_fas(num_players, num_fas)
+    hitler, index = divmod(index, math.comb(num_players - 1, num_fas))
+    return encode(hitler, _fas_mask(_unrank_combination(index, num_players - 1, num_fas), hitler))
+
+
+def iter_codes(num_players: int, start: int = 0, stop: int | None = None, num_fas: int | None = None) -> Iterator[int]:
+    """
+    Lazily generates the assignments from position `start` to `stop` (exclusive, all remaining assignments by default).
+    """
+    num_fas = _default_num_fas(num_players, num_fas)
+    total = num_role_assignments(num_players, num_fas)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+    per_hitler = math.comb(num_players - 1, num_fas)
+    hitler, index = divmod(start, per_hitler)
+    combination = _unrank_combination(index, num_players - 1, num_fas)
+    for _ in range(stop - start):
+        yield encode(hitler, _fas_mask(combination, hitler))
+        if not _next_combination(combination, num_players - 1):
+            hitler += 1
+            combination = list(range(num_fas))
+
+
+def code_array(num_players: int, start: int = 0, stop: int | None = None, num_fas: int | None = None) -> np.ndarray:
+    """
+    Same as `iter_codes`, but returns the assignments as a NumPy array.
+    """
+    return np.fromiter(iter_codes(num_players, start, stop, num_fas), dtype=np.int64)
+
+
+def role_matrix(codes: np.ndarray, num_players: int) -> np.ndarray:
+    """
+    Expands the given assignments into an integer matrix with one row per assignment and one column per player, using the encoding in `utils.ROLE_INDEX`.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    roles = np.full((len(codes), num_players), utils.ROLE_INDEX[Role.LIB], dtype=np.int8)
+    is_fas = (codes[:, np.newaxis] >> (HITLER_BITS + np.arange(num_players))) & 1
+    roles[is_fas == 1] = utils.ROLE_INDEX[Role.FAS]
+    roles[np.arange(len(codes)), codes & HITLER_MASK] = utils.ROLE_INDEX[Role.HIT]
+    return roles
+
+
+def to_dict(code: int, player_names: list[str]) -> dict[str, Role]:
+    hitler, fas_mask = decode(int(code))
+    role = {}
+    for (i, name) in enumerate(player_names):
+        if i == hitler:
+            role[name] = Role.HIT
+        elif fas_mask >> i & 1:
+            role[name] = Role.FAS
+        else:
+            role[name] = Role.LIB
+    return role
+
+
+def from_dict(role: dict[str, Role], player_names: list[str]) -> int:
+    hitlers = [i for (i, name) in enumerate(player_names) if role[name] == Role.HIT]
+    if len(hitlers) != 1:
+        raise ValueError(f"Expected exactly one Hitler but found {len(hitlers)}.")
+    hitler = hitlers[0]
+    fas_mask = sum(1 << i for (i, name) in enumerate(player_names) if role[name] == Role.FAS)
+    return encode(hitler, fas_mask)
+
+
+def get_all_role_assignments(player_names: list[str]) -> list[dict[str, Role]]:
+    return [to_dict(code, player_names) for code in iter_codes(len(player_names))]
@@ -0,0 +1,160 @@
+"""
+Runs the prediction for every stored game (or a range of games) and scores it against the true roles.
+"""
+
+from argparse import Namespace
+from prediction.history import get_game
+from prediction.pmodel.utils import ROLES
+from utils.progress_bar import ProgressBar
+
+import data.repository as re
+import json
+import math
+import numpy as np
+import os
+import pandas as pd
+import prediction.assignments as assignments
+import prediction.engines as engines
+import prediction.parallel as parallel
+import prediction.pruning as pruning
+import time
+
+
+# Probability of the true assignment used in the log loss if the model gives it probability 0
+MIN_PROBABILITY = 1e-15
+
+# Functions which pick the round to predict from the last round that can be used
+ROUND_POLICIES = {
+    "last": lambda last_round: last_round,
+    "half": lambda last_round: math.ceil(last_round / 2),
+}
+
+
+def _prediction_round(policy: str, last_round: int) -> int:
+    if policy in ROUND_POLICIES:
+        return ROUND_POLICIES[policy](last_round)
+    return min(int(policy), last_round)
+
+
+def _score(codes: np.ndarray, probabilities: list[float], true_code: int, num_players: int) -> dict[str, float]:
+    """
+    Scores the prediction against the true roles. Assignments missing from `codes` (e.g. pruned ones) have probability 0.
+    """
+    if not assignments.is_valid(true_code, num_players):
+        raise ValueError("The true roles are not a valid role assignment.")
+    total_probability = sum(probabilities)
+    if total_probability == 0:
+        raise ValueError("Every role assignment has probability 0.")
+    posterior = np.array(probabilities) / total_probability
+    true_index = np.flatnonzero(codes == true_code)
+    p_true = float(posterior[true_index[0]]) if len(true_index) > 0 else 0.0
+    # Brier score of the individual role probabilities, averaged over players
+    roles = assignments.role_matrix(codes, num_players)
+    true_roles = assignments.role_matrix([true_code], num_players)[0]
+    brier = 0
+    for i in range(num_players):
+        for role in range(len(ROLES)):
+            p = posterior[roles[:, i] == role].sum()
+            brier += (p - (1 if role == true_roles[i] else 0))**2
+    return {
+        "log_loss": -math.log(max(p_true, MIN_PROBABILITY)),
+        "brier": float(brier / num_players),
+        "rank": 1 + int(np.sum(posterior > p_true)),
+        "assignments": assignments.num_role_assignments(num_players),
+    }
+
+
+def _settings(round_policy: str, engine: str, prune: bool) -> dict:
+    """
+    Returns every option which affects the result of a game, as saved with it in the checkpoint file.
+    """
+    return {"round_policy": round_policy, "engine": engine, "prune": prune}
+
+
+def _backtest_game(game_id: int, round_policy: str, engine: str, prune: bool) -> dict:
+    result = {"game": game_id, **_settings(round_policy, engine, prune)}
+    try:
+        _, players, leg_sessions, pres_actions = get_game(game_id, -1)
+        round_num = _prediction_round(round_policy, max(ls.round_num for ls in leg_sessions))
+        leg_sessions = [ls for ls in leg_sessions if ls.round_num <= round_num]
+        pres_actions = [a for a in pres_actions if a.round_num <= round_num]
+        player_names = [p.name for p in players]
+        if prune:
+            codes, _ = pruning.surviving_codes(leg_sessions, pres_actions, player_names)
+        else:
+            codes = assignments.code_array(len(player_names))
+        if len(codes) == 0:
+            raise ValueError("Every role assignment has probability 0.")
+        probabilities, _ = engines.ENGINES[engine](leg_sessions, pres_actions, player_names, codes, None)
+        result["round"] = round_num
+        true_code = assignments.from_dict({p.name: p.role for p in players}, player_names)
+        result.update(_score(codes, probabilities, true_code, len(player_names)))
+    except (IndexError, ValueError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def _read_checkpoint(file: str | None, settings: dict) -> dict[int, dict]:
+    """
+    Returns the results saved in the checkpoint file which were made with the same settings (see `_settings`).
+    """
+    if file is None or not os.path.exists(file):
+        return {}
+    results = {}
+    with open(file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if all(result.get(key) == value for (key, value) in settings.items()):
+                results[result["game"]] = result
+    return results
+
+
+def _display_results(results: list[dict]) -> None:
+    errors = [r for r in results if "error" in r]
+    scored = [r for r in results if "error" not in r]
+    pd.set_option(
+        "display.max_rows", None,
+        "display.max_columns", None,
+        "display.width", None)
+    print()
+    if scored:
+        df = pd.DataFrame(scored, columns=["game", "round", "assignments", "log_loss", "brier", "rank"])
+        print(df.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        print()
+        print(f"Games scored: {len(scored)}")
+        print(f"Mean log loss: {df['log_loss'].mean():.3f}")
+        print(f"Mean Brier score: {df['brier'].mean():.3f}")
+        print(f"Mean rank of true assignment: {df['rank'].mean():.1f}")
+        print(f"True assignment ranked first: {(df['rank'] == 1).mean():.1%}")
+    for r in errors:
+        print(f"Skipped game {r['game']}: {r['error']}")
+
+
+def main(args: Namespace) -> None:
+    game_ids = [g.game_id for g in re.get_all_games() if args.start <= g.game_id and (args.end < 0 or g.game_id <= args.end)]
+    done = _read_checkpoint(args.checkpoint, _settings(args.rounds, args.engine, not args.no_prune))
+    todo = [gid for gid in game_ids if gid not in done]
+    print(f"Backtesting {len(game_ids)} games ({len(game_ids) - len(todo)} already in checkpoint).")
+    results = [done[gid] for gid in game_ids if gid in done]
+    start_time = time.perf_counter()
+    if todo:
+        checkpoint = open(args.checkpoint, "a") if args.checkpoint else None
+        progress_bar = ProgressBar(len(todo))
+        try:
+            tasks = [(gid, args.rounds, args.engine, not args.no_prune) for gid in todo]
+            for (i, result) in enumerate(parallel.imap(_backtest_game, tasks, args.workers), start=1):
+                results.append(result)
+                if checkpoint is not None:
+                    checkpoint.write(json.dumps(result) + "\n")
+                    checkpoint.flush()
+                progress_bar.update(i)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+    elapsed = time.perf_counter() - start_time
+    results.sort(key=lambda r: r["game"])
+    _display_results(results)
+    if todo:
+        print(f"Evaluated {len(todo)} games in {elapsed:.1f} s ({len(todo) / elapsed:.1f} games/s).")
@@ -0,0 +1,26 @@
+"""
+Requests predictions from a server started with `python manage.py serve`. Only uses the standard library so that it starts quickly.
+"""
+
+from argparse import Namespace
+from urllib.parse import urlencode
+
+import json
+import sys
+import urllib.error
+import urllib.request
+
+
+def main(args: Namespace) -> None:
+    query = {"game": args.game, "round": args.round, "engine": args.engine}
+    url = f"http://{args.host}:{args.port}/predict?{urlencode(query)}"
+    try:
+        with urllib.request.urlopen(url) as response:
+            result = json.load(response)
+    except urllib.error.HTTPError as e:
+        print(json.load(e)["error"])
+        sys.exit(1)
+    except urllib.error.URLError as e:
+        print(f"Could not reach the server at {args.host}:{args.port} ({e.reason}). Start it with 'python manage.py serve'.")
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
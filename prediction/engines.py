@@ -0,0 +1,64 @@
+"""
+Engines which calculate the probability of a game given each role assignment in a list.
+
+The role assignments are given as an array of codes from `prediction.assignments`. Every engine returns the probabilities in the same order as the role assignments, along with statistics on shared work (if the engine keeps any).
+"""
+
+from data.models import LegislativeSession, PresidentAction
+from prediction.pmodel.prefix import PrefixStats
+from utils.progress_bar import ProgressBar
+
+import numpy as np
+import prediction.assignments as assignments
+import prediction.parallel as parallel
+import prediction.pmodel.batch as batch
+import prediction.pmodel.pmodel as pmodel
+import prediction.pmodel.prefix as prefix
+
+
+def _scalar_probabilities(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], codes: np.ndarray, progress_bar: ProgressBar | None) -> tuple[list[float], PrefixStats | None]:
+    probabilities = []
+    for (i, code) in enumerate(codes, start=1):
+        probabilities.append(pmodel.prob_game_given_roles(leg_sessions, pres_actions, assignments.to_dict(code, player_names)))
+        if progress_bar is not None:
+            progress_bar.update(i)
+    return probabilities, None
+
+
+def _batch_probabilities(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], codes: np.ndarray, progress_bar: ProgressBar | None) -> tuple[list[float], PrefixStats | None]:
+    roles = assignments.role_matrix(codes, len(player_names))
+    return batch.prob_game_given_role_matrix(leg_sessions, pres_actions, player_names, roles).tolist(), None
+
+
+def _prefix_probabilities(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], codes: np.ndarray, progress_bar: ProgressBar | None) -> tuple[list[float], PrefixStats | None]:
+    role_assignments = [assignments.to_dict(code, player_names) for code in codes]
+    return prefix.prob_game_given_roles_shared(leg_sessions, pres_actions, role_assignments)
+
+
+ENGINES = {
+    "batch": _batch_probabilities,
+    "prefix": _prefix_probabilities,
+    "scalar": _scalar_probabilities,
+}
+
+
+def evaluate(engine: str, leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], codes: np.ndarray, workers: int = 1) -> tuple[list[float], PrefixStats | None]:
+    """
+    Calculates the probability of the game given each role assignment using the given engine. With more than one worker, the role assignments are split into contiguous chunks which are evaluated in separate processes and merged back in their original order.
+    """
+    func = ENGINES[engine]
+    workers = parallel.num_workers(workers)
+    if workers == 1:
+        return func(leg_sessions, pres_actions, player_names, codes, ProgressBar(len(codes)))
+    # Use a few chunks per worker so that uneven chunks are balanced out
+    chunks = parallel.split(codes, 4 * workers)
+    args = [(leg_sessions, pres_actions, player_names, chunk, None) for chunk in chunks]
+    probabilities = []
+    stats = None
+    progress_bar = ProgressBar(len(chunks))
+    for (i, (chunk_probabilities, chunk_stats)) in enumerate(parallel.imap(func, args, workers), start=1):
+        probabilities += chunk_probabilities
+        if chunk_stats is not None:
+            stats = chunk_stats if stats is None else stats + chunk_stats
+        progress_bar.update(i)
+    return probabilities, stats
@@ -0,0 +1,46 @@
+"""
+Loads the gameplay data used to make a prediction.
+"""
+
+from data.models import Game, LegislativeSession, Player, PresidentAction, LegislativeOutcome
+
+import data.repository as re
+
+
+def max_round(leg_sessions: list[LegislativeSession]) -> int:
+    # Find the maximum number of rounds that can be used in the prediction
+    # Stop the round *before* the game is complete
+    # TODO: Allow rounds to be used after 5 fascist policies have been passed
+    leg_sessions.sort(key=lambda ls: ls.round_num)
+    fas_passed = 0
+    for ls in leg_sessions:
+        if ls.last_round:
+            return ls.round_num - 1
+        if ls.outcome == LegislativeOutcome.FAS:
+            fas_passed += 1
+            if fas_passed >= 5:
+                return ls.round_num
+    # No last round found: all rounds can be used in prediction
+    return leg_sessions[-1].round_num
+
+
+def get_game(game_id: int, round_num: int) -> tuple[Game, list[Player], list[LegislativeSession], list[PresidentAction]]:
+    # Game
+    if game_id < 0:
+        game_id += 1 + re.count_games()
+    game = re.get_game_by_id(game_id)
+    if game is None:
+        raise ValueError(f"No game with ID {game_id} found.")
+    # Players
+    players = re.get_players_in_game(game_id)
+    # Legislative sessions
+    leg_sessions = re.get_leg_sessions_in_game(game_id)
+    max_round_num = max_round(leg_sessions)
+    if round_num < 0:
+        round_num += 1 + len(leg_sessions)
+    if round_num < max_round_num:
+        max_round_num = round_num
+    leg_sessions = [ls for ls in leg_sessions if ls.round_num <= max_round_num]
+    # President actions
+    pres_actions = [a for a in re.get_pres_actions_in_game(game_id) if a.round_num <= max_round_num]
+    return game, players, leg_sessions, pres_actions
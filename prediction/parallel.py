@@ -0,0 +1,66 @@
+"""
+Helpers to spread CPU-bound prediction work across a pool of processes.
+"""
+
+from collections.abc import Callable, Iterator, Sequence
+from multiprocessing import Pool
+from typing import TypeVar
+
+import os
+import prediction.pmodel.investigate as investigate
+import prediction.pmodel.legislative_session as legislative_session
+import prediction.pmodel.peek as peek
+
+
+T = TypeVar("T")
+
+
+def num_workers(workers: int) -> int:
+    """
+    Returns the number of worker processes to use. Zero or a negative number means one per CPU core.
+    """
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def split(items: Sequence[T], num_chunks: int) -> list[Sequence[T]]:
+    """
+    Splits the items into at most `num_chunks` contiguous chunks of nearly equal size.
+    """
+    num_chunks = max(1, min(num_chunks, len(items)))
+    size, remainder = divmod(len(items), num_chunks)
+    chunks = []
+    start = 0
+    for i in range(num_chunks):
+        end = start + size + (1 if i < remainder else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def init_worker() -> None:
+    """
+    Loads the model tables once in each worker process.
+    """
+    legislative_session._get_leg_session_index()
+    investigate._get_investigation_index()
+    peek._get_peek_index()
+
+
+def _call(task: tuple[Callable, tuple]):
+    func, args = task
+    return func(*args)
+
+
+def imap(func: Callable, args: Sequence[tuple], workers: int, initializer: Callable[[], None] | None = init_worker) -> Iterator:
+    """
+    Calls `func` on each tuple of arguments and yields the results in the same order as the arguments. The calls are made in a pool of `workers` processes unless there is only one worker. Each process first calls `initializer`, which loads the model tables by default.
+    """
+    workers = num_workers(workers)
+    tasks = [(func, a) for a in args]
+    if workers == 1:
+        yield from map(_call, tasks)
+        return
+    with Pool(min(workers, len(tasks)) or 1, initializer=initializer) as pool:
+        yield from pool.imap(_call, tasks)
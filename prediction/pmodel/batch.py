@@ -0,0 +1,140 @@
+"""
+Vectorized version of `pmodel.prob_game_given_roles` which evaluates many role assignments at once.
+
+Role assignments are stored as an integer matrix (assignments x players) using the encoding in `utils.ROLE_INDEX` and the draw pile distributions are stored as a matrix (assignments x 7). The number of policies passed and left in the draw pile does not depend on the roles, so a single `GameContext` is shared by every assignment.
+"""
+
+from data.models import LegislativeOutcome, LegislativeSession, Party, PresidentAction, PresidentActionType, Role
+from prediction.pmodel.game_context import GameContext
+from prediction.pmodel.investigate import prob_investigation_given_roles
+from prediction.pmodel.legislative_session import prob_legislative_session_given_pga
+from prediction.pmodel.peek import peek_normalization, prob_peek_given_draw_pile
+from prediction.pmodel.pmodel import pres_action_in_round
+from prediction.pmodel.utils import ROLES, ROLE_INDEX
+
+import numpy as np
+import prediction.pmodel.hypergeometric as hypergeometric
+
+
+def _legislative_session(ls: LegislativeSession, pres: int, chan: int, roles: np.ndarray, draw_pile: np.ndarray, context: GameContext) -> tuple[np.ndarray, np.ndarray]:
+    # Likelihood of the session given each pair of roles and each possible agenda
+    prob_ls_given_pga = prob_legislative_session_given_pga(ls, context)[roles[:, pres], roles[:, chan]]
+    # P(session) = sum_a P(session | a) * P(a)
+    n = context.draw_pile_size
+    prob_ls = np.sum(prob_ls_given_pga * (draw_pile @ hypergeometric.draw_probabilities(n, 3)), axis=1)
+    # Update state of draw pile
+    # Reshuffle deck if necessary, otherwise make full calculations
+    if ls.outcome == LegislativeOutcome.FAS:
+        context.fas_passed += 1
+    elif ls.outcome == LegislativeOutcome.LIB:
+        context.lib_passed += 1
+    if context.draw_pile_size < 6:
+        context.reshuffle_deck()
+        new_draw_pile = np.zeros_like(draw_pile)
+        new_draw_pile[:, 6 - context.lib_passed] = 1.0
+    else:
+        # P(X' = x | session) = sum_a P(X = x + a) * P(a | X = x + a) * P(session | a) / P(session)
+        # Each assignment has its own posterior matrix, so apply the update matrix for each number of Liberal policies drawn
+        new_draw_pile = np.zeros_like(draw_pile)
+        for a in range(4):
+            new_draw_pile += (draw_pile @ hypergeometric.UPDATE[n, 3, a].T) * prob_ls_given_pga[:, a:a+1]
+        possible = prob_ls != 0
+        new_draw_pile[possible] /= prob_ls[possible, np.newaxis]
+        # Impossible assignments keep their old draw pile to avoid dividing by zero
+        new_draw_pile[~possible] = draw_pile[~possible]
+        context.draw_pile_size -= 3
+    return prob_ls, new_draw_pile
+
+
+def _peek(pres_get_claim: int, pres: int, roles: np.ndarray, alive: np.ndarray, draw_pile: np.ndarray, context: GameContext) -> tuple[float, np.ndarray]:
+    n = context.draw_pile_size
+    table = np.zeros((3, 7))
+    for p in np.unique(roles[alive, pres]):
+        likelihood = prob_peek_given_draw_pile(ROLES[p], pres_get_claim, n)
+        table[p, :len(likelihood)] = likelihood
+    # Same normalization as the scalar model
+    prob_peek = peek_normalization(n)
+    new_draw_pile = draw_pile * table[roles[:, pres]] / prob_peek
+    return prob_peek, new_draw_pile
+
+
+def _investigate(action: PresidentAction, pres: int, target: int, roles: np.ndarray, alive: np.ndarray, context: GameContext) -> np.ndarray:
+    prob = prob_investigation_given_roles(action.accuse, context)[roles[:, pres], roles[:, target]]
+    # Same error as the scalar model if a possible assignment has no matching row
+    if np.isnan(prob[alive]).any():
+        i = np.flatnonzero(alive & np.isnan(prob))[0]
+        raise ValueError(f"No investigation model for president '{ROLES[roles[i, pres]]}', target '{ROLES[roles[i, target]]}', and accuse '{action.accuse}'.")
+    prob[~alive] = 0
+    return prob
+
+
+def _president_action(action: PresidentAction, pres: int, player_index: dict[str, int], roles: np.ndarray, alive: np.ndarray, draw_pile: np.ndarray, context: GameContext) -> tuple[np.ndarray | float, np.ndarray]:
+    if action.action == PresidentActionType.PEEK:
+        return _peek(action.peek_claim, pres, roles, alive, draw_pile, context)
+    elif action.action == PresidentActionType.INVESTIGATE:
+        target = player_index[action.target_name]
+        return _investigate(action, pres, target, roles, alive, context), draw_pile
+    elif action.action == PresidentActionType.SHOOT:
+        # If the target was Hitler, the game would have been over
+        target = player_index[action.target_name]
+        return (roles[:, target] != ROLE_INDEX[Role.HIT]).astype(float), draw_pile
+    else:
+        return 1.0, draw_pile
+
+
+def _top_deck(outcome: Party, draw_pile: np.ndarray, context: GameContext) -> tuple[np.ndarray, np.ndarray]:
+    n = context.draw_pile_size
+    x = np.arange(7)
+    if outcome == Party.FAS:
+        # P(X' = x | F) = (n - x) / n * P(X = x) / P(F)
+        prob = draw_pile @ hypergeometric.draw_probabilities(n, 1)[:, 0]
+        new_draw_pile = (n - x) * draw_pile
+        context.fas_passed += 1
+    elif outcome == Party.LIB:
+        # Same update as the scalar model
+        prob = draw_pile @ hypergeometric.draw_probabilities(n, 1)[:, 1]
+        new_draw_pile = (x + 1) * draw_pile
+        new_draw_pile[:, 6] = 0
+        context.lib_passed += 1
+    else:
+        raise ValueError(f"Invalid outcome '{outcome}'.")
+    possible = prob != 0
+    new_draw_pile[possible] /= n * prob[possible, np.newaxis]
+    new_draw_pile[~possible] = draw_pile[~possible]
+    context.draw_pile_size -= 1
+    return prob, new_draw_pile
+
+
+def prob_game_given_role_matrix(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], roles: np.ndarray) -> np.ndarray:
+    """
+    Returns the probability of the game given each row of the role matrix.
+    """
+    num_assignments, num_players = roles.shape
+    player_index = {name: i for (i, name) in enumerate(player_names)}
+    num_fas = int(np.sum(roles[0] == ROLE_INDEX[Role.FAS])) if num_assignments > 0 else None
+    context = GameContext(num_players, num_fas)
+    draw_pile = np.zeros((num_assignments, 7))
+    draw_pile[:, 6] = 1.0
+    prob = np.ones(num_assignments)
+    for ls in leg_sessions:
+        alive = prob != 0
+        # End immediately if every probability has reached 0
+        if not alive.any():
+            break
+        # Successful government
+        if ls.outcome != LegislativeOutcome.REJECTED:
+            # Legislative session
+            pres = player_index[ls.pres_name]
+            chan = player_index[ls.chan_name]
+            prob_ls, draw_pile = _legislative_session(ls, pres, chan, roles, draw_pile, context)
+            prob *= prob_ls
+            # President action (if any)
+            action = pres_action_in_round(ls, pres_actions)
+            if action is not None:
+                prob_action, draw_pile = _president_action(action, pres, player_index, roles, alive, draw_pile, context)
+                prob *= prob_action
+        # Unsuccessful government and top-deck
+        elif ls.top_deck:
+            prob_top_deck, draw_pile = _top_deck(ls.top_deck, draw_pile, context)
+            prob *= prob_top_deck
+    return prob
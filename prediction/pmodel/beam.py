@@ -0,0 +1,150 @@
+"""
+Beam search over partial role assignments, for long games.
+
+As in `prefix`, a partial assignment only gives roles to the players involved in the rounds processed so far, and every completion of it has the same probability. The rounds are processed in order and the log-probability of each partial assignment is accumulated, so long games do not underflow. After each round, only the most likely partial assignments are kept: at most `width` of them, and only those whose log-probability is within `log_ratio` of the best. The factor of a peek is not a probability and can be larger than 1 (see `peek_normalization`), but it is the same for every assignment, so it is divided out of the log-probabilities. Every round then has a factor of at most 1, so a discarded partial assignment can never gain probability, and the mass of its completions at the time it is discarded bounds the mass lost. The assignments which are kept have their exact probability.
+"""
+
+from __future__ import annotations
+from data.models import LegislativeOutcome, LegislativeSession, PresidentAction, PresidentActionType, Role
+from prediction.pmodel.game_context import GameContext, GameState
+from prediction.pmodel.peek import peek_normalization
+from prediction.pmodel.pmodel import players_involved_in_round, pres_action_in_round, round_key, transition
+from prediction.pmodel.utils import ROLES
+from typing import NamedTuple
+from utils.game import num_players_with_role
+
+import math
+import numpy as np
+import prediction.assignments as assignments
+
+
+DEFAULT_WIDTH = 1000
+
+
+class Node(NamedTuple):
+    log_prob: float
+    # Role of each player (None if not involved yet)
+    roles: tuple[Role | None, ...]
+    state: GameState
+
+
+class BeamStats:
+    def __init__(self):
+        # Number of rounds evaluated (one per partial assignment and round)
+        self.rounds_evaluated = 0
+        # Largest number of partial assignments kept after a round
+        self.max_width = 0
+        # Number of partial assignments discarded
+        self.discarded = 0
+        # Upper bound on the fraction of the probability mass discarded
+        self.discarded_mass = 0.0
+
+    def __str__(self) -> str:
+        return f"Evaluated {self.rounds_evaluated} rounds and kept at most {self.max_width} partial assignments. Discarded {self.discarded} partial assignments holding at most {self.discarded_mass:.2%} of the probability mass."
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _logsumexp(values: list[float]) -> float:
+    if not values:
+        return -math.inf
+    largest = max(values)
+    if largest == -math.inf:
+        return -math.inf
+    return largest + math.log(sum(math.exp(v - largest) for v in values))
+
+
+def _remaining(roles: tuple[Role | None, ...], num_fas: int) -> dict[Role, int]:
+    """
+    Returns the number of players who can still be given each role.
+    """
+    remaining = {Role.HIT: 1, Role.FAS: num_fas, Role.LIB: len(roles) - 1 - num_fas}
+    for r in roles:
+        if r is not None:
+            remaining[r] -= 1
+    return remaining
+
+
+def _log_completions(roles: tuple[Role | None, ...], num_fas: int) -> float:
+    remaining = _remaining(roles, num_fas)
+    unassigned = sum(remaining.values())
+    return math.log(math.comb(unassigned, remaining[Role.HIT]) * math.comb(unassigned - remaining[Role.HIT], remaining[Role.FAS]))
+
+
+def _assign(roles: tuple[Role | None, ...], players: list[int], num_fas: int) -> list[tuple[Role | None, ...]]:
+    """
+    Returns every way of giving roles to the given players (which have none yet) that keeps the role counts valid.
+    """
+    partial = [roles]
+    for i in players:
+        extended = []
+        for p in partial:
+            remaining = _remaining(p, num_fas)
+            for role in ROLES:
+                if remaining[role] > 0:
+                    extended.append(p[:i] + (role,) + p[i + 1:])
+        partial = extended
+    return partial
+
+
+def _complete(roles: tuple[Role | None, ...], num_fas: int) -> list[int]:
+    """
+    Returns the codes of every full assignment which agrees with the partial one.
+    """
+    unassigned = [i for (i, r) in enumerate(roles) if r is None]
+    codes = []
+    for full in _assign(roles, unassigned, num_fas):
+        hitler = full.index(Role.HIT)
+        fas_mask = sum(1 << i for (i, r) in enumerate(full) if r == Role.FAS)
+        codes.append(assignments.encode(hitler, fas_mask))
+    return codes
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def beam_search(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], width: int = DEFAULT_WIDTH, log_ratio: float = math.inf, num_fas: int | None = None) -> tuple[np.ndarray, np.ndarray, BeamStats]:
+    """
+    Returns the full role assignments which were kept (as codes, in enumeration order), their log-probabilities, and statistics on the search, including an upper bound on the fraction of the probability mass discarded.
+    """
+    num_players = len(player_names)
+    num_fas = num_players_with_role(Role.FAS, num_players) if num_fas is None else num_fas
+    index = {name: i for (i, name) in enumerate(player_names)}
+    stats = BeamStats()
+    beam = [Node(0.0, (None,) * num_players, GameContext(num_players, num_fas).to_state())]
+    # Log of the (unnormalized) mass of every completion of the discarded partial assignments
+    log_discarded = []
+    for ls in leg_sessions:
+        action = pres_action_in_round(ls, pres_actions)
+        involved = list(dict.fromkeys(index[name] for name in players_involved_in_round(ls, action)))
+        peeked = ls.outcome != LegislativeOutcome.REJECTED and action is not None and action.action == PresidentActionType.PEEK
+        expanded = []
+        for node in beam:
+            new_players = [i for i in involved if node.roles[i] is None]
+            for roles in _assign(node.roles, new_players, num_fas):
+                role = {player_names[i]: roles[i] for i in involved}
+                prob, state = transition(node.state, round_key(ls, action, role))
+                stats.rounds_evaluated += 1
+                if peeked:
+                    # The peek leaves the size of the draw pile unchanged
+                    prob /= peek_normalization(state.draw_pile_size)
+                # Impossible assignments are dropped without adding to the discarded mass
+                if prob > 0:
+                    expanded.append(Node(node.log_prob + math.log(prob), roles, state))
+        expanded.sort(key=lambda node: node.log_prob, reverse=True)
+        best = expanded[0].log_prob if expanded else -math.inf
+        beam = [node for node in expanded[:width] if node.log_prob >= best - log_ratio]
+        for node in expanded[len(beam):]:
+            log_discarded.append(node.log_prob + _log_completions(node.roles, num_fas))
+        stats.discarded += len(expanded) - len(beam)
+        stats.max_width = max(stats.max_width, len(beam))
+    log_probs = {}
+    for node in beam:
+        for code in _complete(node.roles, num_fas):
+            log_probs[code] = node.log_prob
+    codes = np.array(sorted(log_probs, key=lambda code: assignments.rank(code, num_players, num_fas)), dtype=np.int64)
+    log_kept = _logsumexp([log_probs[int(code)] for code in codes])
+    log_lost = _logsumexp(log_discarded)
+    stats.discarded_mass = 0.0 if log_lost == -math.inf else math.exp(log_lost - _logsumexp([log_kept, log_lost]))
+    return codes, np.array([log_probs[int(code)] for code in codes]), stats
@@ -1,40 +1,74 @@
+from __future__ import annotations
 from data.models import Role
+from functools import lru_cache
+from typing import NamedTuple
 from utils.game import num_players_with_role
 
+import numpy as np
+
+
+# Maximum number of distinct game states kept by `intern`
+INTERN_CACHE_SIZE = 2**16
+
+
+class GameState(NamedTuple):
+    """
+    Immutable and hashable snapshot of a `GameContext`. Equal states reached by different role assignments (or different games) compare and hash equal, so they can be shared, used as cache keys, and sent to worker processes.
+    """
+    num_players: int
+    fas_players: int
+    lib_players: int
+    fas_passed: int
+    lib_passed: int
+    draw_pile_size: int
+    # draw_pile[n] is the probability that there are n liberal policies in the draw pile
+    draw_pile: tuple[float, ...]
+
+
+@lru_cache(maxsize=INTERN_CACHE_SIZE)
+def intern(state: GameState) -> GameState:
+    """
+    Returns a canonical instance of the given state so that equal states share memory.
+    """
+    return state
+
 
 class GameContext:
     TOTAL_POLICIES = 17
 
-    def __init__(self, num_players: int):
+    def __init__(self, num_players: int, num_fas: int | None = None):
+        """
+        The number of vanilla Fascists defaults to the standard one for the number of players and can be given for house-rule games.
+        """
         self.num_players = num_players
-        self.fas_players = num_players_with_role(Role.FAS, num_players)
-        self.lib_players = num_players_with_role(Role.LIB, num_players)
+        self.fas_players = num_players_with_role(Role.FAS, num_players) if num_fas is None else num_fas
+        self.lib_players = num_players - 1 - self.fas_players
         self.fas_passed = 0
         self.lib_passed = 0
         self.draw_pile_size = GameContext.TOTAL_POLICIES
         # draw_pile[n] is the probability that there are n liberal policies in the draw pile
-        self.draw_pile = {
-            0: 0.0,
-            1: 0.0,
-            2: 0.0,
-            3: 0.0,
-            4: 0.0,
-            5: 0.0,
-            6: 1.0
-        }
-    
+        self.draw_pile = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0])
+
+    @staticmethod
+    def from_state(state: GameState) -> GameContext:
+        context = GameContext.__new__(GameContext)
+        context.num_players = state.num_players
+        context.fas_players = state.fas_players
+        context.lib_players = state.lib_players
+        context.fas_passed = state.fas_passed
+        context.lib_passed = state.lib_passed
+        context.draw_pile_size = state.draw_pile_size
+        context.draw_pile = np.array(state.draw_pile)
+        return context
+
+    def to_state(self) -> GameState:
+        draw_pile = tuple(self.draw_pile.tolist())
+        return intern(GameState(self.num_players, self.fas_players, self.lib_players, self.fas_passed, self.lib_passed, self.draw_pile_size, draw_pile))
+
     def hitler_knows_fas(self) -> bool:
         return self.num_players < 7
     
     def reshuffle_deck(self) -> None:
         self.draw_pile_size = GameContext.TOTAL_POLICIES - self.fas_passed - self.lib_passed
-        self.draw_pile = {
-            0: 0.0,
-            1: 0.0,
-            2: 0.0,
-            3: 0.0,
-            4: 0.0,
-            5: 0.0,
-            6: 0.0
-        }
+        self.draw_pile = np.zeros(7)
         self.draw_pile[6 - self.lib_passed] = 1.0
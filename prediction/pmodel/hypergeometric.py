@@ -0,0 +1,53 @@
+"""
+Precomputed draw probabilities for every possible state of the draw pile.
+
+The deck never has more than `GameContext.TOTAL_POLICIES` policies or more than 6 Liberal policies, and at most 3 policies are drawn at once, so every probability is computed once at import time.
+"""
+
+import math
+import numpy as np
+
+
+MAX_DRAW_PILE_SIZE = 17
+MAX_LIB = 6
+MAX_DRAWN = 3
+
+
+def _draw_probabilities() -> np.ndarray:
+    prob = np.zeros((MAX_DRAW_PILE_SIZE + 1, MAX_LIB + 1, MAX_DRAWN + 1, MAX_DRAWN + 1))
+    for n in range(MAX_DRAW_PILE_SIZE + 1):
+        for x in range(min(MAX_LIB, n) + 1):
+            for k in range(min(MAX_DRAWN, n) + 1):
+                for a in range(k + 1):
+                    # math.comb returns 0 when more policies of a party are drawn than there are in the pile
+                    prob[n, x, k, a] = math.comb(x, a) * math.comb(n - x, k - a) / math.comb(n, k)
+    return prob
+
+
+def _update_matrices(draw_prob: np.ndarray) -> np.ndarray:
+    matrices = np.zeros((MAX_DRAW_PILE_SIZE + 1, MAX_DRAWN + 1, MAX_DRAWN + 1, MAX_LIB + 1, MAX_LIB + 1))
+    for a in range(MAX_DRAWN + 1):
+        for x in range(MAX_LIB + 1 - a):
+            matrices[:, :, a, x, x + a] = draw_prob[:, x + a, :, a]
+    return matrices
+
+
+# DRAW_PROB[n, x, k, a] is the probability of drawing a Liberal policies out of k when there are x Liberal policies in a draw pile of n
+DRAW_PROB = _draw_probabilities()
+# UPDATE[n, k, a] maps the distribution of the number of Liberal policies in the draw pile to the (unnormalized) distribution after k policies including a Liberal policies are drawn
+UPDATE = _update_matrices(DRAW_PROB)
+
+
+def draw_probabilities(draw_pile_size: int, num_drawn: int) -> np.ndarray:
+    """
+    Returns a matrix whose entry (x, a) is the probability of drawing `a` Liberal policies when there are `x` Liberal policies in the draw pile.
+    """
+    return DRAW_PROB[draw_pile_size, :, num_drawn, :num_drawn + 1]
+
+
+def posterior_matrix(draw_pile_size: int, num_drawn: int, likelihood: np.ndarray) -> np.ndarray:
+    """
+    Returns the matrix which maps the distribution of the number of Liberal policies in the draw pile to the (unnormalized) distribution after drawing `num_drawn` policies, given the likelihood of an observation for each number of Liberal policies drawn.
+    """
+    matrices = UPDATE[draw_pile_size, num_drawn, :num_drawn + 1].reshape(num_drawn + 1, -1)
+    return (likelihood @ matrices).reshape(MAX_LIB + 1, MAX_LIB + 1)
@@ -0,0 +1,43 @@
+"""
+Keeps the game state of every role assignment in memory so that a prediction can be updated as new rounds are played.
+"""
+
+from data.models import LegislativeSession, PresidentAction, Role
+from prediction.pmodel.game_context import GameContext
+from prediction.pmodel.pmodel import pres_action_in_round, prob_round_given_roles
+
+
+def _round_key(ls: LegislativeSession, action: PresidentAction | None) -> tuple:
+    # Used to detect rounds which were changed after being processed
+    return tuple(vars(ls).values()) + (() if action is None else tuple(vars(action).values()))
+
+
+class IncrementalPrediction:
+    def __init__(self, role_assignments: list[dict[str, Role]]):
+        self.role_assignments = role_assignments
+        self.reset()
+
+    def reset(self) -> None:
+        num_players = len(self.role_assignments[0])
+        self.contexts = [GameContext(num_players, sum(r == Role.FAS for r in ra.values())) for ra in self.role_assignments]
+        self.probabilities = [1] * len(self.role_assignments)
+        self.rounds = []
+
+    def update(self, leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction]) -> int:
+        """
+        Processes the rounds which have not been seen yet and returns how many there were. If a round which was already processed has changed, the prediction starts over from the first round.
+        """
+        leg_sessions = sorted(leg_sessions, key=lambda ls: ls.round_num)
+        actions = [pres_action_in_round(ls, pres_actions) for ls in leg_sessions]
+        keys = [_round_key(ls, a) for (ls, a) in zip(leg_sessions, actions)]
+        if keys[:len(self.rounds)] != self.rounds:
+            self.reset()
+        num_new = len(keys) - len(self.rounds)
+        for k in range(len(self.rounds), len(keys)):
+            ls = leg_sessions[k]
+            for (i, ra) in enumerate(self.role_assignments):
+                # Assignments which are already impossible stay that way
+                if self.probabilities[i] != 0:
+                    self.probabilities[i] *= prob_round_given_roles(ls, actions[k], ra, self.contexts[i])
+            self.rounds.append(keys[k])
+        return num_new
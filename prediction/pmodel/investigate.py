@@ -1,7 +1,10 @@
 from data.models import Role
 from functools import cache
 from prediction.pmodel.game_context import GameContext
+from types import CodeType
 
+import math
+import numpy as np
 import pandas as pd
 import prediction.pmodel.utils as utils
 
@@ -10,11 +13,11 @@ INVESTIGATION_TARGET_FILE = "prediction/pmodel/tables/inv_target.csv"
 INVESTIGATE_FILE = "prediction/pmodel/tables/investigate.csv"
 
 
-def _get_investigation_parameters(context: GameContext) -> dict[str, float]:
+def _get_investigation_parameters(num_players: int, fas_players: int) -> dict[str, float]:
     # Investigations only happen when there are at least 7 players, so there are always at least 2 vanilla Fascists and Hitler never knows who's who.
     param = {}
-    param["INV_L_F"] = context.fas_players / (context.num_players - 1)
-    param["INV_L_H"] = 1 / (context.num_players - 1)
+    param["INV_L_F"] = fas_players / (num_players - 1)
+    param["INV_L_H"] = 1 / (num_players - 1)
     param["INV_F_F"] = 0.1
     param["INV_F_H"] = 0.01
     return param
@@ -33,19 +36,40 @@ def _get_investigation_table() -> pd.DataFrame:
 
 
 @cache
-def _get_matching_row(pres_role: Role, target_role: Role, accuse: bool) -> str:
-    inv_table = _get_investigation_table()
-    pres_role_str = str(pres_role)
-    target_role_str = str(target_role)
-    def matching_row(x: pd.Series) -> bool:
-        return (x["president"] == pres_role_str and
-            x["target"] == target_role_str and
-            x["accuse"] == accuse)
-    inv_table = inv_table[inv_table.apply(matching_row, axis=1)]
-    return inv_table.iloc[0]["prob_str"]
+def _get_investigation_index() -> dict[tuple[Role, Role, bool], CodeType]:
+    """
+    Returns the compiled probability expression of each row in the model table, keyed by (president, target, accuse).
+    """
+    index = {}
+    for row in _get_investigation_table().itertuples(index=False):
+        key = (Role(row.president), Role(row.target), bool(row.accuse))
+        index[key] = utils.compile_probability(row.prob_str)
+    return index
+
+
+@cache
+def _get_investigation_tensor(num_players: int, fas_players: int) -> np.ndarray:
+    """
+    Returns the probability of each investigation indexed by (president, target, accuse). Entries are NaN if the model has no row for that combination.
+    """
+    param = _get_investigation_parameters(num_players, fas_players)
+    tensor = np.full((3, 3, 2), np.nan)
+    for ((pres_role, target_role, accuse), prob_code) in _get_investigation_index().items():
+        tensor[utils.ROLE_INDEX[pres_role], utils.ROLE_INDEX[target_role], int(accuse)] = utils.eval_probability(prob_code, param)
+    return tensor
+
+
+def prob_investigation_given_roles(accuse: bool, context: GameContext) -> np.ndarray:
+    """
+    Returns the probability of the investigation result indexed by (president, target). Entries are NaN if the model has no row for that pair of roles.
+    """
+    if accuse not in (True, False):
+        return np.full((3, 3), np.nan)
+    return _get_investigation_tensor(context.num_players, context.fas_players)[:, :, int(accuse)]
 
 
 def investigate(pres: Role, target: Role, accuse: bool, context: GameContext) -> float:
-    prob_str = _get_matching_row(pres, target, accuse)
-    param = _get_investigation_parameters(context)
-    return utils.eval_probability(prob_str, param)
+    prob = prob_investigation_given_roles(accuse, context)[utils.ROLE_INDEX[pres], utils.ROLE_INDEX[target]]
+    if math.isnan(prob):
+        raise ValueError(f"No investigation model for president '{pres}', target '{target}', and accuse '{accuse}'.")
+    return float(prob)
@@ -1,9 +1,12 @@
 from data.models import LegislativeSession, LegislativeOutcome, Role
 from functools import cache
 from prediction.pmodel.game_context import GameContext
+from types import CodeType
+from typing import NamedTuple
 
-import math
+import numpy as np
 import pandas as pd
+import prediction.pmodel.hypergeometric as hypergeometric
 import prediction.pmodel.utils as utils
 
 
@@ -13,7 +16,25 @@ CLAIM_PRES_FILE = "prediction/pmodel/tables/claim_pres.csv"
 CLAIM_CHAN_FILE = "prediction/pmodel/tables/claim_chan.csv"
 
 
-def _get_leg_session_parameters(context: GameContext) -> dict[str, float]:
+# Indices of the outcomes and number of possible claims in the likelihood tensors
+OUTCOME_INDEX = {outcome: i for (i, outcome) in enumerate(LegislativeOutcome)}
+NUM_CLAIMS = 4
+
+
+class Regime(NamedTuple):
+    """
+    The parts of the game state on which the legislative session parameters depend.
+    """
+    under_3_fas: bool
+    under_4_lib: bool
+    hitler_knows_fas: bool
+
+
+def regime(context: GameContext) -> Regime:
+    return Regime(context.fas_passed < 3, context.lib_passed < 4, context.hitler_knows_fas())
+
+
+def _get_leg_session_parameters(regime: Regime) -> dict[str, float]:
     ALMOST_IMPOSSIBLE = 1e-6
     EXTREMELY_UNLIKELY = 0.005
     VERY_UNLIKELY = 0.01
@@ -31,14 +52,14 @@ def _get_leg_session_parameters(context: GameContext) -> dict[str, float]:
     param["PP_HL1_FORCE_FAS"] = param["PP_HF1_FORCE_FAS"]  # If you change this, keep in mind what Hitler knows
     param["PP_HL2_TEST"] = param["PP_HF2_TEST"]
     param["PP_LX1_FORCE_FAS"] = ALMOST_IMPOSSIBLE
-    param["PP_LX2_TEST"] = 0.5 if context.fas_passed < 3 else UNLIKELY
+    param["PP_LX2_TEST"] = 0.5 if regime.under_3_fas else UNLIKELY
     # Policy: chancellor
-    param["PC_FF_FAS"] = param["PP_FF1_FORCE_FAS"] if context.lib_passed < 4 else (1 - ALMOST_IMPOSSIBLE)
+    param["PC_FF_FAS"] = param["PP_FF1_FORCE_FAS"] if regime.under_4_lib else (1 - ALMOST_IMPOSSIBLE)
     param["PC_HF_FAS"] = param["PC_FF_FAS"]
-    param["PC_LF_FAS"] = 0.1 if context.lib_passed < 4 else (1 - ALMOST_IMPOSSIBLE)
-    param["PC_LH_FAS"] = 0.01 if context.lib_passed < 4 else (1 - ALMOST_IMPOSSIBLE)
-    if context.lib_passed < 4:
-        param["PC_FH_FAS"] = param["PP_HL1_FORCE_FAS"] if context.hitler_knows_fas() else param["PC_LH_FAS"]
+    param["PC_LF_FAS"] = 0.1 if regime.under_4_lib else (1 - ALMOST_IMPOSSIBLE)
+    param["PC_LH_FAS"] = 0.01 if regime.under_4_lib else (1 - ALMOST_IMPOSSIBLE)
+    if regime.under_4_lib:
+        param["PC_FH_FAS"] = param["PP_HL1_FORCE_FAS"] if regime.hitler_knows_fas else param["PC_LH_FAS"]
     else:
         param["PC_FH_FAS"] = 1 - ALMOST_IMPOSSIBLE
     param["PC_XL_FAS"] = ALMOST_IMPOSSIBLE
@@ -116,72 +137,79 @@ def _get_leg_session_table() -> pd.DataFrame:
 
 
 @cache
-def _get_matching_rows(pres_role: Role, chan_role: Role, outcome: LegislativeOutcome, pres_get_claim: int, pres_give_claim: int, chan_get_claim: int, pres_get_actual: int) -> list[str]:
-    pres_role_str = str(pres_role)
-    chan_role_str = str(chan_role)
-    outcome_str = str(outcome)
-    def matching_row(row: pd.Series) -> bool:
-        # return (row.president == pres_role_str and
-        #     row.chancellor == chan_role_str and
-        #     row.outcome == outcome_str and
-        #     row.pres_get_claim == pres_get_claim and
-        #     row.pres_give_claim == pres_give_claim and
-        #     row.chan_get_claim == chan_get_claim and
-        #     row.pres_get_actual == pres_get_actual)
-        return (row.president == pres_role_str and
-            row.chancellor == chan_role_str and
-            row.outcome == outcome_str and
-            row.pres_get_claim == pres_get_claim and
-            row.pres_give_claim == pres_give_claim and
-            row.chan_get_claim == chan_get_claim and
-            row.pres_get_actual == pres_get_actual)
-    ls_table = _get_leg_session_table()
-    ls_table = ls_table[ls_table.apply(matching_row, axis=1)]
-    return ls_table["prob_str"].to_list()
-
-
-def _prob_legislative_session_given_pga(ls: LegislativeSession, pres_get_actual: int, role: dict[str, Role], context: GameContext) -> float:
+def _get_leg_session_index() -> dict[tuple, CodeType]:
     """
-    Calculates the probability of the given legislative session given the specifed roles and number of Liberal policies received by the President.
+    Returns the sum of the probabilities of the matching rows in the model table as a compiled expression, keyed by (president, chancellor, outcome, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual).
     """
-    pres_role = role[ls.pres_name]
-    chan_role = role[ls.chan_name]
+    prob_strs = {}
+    for row in _get_leg_session_table().itertuples(index=False):
+        key = (Role(row.president),
+            Role(row.chancellor),
+            LegislativeOutcome(row.outcome),
+            int(row.pres_get_claim),
+            int(row.pres_give_claim),
+            int(row.chan_get_claim),
+            int(row.pres_get_actual))
+        prob_strs.setdefault(key, []).append(row.prob_str)
+    return {key: utils.compile_probability_sum(tuple(strs)) for (key, strs) in prob_strs.items()}
+
+
+@cache
+def _get_leg_session_tensor(regime: Regime) -> np.ndarray:
+    """
+    Returns the likelihood of each legislative session in the given regime, indexed by (president, chancellor, outcome, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual). Roles use `utils.ROLE_INDEX` and outcomes use `OUTCOME_INDEX`.
+    """
+    param = _get_leg_session_parameters(regime)
+    tensor = np.zeros((3, 3, len(OUTCOME_INDEX), NUM_CLAIMS, NUM_CLAIMS, NUM_CLAIMS, 4))
+    for (key, prob_code) in _get_leg_session_index().items():
+        pres_role, chan_role, outcome, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual = key
+        index = (utils.ROLE_INDEX[pres_role], utils.ROLE_INDEX[chan_role], OUTCOME_INDEX[outcome], pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual)
+        tensor[index] = utils.eval_probability(prob_code, param)
     # In Hitler Zone, if the chancellor was Hitler, the game would have been over
-    if context.fas_passed >= 3 and chan_role == Role.HIT:
-        return 0
-    # Get the relevant rows from the probability model table
-    prob_strs = _get_matching_rows(pres_role,
-        chan_role,
-        ls.outcome,
-        ls.pres_get_claim,
-        ls.pres_give_claim,
-        ls.chan_get_claim,
-        pres_get_actual)
-    if len(prob_strs) == 0:
-        return 0
-    # Calculate the probabilities for this round
-    param = _get_leg_session_parameters(context)
-    return sum([utils.eval_probability(s, param) for s in prob_strs])
+    if not regime.under_3_fas:
+        tensor[:, utils.ROLE_INDEX[Role.HIT]] = 0
+    return tensor
+
 
+def _is_claim(claim: int | None) -> bool:
+    return claim is not None and 0 <= claim < NUM_CLAIMS
 
-def _new_draw_pile_pmf(x: int, prob_ls: float, old_draw_pile: dict[int, float], old_size: int, prob_ls_given_pga: dict[int, float]) -> float:
-    prob = 0
-    for a in range(min(4, 7-x)):
-        binom_coeff = math.comb(x+a, a) * math.comb(old_size-x-a, 3-a) / math.comb(old_size, 3)
-        prob += old_draw_pile[x+a] * binom_coeff * prob_ls_given_pga[a]
-    return prob / prob_ls
+
+def prob_legislative_session_given_pga(ls: LegislativeSession, context: GameContext) -> np.ndarray:
+    """
+    Returns the probability of the given legislative session indexed by (president, chancellor, pres_get_actual).
+    """
+    claims = (ls.pres_get_claim, ls.pres_give_claim, ls.chan_get_claim)
+    # Claims which are missing or out of range never match a row of the model table
+    if not all(_is_claim(c) for c in claims):
+        return np.zeros((3, 3, 4))
+    tensor = _get_leg_session_tensor(regime(context))
+    return tensor[:, :, OUTCOME_INDEX[ls.outcome], claims[0], claims[1], claims[2]]
+
+
+def prob_legislative_session_given_roles(ls: LegislativeSession, pres_role: Role, chan_role: Role, context: GameContext) -> list[float]:
+    """
+    Returns the probability of the given legislative session for each possible number of Liberal policies received by the President, given the roles of the President and Chancellor.
+    """
+    prob = prob_legislative_session_given_pga(ls, context)
+    return prob[utils.ROLE_INDEX[pres_role], utils.ROLE_INDEX[chan_role]].tolist()
 
 
 def legislative_session(ls: LegislativeSession, role: dict[str, float], context: GameContext) -> float:
     """
     Returns the probability of the given legislative session and updates the game state in-place.
     """
+    return legislative_session_given_roles(ls, role[ls.pres_name], role[ls.chan_name], context)
+
+
+def legislative_session_given_roles(ls: LegislativeSession, pres_role: Role, chan_role: Role, context: GameContext) -> float:
+    """
+    Same as `legislative_session`, but only needs the roles of the President and Chancellor.
+    """
     # Calculate the probability of this outcome given each possible agenda
-    prob_ls_given_pga = {}
-    for pres_get_actual in range(4):
-        prob_ls_given_pga[pres_get_actual] = _prob_legislative_session_given_pga(ls, pres_get_actual, role, context)
-    prob_pga = lambda a: utils.prob_pres_get_actual(a, 3, context.draw_pile, context.draw_pile_size)
-    prob_ls = sum([p*prob_pga(a) for a, p in prob_ls_given_pga.items()])
+    prob_ls_given_pga = prob_legislative_session_given_pga(ls, context)[utils.ROLE_INDEX[pres_role], utils.ROLE_INDEX[chan_role]]
+    prob_pga = context.draw_pile @ hypergeometric.draw_probabilities(context.draw_pile_size, 3)
+    prob_ls = float(prob_ls_given_pga @ prob_pga)
     # Return immediately to avoid division by zero
     if prob_ls == 0:
         return 0
@@ -194,9 +222,7 @@ def legislative_session(ls: LegislativeSession, role: dict[str, float], context:
     if context.draw_pile_size < 6:
         context.reshuffle_deck()
     else:
-        old_draw_pile = context.draw_pile.copy()
-        for x in range(7):
-            new_prob = _new_draw_pile_pmf(x, prob_ls, old_draw_pile, context.draw_pile_size, prob_ls_given_pga)
-            context.draw_pile[x] = new_prob
+        # P(X' = x | session) = sum_a P(X = x + a) * P(a | X = x + a) * P(session | a) / P(session)
+        context.draw_pile = hypergeometric.posterior_matrix(context.draw_pile_size, 3, prob_ls_given_pga) @ context.draw_pile / prob_ls
         context.draw_pile_size -= 3
     return prob_ls
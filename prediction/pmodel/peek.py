@@ -2,11 +2,14 @@ from data.models import Role
 from functools import cache
 from prediction.pmodel.game_context import GameContext
 
-import math
+import numpy as np
 import pandas as pd
+import prediction.pmodel.hypergeometric as hypergeometric
+import prediction.pmodel.utils as utils
 
 
 PEEK_FILE = "prediction/pmodel/tables/peek.csv"
+NUM_CLAIMS = 4
 
 
 @cache
@@ -15,36 +18,78 @@ def _get_peek_table() -> pd.DataFrame:
 
 
 @cache
+def _get_peek_index() -> dict[tuple[Role, int, int], float]:
+    """
+    Returns the probability of each row in the model table, keyed by (president, pres_get_actual, pres_get_claim).
+    """
+    index = {}
+    for row in _get_peek_table().itertuples(index=False):
+        key = (Role(row.president), int(row.pres_get_actual), int(row.pres_get_claim))
+        index[key] = float(row.probability)
+    return index
+
+
 def _prob_peek_given_pga(pres: Role, pres_get_actual: int, pres_get_claim: int) -> float:
-    # Load the model and find the relevant rows
-    peek_table = _get_peek_table()
-    def matching_row(row: pd.Series) -> bool:
-        return (row["president"] == str(pres) and
-            row["pres_get_actual"] == pres_get_actual and
-            row["pres_get_claim"] == pres_get_claim)
-    peek_table = peek_table[peek_table.apply(matching_row, axis=1)]
-    return peek_table.iloc[0]["probability"]
+    key = (pres, pres_get_actual, pres_get_claim)
+    index = _get_peek_index()
+    if key not in index:
+        raise ValueError(f"No peek model for president '{pres}', {pres_get_actual} Liberal policies, and claim '{pres_get_claim}'.")
+    return index[key]
 
 
-def peek(pres: Role, pres_get_claim: int, context: GameContext) -> float:
+def _prob_peek_given_deck(pres: Role, pres_get_claim: int, draw_pile_size: int) -> list[float]:
     # Find probability of the peek given each possible actual observation
-    prob_peek_given_pga = {}
-    for a in range(4):
-        prob_peek_given_pga[a] = _prob_peek_given_pga(pres, a, pres_get_claim)
+    prob_peek_given_pga = np.array([_prob_peek_given_pga(pres, a, pres_get_claim) for a in range(4)])
     # Find the probability of the peek given each possible number of Liberal policies in the entire draw pile
-    prob_peek_given_deck = {}
+    n = draw_pile_size
+    prob_peek_given_deck = hypergeometric.draw_probabilities(n, 3) @ prob_peek_given_pga
+    return prob_peek_given_deck[:min(7, n + 1)].tolist()
+
+
+@cache
+def _get_peek_tensor(draw_pile_size: int) -> np.ndarray:
+    """
+    Returns the probability of each peek claim indexed by (president, pres_get_claim, number of Liberal policies in the draw pile). Entries are NaN if the model has no rows for that claim.
+    """
+    tensor = np.zeros((3, NUM_CLAIMS, 7))
+    for (i, pres) in enumerate(utils.ROLES):
+        for claim in range(NUM_CLAIMS):
+            try:
+                prob = _prob_peek_given_deck(pres, claim, draw_pile_size)
+                tensor[i, claim, :len(prob)] = prob
+            except ValueError:
+                tensor[i, claim] = np.nan
+    return tensor
+
+
+def prob_peek_given_draw_pile(pres: Role, pres_get_claim: int, draw_pile_size: int) -> list[float]:
+    """
+    Returns the probability of the peek claim given each possible number of Liberal policies in the draw pile.
+    """
+    if pres_get_claim not in range(NUM_CLAIMS):
+        raise ValueError(f"No peek model for president '{pres}' and claim '{pres_get_claim}'.")
+    prob = _get_peek_tensor(draw_pile_size)[utils.ROLE_INDEX[pres], pres_get_claim]
+    if np.isnan(prob).any():
+        raise ValueError(f"No peek model for president '{pres}' and claim '{pres_get_claim}'.")
+    return prob[:min(7, draw_pile_size + 1)].tolist()
+
+
+def peek_normalization(draw_pile_size: int) -> float:
+    """
+    Returns the factor that `peek` returns and divides the draw pile by. It only depends on the size of the draw pile, so it scales every role assignment alike, but unlike a probability it is larger than 1 when the draw pile holds more than one policy.
+    """
+    return sum(range(min(7, draw_pile_size + 1)))
+
+
+def peek(pres: Role, pres_get_claim: int, context: GameContext) -> float:
+    prob_peek_given_deck = prob_peek_given_draw_pile(pres, pres_get_claim, context.draw_pile_size)
     n = context.draw_pile_size
-    for x in range(min(7, n + 1)):
-        prob_peek_given_deck[x] = 0
-        for a in range(4):
-            binom_coeff = math.comb(x, a) * math.comb(n - x, 3 - a) / math.comb(n, 3)
-            prob_peek_given_deck[x] += binom_coeff * prob_peek_given_pga[a]
     # Find the probability of the peek AND each possible number of Liberal policies in the entire draw pile
     prob_peek_and_deck = {}
     for x in range(min(7, n + 1)):
         prob_peek_and_deck[x] = context.draw_pile[x] * prob_peek_given_deck[x]
     # Calculate final result and update state of the draw pile
-    prob_peek = sum([p for p in prob_peek_and_deck.keys()])
+    prob_peek = peek_normalization(n)
     for x in range(7):
         # Explicitly handle x being out of range to avoid KeyErrors
         if x <= n:
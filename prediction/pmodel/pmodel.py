@@ -1,27 +1,105 @@
-from data.models import LegislativeOutcome, LegislativeSession, PresidentAction, Role
-from prediction.pmodel.game_context import GameContext
-from prediction.pmodel.legislative_session import legislative_session
-from prediction.pmodel.president_action import president_action
+from data.models import LegislativeOutcome, LegislativeSession, Party, PresidentAction, PresidentActionType, Role
+from functools import lru_cache
+from prediction.pmodel.game_context import GameContext, GameState
+from prediction.pmodel.legislative_session import legislative_session, legislative_session_given_roles
+from prediction.pmodel.president_action import TARGET_ROLE_ACTIONS, president_action, president_action_given_roles
 from prediction.pmodel.top_deck import top_deck
+from typing import NamedTuple
+
+
+# Maximum number of cached results of `transition`
+TRANSITION_CACHE_SIZE = 2**16
+
+
+class RoundKey(NamedTuple):
+    """
+    Everything about a round (including the roles of the players involved) which affects its probability and the next game state.
+    """
+    outcome: LegislativeOutcome
+    top_deck: Party | None
+    pres_get_claim: int | None
+    pres_give_claim: int | None
+    chan_get_claim: int | None
+    action: PresidentActionType | None
+    peek_claim: int | None
+    accuse: bool | None
+    pres_role: Role | None
+    chan_role: Role | None
+    target_role: Role | None
+
+
+def pres_action_in_round(ls: LegislativeSession, pres_actions: list[PresidentAction]) -> PresidentAction | None:
+    pres_actions_in_round = [a for a in pres_actions if a.round_num == ls.round_num]
+    return pres_actions_in_round[0] if pres_actions_in_round else None
+
+
+def players_involved_in_round(ls: LegislativeSession, action: PresidentAction | None) -> list[str]:
+    """
+    Returns the names of the players whose roles affect the probability of the given round.
+    """
+    if ls.outcome == LegislativeOutcome.REJECTED:
+        return []
+    involved = [ls.pres_name, ls.chan_name]
+    if action is not None and action.action in TARGET_ROLE_ACTIONS:
+        involved.append(action.target_name)
+    return involved
+
+
+def round_key(ls: LegislativeSession, action: PresidentAction | None, role: dict[str, Role]) -> RoundKey:
+    rejected = ls.outcome == LegislativeOutcome.REJECTED
+    pres_role = None if rejected else role[ls.pres_name]
+    chan_role = None if rejected else role[ls.chan_name]
+    if action is None or rejected:
+        return RoundKey(ls.outcome, ls.top_deck, ls.pres_get_claim, ls.pres_give_claim, ls.chan_get_claim, None, None, None, pres_role, chan_role, None)
+    target_role = role[action.target_name] if action.action in TARGET_ROLE_ACTIONS else None
+    return RoundKey(ls.outcome, ls.top_deck, ls.pres_get_claim, ls.pres_give_claim, ls.chan_get_claim, action.action, action.peek_claim, action.accuse, pres_role, chan_role, target_role)
+
+
+def prob_round_given_roles(ls: LegislativeSession, action: PresidentAction | None, role: dict[str, Role], context: GameContext) -> float:
+    """
+    Returns the probability of a single round and updates the game state in-place.
+    """
+    prob = 1
+    # Successful government
+    if ls.outcome != LegislativeOutcome.REJECTED:
+        # Legislative session
+        prob *= legislative_session(ls, role, context)
+        # President action (if any)
+        if action is not None:
+            prob *= president_action(action, ls.pres_name, role, context)
+    # Unsuccessful government and top-deck
+    elif ls.top_deck:
+        prob *= top_deck(ls.top_deck, context)
+    return prob
+
+
+@lru_cache(maxsize=TRANSITION_CACHE_SIZE)
+def transition(state: GameState, key: RoundKey) -> tuple[float, GameState]:
+    """
+    Returns the probability of a round and the resulting game state. Unlike `prob_round_given_roles`, the given state is left unchanged and results are cached.
+    """
+    context = GameContext.from_state(state)
+    prob = 1
+    if key.outcome != LegislativeOutcome.REJECTED:
+        ls = LegislativeSession(None, None, None, None, key.outcome, key.top_deck, key.pres_get_claim, key.pres_give_claim, key.chan_get_claim, None, None, False, False)
+        prob *= legislative_session_given_roles(ls, key.pres_role, key.chan_role, context)
+        if key.action is not None:
+            action = PresidentAction(None, None, key.action, None, key.peek_claim, key.accuse)
+            prob *= president_action_given_roles(action, key.pres_role, key.target_role, context)
+    elif key.top_deck:
+        prob *= top_deck(key.top_deck, context)
+    return prob, context.to_state()
 
 
 def prob_game_given_roles(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], role: dict[str, Role]) -> float:
     num_players = len(role)
-    context = GameContext(num_players)
+    num_fas = sum(r == Role.FAS for r in role.values())
+    state = GameContext(num_players, num_fas).to_state()
     prob = 1
     for ls in leg_sessions:
-        # Successful government
-        if ls.outcome != LegislativeOutcome.REJECTED:
-            # Legislative session
-            prob *= legislative_session(ls, role, context)
-            # President action (if any)
-            pres_actions_in_round = [a for a in pres_actions if a.round_num == ls.round_num]
-            if pres_actions_in_round:
-                action = pres_actions_in_round[0]
-                prob *= president_action(action, ls.pres_name, role, context)
-        # Unsuccessful government and top-deck
-        elif ls.top_deck:
-            prob *= top_deck(ls.top_deck, context)
+        action = pres_action_in_round(ls, pres_actions)
+        prob_round, state = transition(state, round_key(ls, action, role))
+        prob *= prob_round
         # End immediately if probability reaches 0
         if prob == 0:
             break
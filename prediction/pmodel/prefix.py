@@ -0,0 +1,75 @@
+"""
+Evaluates many role assignments at once by sharing work between assignments which agree on the roles of every player involved so far.
+
+The probability of the first k rounds only depends on the roles of the players who were President, Chancellor, or the target of a President action in those rounds. The assignments are therefore arranged in a trie: each node holds the game state and probability after some number of rounds, and a node only branches when a newly involved player could have more than one role.
+"""
+
+from __future__ import annotations
+from data.models import LegislativeSession, PresidentAction, Role
+from prediction.pmodel.game_context import GameContext
+from prediction.pmodel.pmodel import players_involved_in_round, pres_action_in_round, round_key, transition
+
+
+class PrefixStats:
+    def __init__(self):
+        # Number of rounds actually evaluated
+        self.rounds_evaluated = 0
+        # Number of rounds that evaluating every assignment separately would have taken
+        self.rounds_total = 0
+
+    def __add__(self, other: PrefixStats) -> PrefixStats:
+        total = PrefixStats()
+        total.rounds_evaluated = self.rounds_evaluated + other.rounds_evaluated
+        total.rounds_total = self.rounds_total + other.rounds_total
+        return total
+
+    def shared_fraction(self) -> float:
+        if self.rounds_total == 0:
+            return 0.0
+        return 1 - self.rounds_evaluated / self.rounds_total
+
+    def __str__(self) -> str:
+        return f"Evaluated {self.rounds_evaluated} rounds instead of {self.rounds_total} ({self.shared_fraction():.1%} shared)."
+
+
+def _group_by_roles(indices: list[int], role_assignments: list[dict[str, Role]], names: list[str]) -> list[list[int]]:
+    groups = {}
+    for i in indices:
+        key = tuple(role_assignments[i][name] for name in names)
+        groups.setdefault(key, []).append(i)
+    return list(groups.values())
+
+
+def prob_game_given_roles_shared(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], role_assignments: list[dict[str, Role]]) -> tuple[list[float], PrefixStats]:
+    """
+    Returns the probability of the game given each role assignment (in the same order) along with statistics on how much work was shared.
+    """
+    stats = PrefixStats()
+    probabilities = [0.0] * len(role_assignments)
+    if not role_assignments:
+        return probabilities, stats
+    rounds = []
+    for ls in leg_sessions:
+        action = pres_action_in_round(ls, pres_actions)
+        rounds.append((ls, action, players_involved_in_round(ls, action)))
+    num_players = len(role_assignments[0])
+    num_fas = sum(r == Role.FAS for r in role_assignments[0].values())
+    # Each node is (next round, assignments, game state, probability, names of involved players)
+    stack = [(0, list(range(len(role_assignments))), GameContext(num_players, num_fas).to_state(), 1, set())]
+    while stack:
+        k, indices, state, prob, involved = stack.pop()
+        # Every assignment in a finished or impossible node has the same probability
+        if k == len(rounds) or prob == 0:
+            for i in indices:
+                probabilities[i] = prob
+            continue
+        ls, action, names = rounds[k]
+        new_names = [name for name in dict.fromkeys(names) if name not in involved]
+        groups = _group_by_roles(indices, role_assignments, new_names)
+        for group in groups:
+            # Any assignment in the group is representative since they agree on every involved player
+            prob_round, child_state = transition(state, round_key(ls, action, role_assignments[group[0]]))
+            stats.rounds_evaluated += 1
+            stats.rounds_total += len(group)
+            stack.append((k + 1, group, child_state, prob * prob_round, involved.union(new_names)))
+    return probabilities, stats
@@ -4,15 +4,24 @@ from prediction.pmodel.peek import peek
 from prediction.pmodel.investigate import investigate
 
 
+# Actions whose probability depends on the role of the target
+TARGET_ROLE_ACTIONS = {PresidentActionType.INVESTIGATE, PresidentActionType.SHOOT}
+
+
 def president_action(action: PresidentAction, pres_name: str, role: dict[str, Role], context: GameContext) -> float:
+    target_role = role[action.target_name] if action.action in TARGET_ROLE_ACTIONS else None
+    return president_action_given_roles(action, role[pres_name], target_role, context)
+
+
+def president_action_given_roles(action: PresidentAction, pres_role: Role, target_role: Role | None, context: GameContext) -> float:
+    """
+    Same as `president_action`, but only needs the roles of the President and the target.
+    """
     if action.action == PresidentActionType.PEEK:
-        pres_role = role[pres_name]
         return peek(pres_role, action.peek_claim, context)
     elif action.action == PresidentActionType.INVESTIGATE:
-        pres_role = role[pres_name]
-        target_role = role[action.target_name]
         return investigate(pres_role, target_role, action.accuse, context)
-    elif action.action == PresidentActionType.SHOOT and role[action.target_name] == Role.HIT:
+    elif action.action == PresidentActionType.SHOOT and target_role == Role.HIT:
         # If the target was Hitler, the game would have been over
         return 0
     else:
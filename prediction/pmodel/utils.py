@@ -1,17 +1,43 @@
-import math
+from data.models import Role
+from functools import cache
+from types import CodeType
+
+import numpy as np
 import pandas as pd
+import prediction.pmodel.hypergeometric as hypergeometric
+
+
+# Expressions in the model tables only have access to the parameters
+_EVAL_GLOBALS = {"__builtins__": None}
+
+# Integer encoding of roles used by the array-based engines
+ROLES = [Role.FAS, Role.HIT, Role.LIB]
+ROLE_INDEX = {role: i for (i, role) in enumerate(ROLES)}
+
+
+@cache
+def compile_probability(probability: str) -> CodeType:
+    """
+    Compiles a probability expression from the model tables so that it only needs to be parsed once.
+    """
+    return compile(probability, "<probability>", "eval")
+
+
+@cache
+def compile_probability_sum(probabilities: tuple[str, ...]) -> CodeType | None:
+    """
+    Compiles the sum of several probability expressions into a single expression. Returns None if there are no expressions.
+    """
+    if len(probabilities) == 0:
+        return None
+    return compile_probability(" + ".join(f"({p})" for p in probabilities))
 
 
-def eval_probability(probability: str, param: dict[str, float]) -> float:
-    return eval(probability, {"__builtins__": None}, param)
+def eval_probability(probability: str | CodeType, param: dict[str, float]) -> float:
+    if isinstance(probability, str):
+        probability = compile_probability(probability)
+    return eval(probability, _EVAL_GLOBALS, param)
 
 
-def prob_pres_get_actual(n: int, num_drawn: int, draw_pile: dict[int, float], tot_cards: int) -> float:
-    prob = 0
-    for (nlib, p) in draw_pile.items():
-        if nlib > tot_cards:
-            break
-        nfas = tot_cards - nlib
-        # math.comb(n, k) returns 0 if f > n, so no need to worry about that case
-        prob += p * math.comb(nlib, n) * math.comb(nfas, num_drawn - n) / math.comb(tot_cards, num_drawn)
-    return prob
+def prob_pres_get_actual(n: int, num_drawn: int, draw_pile: np.ndarray, tot_cards: int) -> float:
+    return float(draw_pile @ hypergeometric.DRAW_PROB[tot_cards, :, num_drawn, n])
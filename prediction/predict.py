@@ -1,13 +1,21 @@
 from argparse import Namespace
-from data.models import Game, LegislativeSession, Player, PresidentAction, LegislativeOutcome, Role
-from prediction.pmodel.game_context import GameContext
-from utils.progress_bar import ProgressBar
-from utils.game import num_players_with_role
+from data.models import Game, LegislativeSession, PresidentAction, Role
+from prediction.history import get_game
+from prediction.pmodel.incremental import IncrementalPrediction
+from prediction.pmodel.utils import ROLE_INDEX
 
+import csv
 import data.repository as re
-import matplotlib.pyplot as plt
+import json
+import math
+import numpy as np
 import pandas as pd
-import prediction.pmodel.pmodel as pmodel
+import prediction.assignments as assignments
+import prediction.engines as engines
+import prediction.pmodel.beam as beam
+import prediction.pruning as pruning
+import prediction.sampling as sampling
+import time
 
 
 # Chart colours
@@ -16,113 +24,42 @@ FAS_COLOUR = rgb(255, 124, 36)  # "chocolate1"
 HIT_COLOUR = rgb(208, 4, 4)  # "red3"
 LIB_COLOUR = rgb(136, 204, 252)  # "skyblue1"
 
-
-def _max_round(leg_sessions: list[LegislativeSession]) -> int:
-    # Find the maximum number of rounds that can be used in the prediction
-    # Stop the round *before* the game is complete
-    # TODO: Allow rounds to be used after 5 fascist policies have been passed
-    leg_sessions.sort(key=lambda ls: ls.round_num)
-    fas_passed = 0
-    for ls in leg_sessions:
-        if ls.last_round:
-            return ls.round_num - 1
-        if ls.outcome == LegislativeOutcome.FAS:
-            fas_passed += 1
-            if fas_passed >= 5:
-                return ls.round_num
-    # No last round found: all rounds can be used in prediction
-    return leg_sessions[-1].round_num
-
-
-def _get_game(game_id: int, round_num: int) -> tuple[Game, list[Player], list[LegislativeSession], list[PresidentAction]]:
-    # Game
-    games = re.get_all_games()
-    if game_id < 0:
-        game_id += 1 + len(games)
-    games_with_id = [g for g in games if g.game_id == game_id]
-    if len(games_with_id) == 0:
-        raise ValueError(f"No game with ID {game_id} found.")
-    game = games_with_id[0]
-    # Players
-    players = [p for p in re.get_all_players() if p.game_id == game_id]
-    # Legislative sessions
-    leg_sessions = [ls for ls in re.get_all_leg_sessions() if ls.game_id == game_id]
-    max_round = _max_round(leg_sessions)
-    if round_num < 0:
-        round_num += 1 + len(leg_sessions)
-    if round_num < max_round:
-        max_round = round_num
-    leg_sessions = [ls for ls in leg_sessions if ls.round_num <= max_round]
-    # President actions
-    pres_actions = [a for a in re.get_all_pres_actions() if a.game_id == game_id and a.round_num <= max_round]
-    return game, players, leg_sessions, pres_actions
-
-
-def _role_assignments_with_givens(player_names: list[str], givens: dict[str, Role], remaining_fas: int) -> list[dict[str, Role]]:
-    if remaining_fas == 0:
-        return [givens]
-    num_players = len(player_names)
-    role_assignments = []
-    for (i, name) in enumerate(player_names):
-        # If there wouldn't be enough players left to fill the required number of fascists, stop right away
-        if remaining_fas > num_players - i:
-            break
-        other_players = player_names[(i+1):]
-        new_givens = givens.copy()
-        new_givens[name] = Role.FAS
-        role_assignments += _role_assignments_with_givens(other_players, new_givens, remaining_fas - 1)
-    return role_assignments
-
-
-def _fill_roles(role_assignment: dict[str, Role], player_names: list[str]) -> None:
-    for name in player_names:
-        if name not in role_assignment:
-            role_assignment[name] = Role.LIB
-
-
-def _get_all_role_assignments(player_names: list[str]) -> list[dict[str, Role]]:
-    role_assignments = []
-    for name in player_names:
-        given = {name: Role.HIT}
-        num_fas_players = num_players_with_role(Role.FAS, len(player_names))
-        other_players = [p for p in player_names if p != name]
-        role_assignments += _role_assignments_with_givens(other_players, given, num_fas_players)
-    for ra in role_assignments:
-        _fill_roles(ra, player_names)
-    return role_assignments
-
-
-def _get_hitler_name(role_assignment: dict[str, Role]) -> str:
-    return next(name for (name, role) in role_assignment.items() if role == Role.HIT)
+# Largest game with a standard number of Fascists
+MAX_STANDARD_PLAYERS = 10
 
 
-def _get_fascist_names(role_assignment: dict[str, Role]) -> str:
-    return [name for (name, role) in role_assignment.items() if role == Role.FAS]
-
-
-def _display_team_probabilities(game_probabilities: list[tuple[dict[str, Role], float]]) -> None:
+def _display_team_probabilities(codes: np.ndarray, probabilities: np.ndarray, player_names: list[str], errors: np.ndarray | None = None) -> None:
     print()
     print("Role assignment probabilities")
     print("-----------------------------")
-    game_probabilities.sort(key=lambda x: x[1], reverse=True)
     data = []
     format_float = lambda x: f"{x:.1%}" if x >= 0.001 else f"{100*x:.1e}%"
-    for (roles, prob) in game_probabilities:
+    for i in np.argsort(-probabilities, kind="stable"):
+        prob = probabilities[i]
         if format_float(prob) == format_float(0):
             break
-        hitler_name = _get_hitler_name(roles)
-        fascist_names = ", ".join(_get_fascist_names(roles))
-        data.append([hitler_name, fascist_names, prob])
+        hitler, fas_mask = assignments.decode(int(codes[i]))
+        fascist_names = ", ".join(name for (j, name) in enumerate(player_names) if fas_mask >> j & 1)
+        data.append([player_names[hitler], fascist_names, prob] + ([errors[i]] if errors is not None else []))
     pd.set_option(
         "display.float_format", format_float,
         "display.max_rows", None,
         "display.max_columns", None,
         "display.width", None)
-    df = pd.DataFrame(data, columns=["Hitler", "Fascist(s)", "Probability"])
+    df = pd.DataFrame(data, columns=["Hitler", "Fascist(s)", "Probability"] + (["Std. error"] if errors is not None else []))
     print(df)
 
 
-def _plot_individual_probabilities(ind_prob: pd.DataFrame) -> None:
+def _plot_individual_probabilities(ind_prob: dict[str, list[float]], file: str | None = None) -> None:
+    """
+    Shows the chart in a window, or saves it to the given file without opening one.
+    """
+    # matplotlib is only imported when a chart is needed since it is slow to import
+    import matplotlib
+    if file is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     labels = ind_prob.keys()
     prob_fas = [x[0] for x in ind_prob.values()]
     prob_hit = [x[1] for x in ind_prob.values()]
@@ -133,45 +70,216 @@ def _plot_individual_probabilities(ind_prob: pd.DataFrame) -> None:
     ax.bar(labels, prob_hit, bottom = prob_fas, label="Hit", color=HIT_COLOUR)
     ax.bar(labels, prob_lib, bottom = [pf + ph for (pf, ph) in zip(prob_fas, prob_hit)], label="Lib", color=LIB_COLOUR)
 
-    plt.show()
+    if file is None:
+        plt.show()
+    else:
+        plt.savefig(file)
+
+
+def _individual_probabilities(codes: np.ndarray, probabilities: np.ndarray, num_players: int) -> np.ndarray:
+    """
+    Returns the probability of each role (Fas, Hit, Lib) for each player, with any leading axes of `probabilities` (e.g. one row per sampling chain) kept.
+    """
+    roles = assignments.role_matrix(codes, num_players)
+    return np.stack([probabilities @ (roles == ROLE_INDEX[role]) for role in [Role.FAS, Role.HIT, Role.LIB]], axis=-2)
 
 
-def _display_individual_probabilities(game_probabilities: list[tuple[dict[str, Role], float]], player_names: list[str]) -> None:
+def _display_individual_probabilities(individual: np.ndarray, player_names: list[str], errors: np.ndarray | None = None) -> None:
     print()
     print("Individual probabilities")
     print("------------------------")
-    individual_probabilities = {}
-    for name in player_names:
-        ind_prob = [0, 0, 0]
-        for (role, prob) in game_probabilities:
-            if role[name] == Role.FAS:
-                ind_prob[0] += prob
-            elif role[name] == Role.HIT:
-                ind_prob[1] += prob
-            else:
-                ind_prob[2] += prob
-        individual_probabilities[name] = ind_prob
+    individual_probabilities = {name: individual[:, i].tolist() for (i, name) in enumerate(player_names)}
     format_float = lambda x: f"{x:.1%}"
     pd.set_option("display.float_format", format_float)
-    df = pd.DataFrame(individual_probabilities, index=["Fas", "Hit", "Lib"])
+    if errors is None:
+        df = pd.DataFrame(individual_probabilities, index=["Fas", "Hit", "Lib"])
+    else:
+        df = pd.DataFrame({name: [f"{p:.1%} ± {e:.1%}" for (p, e) in zip(individual[:, i], errors[:, i])] for (i, name) in enumerate(player_names)}, index=["Fas", "Hit", "Lib"])
     print(df)
-    _plot_individual_probabilities(individual_probabilities)
+
+
+def _team_records(codes: np.ndarray, probabilities: np.ndarray, player_names: list[str], errors: np.ndarray | None) -> list[dict]:
+    records = []
+    for i in np.argsort(-probabilities, kind="stable"):
+        if probabilities[i] == 0:
+            break
+        hitler, fas_mask = assignments.decode(int(codes[i]))
+        record = {
+            "hitler": player_names[hitler],
+            "fascists": [name for (j, name) in enumerate(player_names) if fas_mask >> j & 1],
+            "probability": float(probabilities[i]),
+        }
+        if errors is not None:
+            record["std_error"] = float(errors[i])
+        records.append(record)
+    return records
+
+
+def to_json(game_id: int, round_num: int, codes: np.ndarray, probabilities: np.ndarray, player_names: list[str], errors: np.ndarray | None = None, individual: np.ndarray | None = None, individual_errors: np.ndarray | None = None) -> dict:
+    """
+    Returns the prediction as a JSON-serializable dictionary, with the role assignments in decreasing order of probability.
+    """
+    if individual is None:
+        individual = _individual_probabilities(codes, probabilities, len(player_names))
+    players = {}
+    for (i, name) in enumerate(player_names):
+        players[name] = {role: float(individual[r, i]) for (r, role) in enumerate(["Fas", "Hit", "Lib"])}
+        if individual_errors is not None:
+            players[name]["std_error"] = {role: float(individual_errors[r, i]) for (r, role) in enumerate(["Fas", "Hit", "Lib"])}
+    return {
+        "game": game_id,
+        "round": round_num,
+        "assignments": _team_records(codes, probabilities, player_names, errors),
+        "players": players,
+    }
+
+
+def _write_csv(file: str, codes: np.ndarray, probabilities: np.ndarray, player_names: list[str], errors: np.ndarray | None) -> None:
+    columns = ["hitler", "fascists", "probability"] + (["std_error"] if errors is not None else [])
+    with open(file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for record in _team_records(codes, probabilities, player_names, errors):
+            writer.writerow({**record, "fascists": ";".join(record["fascists"])})
+
+
+def _report(args: Namespace, game_id: int, round_num: int, codes: np.ndarray, probabilities: np.ndarray, player_names: list[str], errors: np.ndarray | None = None, individual: np.ndarray | None = None, individual_errors: np.ndarray | None = None) -> None:
+    """
+    Prints the tables and produces the output selected by `--output`.
+    """
+    if individual is None:
+        individual = _individual_probabilities(codes, probabilities, len(player_names))
+    _display_team_probabilities(codes, probabilities, player_names, errors)
+    _display_individual_probabilities(individual, player_names, individual_errors)
+    individual_probabilities = {name: individual[:, i].tolist() for (i, name) in enumerate(player_names)}
+    if args.output == "show":
+        _plot_individual_probabilities(individual_probabilities)
+    elif args.output in ["json", "csv", "png"]:
+        file = args.file or f"prediction.{args.output}"
+        if args.output == "json":
+            with open(file, "w") as f:
+                json.dump(to_json(game_id, round_num, codes, probabilities, player_names, errors, individual, individual_errors), f, indent=2)
+        elif args.output == "csv":
+            _write_csv(file, codes, probabilities, player_names, errors)
+        else:
+            _plot_individual_probabilities(individual_probabilities, file)
+        print()
+        print(f"Prediction saved to '{file}'.")
+    elif args.output != "none":
+        raise ValueError(f"Invalid output '{args.output}'.")
+
+
+def _normalize(probabilities: list[float]) -> np.ndarray | None:
+    """
+    Returns the probabilities divided by their sum, or None if they are all 0.
+    """
+    total = sum(probabilities)
+    if total == 0:
+        return None
+    return np.array(probabilities, dtype=float) / total
+
+
+def _follow(game: Game, player_names: list[str], codes: np.ndarray, args: Namespace) -> None:
+    """
+    Updates the prediction whenever new rounds of the game are saved, until interrupted. With `--output json`, `csv` or `png`, the file is saved again after each update.
+    """
+    prediction = IncrementalPrediction([assignments.to_dict(code, player_names) for code in codes])
+    data_version = None
+    try:
+        while True:
+            # Rounds appended to the files are read without reloading the rest of the data
+            version = re.data_version()
+            if version != data_version:
+                data_version = version
+                _, _, leg_sessions, pres_actions = get_game(game.game_id, -1)
+                if prediction.update(leg_sessions, pres_actions) > 0:
+                    max_round = max([ls.round_num for ls in leg_sessions])
+                    print()
+                    print(f"Prediction for game {game.game_id} up to and including round {max_round}.")
+                    probabilities = _normalize(prediction.probabilities)
+                    if probabilities is None:
+                        print("Every role assignment has probability 0.")
+                    else:
+                        _report(args, game.game_id, max_round, codes, probabilities, player_names)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print()
+
+
+def _sample(game_id: int, round_num: int, leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], args: Namespace) -> None:
+    num_chains = sampling.DEFAULT_CHAINS if args.chains is None else args.chains
+    codes, chain_probabilities, stats = sampling.sample(leg_sessions, pres_actions, player_names, args.samples, num_chains, args.fascists, args.seed, args.workers)
+    print()
+    print(stats)
+    probabilities, errors = sampling.estimate(chain_probabilities)
+    individual, individual_errors = sampling.estimate(_individual_probabilities(codes, chain_probabilities, len(player_names)))
+    _report(args, game_id, round_num, codes, probabilities, player_names, errors, individual, individual_errors)
+
+
+def _beam_search(game_id: int, round_num: int, leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], args: Namespace) -> None:
+    codes, log_probs, stats = beam.beam_search(leg_sessions, pres_actions, player_names, args.beam, args.beam_ratio, args.fascists)
+    print()
+    print(stats)
+    if len(codes) == 0:
+        print("Every role assignment has probability 0.")
+        return
+    # Normalize in log space so that long games do not underflow
+    probabilities = np.exp(log_probs - log_probs.max())
+    probabilities /= probabilities.sum()
+    _report(args, game_id, round_num, codes, probabilities, player_names)
 
 
 def main(args: Namespace) -> None:
-    game, players, leg_sessions, pres_actions = _get_game(args.game, args.round)
+    game, players, leg_sessions, pres_actions = get_game(args.game, args.round)
+    player_names = [p.name for p in players]
+    if args.fascists is None and len(player_names) > MAX_STANDARD_PLAYERS:
+        print(f"Game {game.game_id} has {len(player_names)} players. Give the number of Fascists (other than Hitler) with --fascists.")
+        return
+    if args.fascists is not None and not 0 <= args.fascists <= len(player_names) - 2:
+        print(f"Game {game.game_id} has {len(player_names)} players, so --fascists must be between 0 and {len(player_names) - 2}.")
+        return
+    if args.follow:
+        # Follow mode evaluates each new round for every assignment in this process
+        unsupported = [flag for (flag, given) in [
+            ("--round", args.round != -1), ("--engine", args.engine is not None), ("--workers", args.workers != 1),
+            ("--samples", args.samples > 0), ("--beam", args.beam > 0), ("--chains", args.chains is not None), ("--seed", args.seed is not None), ("--beam-ratio", args.beam_ratio is not None),
+            ("--no-prune", args.no_prune), ("--output show", args.output == "show"),
+        ] if given]
+        if unsupported:
+            print(f"--follow cannot be combined with {', '.join(unsupported)}.")
+            return
+        args.output = args.output or "none"
+        # Rounds saved later can rule out more assignments, so follow mode keeps all of them
+        print(f"Following game {game.game_id}. Press Ctrl+C to stop.")
+        _follow(game, player_names, assignments.code_array(len(player_names), num_fas=args.fascists), args)
+        return
+    args.engine = args.engine or "batch"
+    args.output = args.output or "show"
+    args.seed = 0 if args.seed is None else args.seed
+    args.beam_ratio = math.inf if args.beam_ratio is None else args.beam_ratio
     max_round = max([ls.round_num for ls in leg_sessions])
     print(f"Making prediction for game {game.game_id} up to and including round {max_round}.")
-    player_names = [p.name for p in players]
-    role_assignments = _get_all_role_assignments(player_names)
-    game_probabilities = []
-    num_assignments = len(role_assignments)
-    progress_bar = ProgressBar(num_assignments)
-    for (i, ra) in enumerate(role_assignments, start=1):
-        prob = pmodel.prob_game_given_roles(leg_sessions, pres_actions, ra)
-        game_probabilities.append((ra, prob))
-        progress_bar.update(i)
-    total_probability = sum([x[1] for x in game_probabilities])
-    game_probabilities = [(ra, p/total_probability) for (ra, p) in game_probabilities]
-    _display_team_probabilities(game_probabilities)
-    _display_individual_probabilities(game_probabilities, player_names)
+    if args.samples > 0:
+        _sample(game.game_id, max_round, leg_sessions, pres_actions, player_names, args)
+        return
+    if args.beam > 0:
+        _beam_search(game.game_id, max_round, leg_sessions, pres_actions, player_names, args)
+        return
+    if args.no_prune:
+        codes = assignments.code_array(len(player_names), num_fas=args.fascists)
+    else:
+        codes, prune_stats = pruning.surviving_codes(leg_sessions, pres_actions, player_names, args.fascists)
+        print()
+        print(prune_stats)
+        if len(codes) == 0:
+            print("Every role assignment has probability 0.")
+            return
+    probabilities, stats = engines.evaluate(args.engine, leg_sessions, pres_actions, player_names, codes, args.workers)
+    if stats is not None:
+        print()
+        print(stats)
+    probabilities = _normalize(probabilities)
+    if probabilities is None:
+        print("Every role assignment has probability 0.")
+        return
+    _report(args, game.game_id, max_round, codes, probabilities, player_names)
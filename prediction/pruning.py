@@ -0,0 +1,167 @@
+"""
+Removes role assignments which the game record makes impossible before they are evaluated.
+
+Some events rule out whole families of assignments no matter what the draw pile holds: a shot player cannot have been Hitler (the game would have ended), Hitler cannot have been elected Chancellor after 3 Fascist policies (same reason), and some legislative sessions and investigations have probability 0 for a given pair of roles. These constraints only depend on the roles of one or two players, so they are checked on whole blocks of assignments at once, and blocks in which Hitler is already ruled out are never generated.
+
+Investigations which the model has no row for (e.g. a President investigating themselves) make the model raise an error for the assignments which reach them. Pruning raises the same error if any assignment which was not ruled out by an earlier round reaches such an investigation, so that the result does not depend on whether pruning is used.
+"""
+
+from __future__ import annotations
+from data.models import LegislativeOutcome, LegislativeSession, Party, PresidentAction, PresidentActionType, Role
+from prediction.pmodel.game_context import GameContext
+from prediction.pmodel.investigate import prob_investigation_given_roles
+from prediction.pmodel.legislative_session import prob_legislative_session_given_pga
+from prediction.pmodel.pmodel import pres_action_in_round
+from prediction.pmodel.utils import ROLES, ROLE_INDEX
+from typing import NamedTuple
+
+import numpy as np
+import prediction.assignments as assignments
+
+
+# Reasons for which assignments are pruned
+HITLER_SHOT = "Hitler was shot"
+HITLER_ELECTED = "Hitler was elected Chancellor after 3 Fascist policies"
+IMPOSSIBLE_SESSION = "Legislative session impossible for the roles of the President and Chancellor"
+IMPOSSIBLE_INVESTIGATION = "Investigation result impossible for the roles of the President and target"
+MISSING_INVESTIGATION = "No investigation model for the roles of the President and target"
+
+
+class Constraint(NamedTuple):
+    """
+    Rules out every assignment in which the given players have one of the forbidden combinations of roles.
+    """
+    reason: str
+    round_num: int
+    players: tuple[int, ...]
+    forbidden: frozenset[tuple[Role, ...]]
+    # If set, the model raises a ValueError with this message for the assignments with a forbidden combination instead of giving them probability 0
+    error: str | None = None
+
+
+class PruneStats:
+    def __init__(self, total: int):
+        # Number of assignments before pruning
+        self.total = total
+        # Number of assignments pruned for each reason (assignments ruled out for several reasons are counted once, under the first reason found)
+        self.pruned = {}
+
+    @property
+    def num_pruned(self) -> int:
+        return sum(self.pruned.values())
+
+    def __str__(self) -> str:
+        lines = [f"Pruned {self.num_pruned} of {self.total} role assignments ({self.num_pruned / self.total:.1%})."]
+        for (reason, count) in self.pruned.items():
+            lines.append(f"  {reason}: {count}")
+        return "\n".join(lines)
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _zero_pairs(prob: np.ndarray) -> frozenset[tuple[Role, Role]]:
+    """
+    Returns the pairs of roles (indexed by the first two axes) for which every entry of the given array is 0. NaN entries (no model) are not treated as 0.
+    """
+    zero = np.all(prob == 0, axis=tuple(range(2, prob.ndim)))
+    return frozenset((ROLES[i], ROLES[j]) for (i, j) in zip(*np.nonzero(zero)))
+
+
+def _nan_pairs(prob: np.ndarray) -> list[tuple[Role, Role]]:
+    """
+    Returns the pairs of roles (indexed by the first two axes) for which some entry of the given array is NaN (no model).
+    """
+    nan = np.any(np.isnan(prob), axis=tuple(range(2, prob.ndim)))
+    return [(ROLES[i], ROLES[j]) for (i, j) in zip(*np.nonzero(nan))]
+
+
+def _update_policies(ls: LegislativeSession, context: GameContext) -> None:
+    # Same policy counts as the prediction, which do not depend on the roles
+    if ls.outcome == LegislativeOutcome.FAS or (ls.outcome == LegislativeOutcome.REJECTED and ls.top_deck == Party.FAS):
+        context.fas_passed += 1
+    elif ls.outcome == LegislativeOutcome.LIB or (ls.outcome == LegislativeOutcome.REJECTED and ls.top_deck == Party.LIB):
+        context.lib_passed += 1
+
+
+def _is_satisfied(roles: np.ndarray, constraint: Constraint) -> np.ndarray:
+    satisfied = np.ones(len(roles), dtype=bool)
+    for forbidden in constraint.forbidden:
+        match = np.ones(len(roles), dtype=bool)
+        for (player, role) in zip(constraint.players, forbidden):
+            match &= roles[:, player] == ROLE_INDEX[role]
+        satisfied &= ~match
+    return satisfied
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def get_constraints(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], num_fas: int | None = None) -> list[Constraint]:
+    """
+    Derives the hard constraints on the roles from the given rounds, in round order.
+    """
+    index = {name: i for (i, name) in enumerate(player_names)}
+    context = GameContext(len(player_names), num_fas)
+    constraints = []
+    for ls in sorted(leg_sessions, key=lambda ls: ls.round_num):
+        if ls.outcome != LegislativeOutcome.REJECTED:
+            pres = index[ls.pres_name]
+            chan = index[ls.chan_name]
+            zero_pairs = _zero_pairs(prob_legislative_session_given_pga(ls, context))
+            hitler_elected = frozenset((r, Role.HIT) for r in ROLES)
+            if context.fas_passed >= 3 and hitler_elected <= zero_pairs:
+                constraints.append(Constraint(HITLER_ELECTED, ls.round_num, (chan,), frozenset({(Role.HIT,)})))
+                zero_pairs -= hitler_elected
+            if zero_pairs:
+                constraints.append(Constraint(IMPOSSIBLE_SESSION, ls.round_num, (pres, chan), zero_pairs))
+            action = pres_action_in_round(ls, pres_actions)
+            if action is not None and action.action == PresidentActionType.SHOOT:
+                constraints.append(Constraint(HITLER_SHOT, ls.round_num, (index[action.target_name],), frozenset({(Role.HIT,)})))
+            elif action is not None and action.action == PresidentActionType.INVESTIGATE:
+                prob = prob_investigation_given_roles(action.accuse, context)
+                for (pres_role, target_role) in _nan_pairs(prob):
+                    error = f"No investigation model for president '{pres_role}', target '{target_role}', and accuse '{action.accuse}'."
+                    constraints.append(Constraint(MISSING_INVESTIGATION, ls.round_num, (pres, index[action.target_name]), frozenset({(pres_role, target_role)}), error))
+                zero_pairs = _zero_pairs(prob)
+                if zero_pairs:
+                    constraints.append(Constraint(IMPOSSIBLE_INVESTIGATION, ls.round_num, (pres, index[action.target_name]), zero_pairs))
+        _update_policies(ls, context)
+    return constraints
+
+
+def surviving_codes(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], num_fas: int | None = None) -> tuple[np.ndarray, PruneStats]:
+    """
+    Returns the role assignments (as codes from `prediction.assignments`, in the usual order) which satisfy every constraint, along with the number pruned for each reason. Raises the model's ValueError if an assignment which satisfies the earlier constraints reaches an investigation without a model.
+    """
+    num_players = len(player_names)
+    constraints = get_constraints(leg_sessions, pres_actions, player_names, num_fas)
+    stats = PruneStats(assignments.num_role_assignments(num_players, num_fas))
+    per_hitler = stats.total // num_players
+    # Players who cannot be Hitler, and the reason found first for each of them
+    not_hitler = {}
+    # Assignments ruled out after an investigation without a model must still be checked against it
+    first_error = next((k for (k, c) in enumerate(constraints) if c.error is not None), len(constraints))
+    for c in constraints[:first_error]:
+        if len(c.players) == 1 and c.forbidden == {(Role.HIT,)}:
+            not_hitler.setdefault(c.players[0], c)
+    surviving = []
+    for hitler in range(num_players):
+        if hitler in not_hitler:
+            reason = not_hitler[hitler].reason
+            stats.pruned[reason] = stats.pruned.get(reason, 0) + per_hitler
+            continue
+        codes = assignments.code_array(num_players, hitler * per_hitler, (hitler + 1) * per_hitler, num_fas)
+        roles = assignments.role_matrix(codes, num_players)
+        alive = np.ones(len(codes), dtype=bool)
+        for c in constraints:
+            pruned = alive & ~_is_satisfied(roles, c)
+            if c.error is not None:
+                if pruned.any():
+                    raise ValueError(c.error)
+                continue
+            if pruned.any():
+                stats.pruned[c.reason] = stats.pruned.get(c.reason, 0) + int(pruned.sum())
+                alive &= ~pruned
+        surviving.append(codes[alive])
+    return np.concatenate(surviving) if surviving else np.empty(0, dtype=np.int64), stats
@@ -0,0 +1,144 @@
+"""
+Approximates the prediction by sampling role assignments instead of enumerating all of them, for games with many players.
+
+Several independent Metropolis chains walk over the role assignments. Each step picks a player at random and then one of the players with a different role, proposes to swap their roles, and accepts the swap with probability min(1, p'/p), where p is `pmodel.prob_game_given_roles`. After the swap, the same two players have each other's roles, so the reverse swap is proposed with the same probability. The proposal is thus symmetric and each chain visits the assignments in proportion to their probability. The chains are independent, so the spread of their estimates gives the Monte Carlo standard error.
+"""
+
+from __future__ import annotations
+from data.models import LegislativeSession, PresidentAction, Role
+from utils.game import num_players_with_role
+
+import math
+import numpy as np
+import prediction.assignments as assignments
+import prediction.parallel as parallel
+import prediction.pmodel.pmodel as pmodel
+import random
+
+
+# Default total number of samples, split between the chains
+DEFAULT_SAMPLES = 10000
+DEFAULT_CHAINS = 8
+# Number of steps run by each chain before the samples are counted, as a fraction of its number of samples
+BURN_IN = 0.2
+# Maximum number of random assignments tried when looking for a starting point with nonzero probability
+MAX_START_ATTEMPTS = 10000
+
+
+class SampleStats:
+    def __init__(self):
+        self.chains = 0
+        # Number of samples counted (after burn-in)
+        self.samples = 0
+        self.burn_in = 0
+        self.proposed = 0
+        self.accepted = 0
+        # Number of times the likelihood was calculated (each chain remembers the assignments it has already seen)
+        self.evaluated = 0
+
+    def __add__(self, other: SampleStats) -> SampleStats:
+        total = SampleStats()
+        for (key, value) in vars(self).items():
+            setattr(total, key, value + getattr(other, key))
+        return total
+
+    def acceptance_rate(self) -> float:
+        if self.proposed == 0:
+            return 0.0
+        return self.accepted / self.proposed
+
+    def __str__(self) -> str:
+        return f"Counted {self.samples} samples from {self.chains} chains after {self.burn_in} burn-in steps ({self.acceptance_rate():.1%} of swaps accepted, {self.evaluated} likelihood evaluations)."
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _encode(roles: list[Role]) -> int:
+    hitler = roles.index(Role.HIT)
+    fas_mask = sum(1 << i for (i, r) in enumerate(roles) if r == Role.FAS)
+    return assignments.encode(hitler, fas_mask)
+
+
+def _run_chain(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], num_fas: int, num_samples: int, seed: str) -> tuple[dict[int, int], SampleStats]:
+    """
+    Runs one chain for `num_samples` steps after burn-in and returns the number of samples of each assignment (as a code).
+    """
+    rng = random.Random(seed)
+    stats = SampleStats()
+    stats.chains = 1
+    cache = {}
+    def likelihood(roles: list[Role]) -> float:
+        code = _encode(roles)
+        if code not in cache:
+            cache[code] = pmodel.prob_game_given_roles(leg_sessions, pres_actions, dict(zip(player_names, roles)))
+            stats.evaluated += 1
+        return cache[code]
+    # Start from a random assignment which is possible
+    roles = [Role.HIT] + [Role.FAS] * num_fas + [Role.LIB] * (len(player_names) - 1 - num_fas)
+    for _ in range(MAX_START_ATTEMPTS):
+        rng.shuffle(roles)
+        prob = likelihood(roles)
+        if prob > 0:
+            break
+    else:
+        raise ValueError(f"No role assignment with nonzero probability was found in {MAX_START_ATTEMPTS} attempts.")
+    stats.burn_in = int(BURN_IN * num_samples)
+    counts = {}
+    for step in range(stats.burn_in + num_samples):
+        i = rng.randrange(len(roles))
+        j = rng.choice([k for (k, r) in enumerate(roles) if r != roles[i]])
+        roles[i], roles[j] = roles[j], roles[i]
+        new_prob = likelihood(roles)
+        stats.proposed += 1
+        if new_prob >= prob or rng.random() * prob < new_prob:
+            prob = new_prob
+            stats.accepted += 1
+        else:
+            roles[i], roles[j] = roles[j], roles[i]
+        if step >= stats.burn_in:
+            code = _encode(roles)
+            counts[code] = counts.get(code, 0) + 1
+            stats.samples += 1
+    return counts, stats
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def sample(leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str], num_samples: int = DEFAULT_SAMPLES, num_chains: int = DEFAULT_CHAINS, num_fas: int | None = None, seed: int = 0, workers: int = 1) -> tuple[np.ndarray, np.ndarray, SampleStats]:
+    """
+    Samples role assignments in proportion to their probability. The `num_samples` are split as evenly as possible between the chains (of which there are no more than samples), and each chain counts its share after its burn-in steps. Returns the assignments which were visited (as codes, in enumeration order), the fraction of each chain's samples spent on each of them (one row per chain), and statistics on the run. The result only depends on `seed`, not on the number of workers.
+    """
+    num_players = len(player_names)
+    num_fas = num_players_with_role(Role.FAS, num_players) if num_fas is None else num_fas
+    if not 0 <= num_fas <= num_players - 2:
+        raise ValueError(f"A game with {num_players} players cannot have {num_fas} Fascists other than Hitler.")
+    if num_samples < 1 or num_chains < 1:
+        raise ValueError("The number of samples and of chains must be positive.")
+    num_chains = min(num_chains, num_samples)
+    # The first chains take one more sample each so that the total is exact
+    samples_per_chain = [num_samples // num_chains + (1 if chain < num_samples % num_chains else 0) for chain in range(num_chains)]
+    args = [(leg_sessions, pres_actions, player_names, num_fas, samples_per_chain[chain], f"{seed}-{chain}") for chain in range(num_chains)]
+    results = list(parallel.imap(_run_chain, args, workers))
+    visited = set().union(*[counts.keys() for (counts, _) in results])
+    codes = np.array(sorted(visited, key=lambda code: assignments.rank(code, num_players, num_fas)), dtype=np.int64)
+    index = {int(code): i for (i, code) in enumerate(codes)}
+    chain_probabilities = np.zeros((num_chains, len(codes)))
+    stats = SampleStats()
+    for (chain, (counts, chain_stats)) in enumerate(results):
+        for (code, count) in counts.items():
+            chain_probabilities[chain, index[code]] = count / chain_stats.samples
+        stats += chain_stats
+    return codes, chain_probabilities, stats
+
+
+def estimate(chain_values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the mean of the per-chain estimates (first axis) and its standard error. The standard error is NaN with a single chain.
+    """
+    num_chains = chain_values.shape[0]
+    mean = chain_values.mean(axis=0)
+    if num_chains < 2:
+        return mean, np.full(mean.shape, np.nan)
+    return mean, chain_values.std(axis=0, ddof=1) / math.sqrt(num_chains)
@@ -0,0 +1,250 @@
+"""
+Long-running prediction server which answers requests over HTTP with JSON. See `prediction.client` for the client.
+
+The server loads the data and the model tables once and keeps them in memory. It reloads the data when the data files change. Predictions are computed in a bounded pool of worker processes, which keep their own model tables and transition cache between requests. Requests for the same game which arrive within `BATCH_DELAY` of each other are batched: the game is sent to a single worker, which makes the predictions for every requested round and engine in turn, so that later ones reuse the transitions cached by earlier ones. Concurrent requests for the same game, round and engine share a single computation, and finished predictions are cached until the data changes, so repeated polling is answered without recomputing anything.
+
+Endpoints:
+- `GET /predict?game=<id>&round=<num>&engine=<name>` returns the prediction in the same format as `predict --output json`. The round and engine are optional, with the same defaults as `predict`. Unknown games and rounds, and games without any possible role assignment, return 404. Other errors return 500.
+- `GET /health` returns the number of stored games and the cache statistics.
+"""
+
+from __future__ import annotations
+from argparse import Namespace
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from data.models import LegislativeSession, PresidentAction
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prediction.history import get_game
+from urllib.parse import parse_qs, urlparse
+
+import data.repository as re
+import json
+import numpy as np
+import prediction.engines as engines
+import prediction.parallel as parallel
+import prediction.predict as predict
+import prediction.pruning as pruning
+import threading
+
+
+# Maximum number of finished predictions kept in memory
+RESULT_CACHE_SIZE = 256
+# Time (in seconds) to wait for more requests for the same game before sending them to a worker
+BATCH_DELAY = 0.005
+
+
+# ------------------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------------------
+def _predict(game_id: int, round_num: int, engine: str, leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str]) -> dict:
+    """
+    Makes a prediction in a worker process.
+    """
+    codes, _ = pruning.surviving_codes(leg_sessions, pres_actions, player_names)
+    if len(codes) == 0:
+        raise ValueError("Every role assignment has probability 0.")
+    probabilities, _ = engines.ENGINES[engine](leg_sessions, pres_actions, player_names, codes, None)
+    if sum(probabilities) == 0:
+        raise ValueError("Every role assignment has probability 0.")
+    probabilities = np.array(probabilities, dtype=float) / sum(probabilities)
+    return predict.to_json(game_id, round_num, codes, probabilities, player_names)
+
+
+def _predict_batch(game_id: int, requests: list[tuple[int, str]], leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str]) -> list[dict | Exception]:
+    """
+    Makes the predictions for several rounds and engines of one game in a worker process. Each result is either the prediction or the exception raised while making it.
+    """
+    results = []
+    for (round_num, engine) in requests:
+        try:
+            results.append(_predict(game_id, round_num, engine, [ls for ls in leg_sessions if ls.round_num <= round_num], [a for a in pres_actions if a.round_num <= round_num], player_names))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class _Batch:
+    """
+    Requests for one game which have not been sent to a worker yet.
+    """
+    def __init__(self, leg_sessions: list[LegislativeSession], pres_actions: list[PresidentAction], player_names: list[str]):
+        self.leg_sessions = leg_sessions
+        self.pres_actions = pres_actions
+        self.player_names = player_names
+        # (round, engine, future) of each request
+        self.requests = []
+
+    def resolve(self, worker: Future) -> None:
+        if worker.exception() is not None:
+            for (_, _, future) in self.requests:
+                future.set_exception(worker.exception())
+            return
+        for ((_, _, future), result) in zip(self.requests, worker.result()):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class PredictionService:
+    """
+    Batches concurrent requests for the same game, shares computations between identical requests and caches their results until the data changes.
+    """
+    def __init__(self, workers: int):
+        self.executor = ProcessPoolExecutor(parallel.num_workers(workers), initializer=parallel.init_worker)
+        self.lock = threading.Lock()
+        self.data_version = None
+        # Pending and finished predictions (as futures), by (game, round, engine)
+        self.results = OrderedDict()
+        # Batches waiting to be sent to a worker, by game
+        self.batches = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.batched = 0
+
+    def _refresh(self) -> None:
+        # Must be called with the lock held
+        version = re.data_version()
+        if version != self.data_version:
+            # The repository reloads only what changed (e.g. the rows appended to the files)
+            re.get_all_games()
+            re.get_all_players()
+            re.get_all_leg_sessions()
+            re.get_all_pres_actions()
+            self.data_version = version
+            self.results.clear()
+
+    def predict(self, game_id: int, round_num: int, engine: str) -> dict:
+        with self.lock:
+            self._refresh()
+            game, players, leg_sessions, pres_actions = get_game(game_id, round_num)
+            max_round = max([ls.round_num for ls in leg_sessions])
+            key = (game.game_id, max_round, engine)
+            future = self.results.get(key)
+            if future is None:
+                self.misses += 1
+                future = Future()
+                self.results[key] = future
+                while len(self.results) > RESULT_CACHE_SIZE:
+                    self.results.popitem(last=False)
+                batch = self.batches.get(game.game_id)
+                if batch is None:
+                    # The batch may also be used for later rounds, so it gets the whole game
+                    _, _, all_leg_sessions, all_pres_actions = get_game(game.game_id, -1)
+                    batch = _Batch(all_leg_sessions, all_pres_actions, [p.name for p in players])
+                    self.batches[game.game_id] = batch
+                    timer = threading.Timer(BATCH_DELAY, self._submit, (game.game_id,))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    self.batched += 1
+                batch.requests.append((max_round, engine, future))
+            elif future.done():
+                self.hits += 1
+                self.results.move_to_end(key)
+            else:
+                self.shared += 1
+        try:
+            return future.result()
+        except Exception:
+            # Do not cache failures, in case they come from data that is being edited or from a worker that crashed
+            with self.lock:
+                if self.results.get(key) is future:
+                    del self.results[key]
+            raise
+
+    def _submit(self, game_id: int) -> None:
+        with self.lock:
+            batch = self.batches.pop(game_id)
+        requests = [(round_num, engine) for (round_num, engine, _) in batch.requests]
+        try:
+            worker = self.executor.submit(_predict_batch, game_id, requests, batch.leg_sessions, batch.pres_actions, batch.player_names)
+        except Exception as e:
+            # E.g. the server is shutting down or a worker process died
+            for (_, _, future) in batch.requests:
+                future.set_exception(e)
+            return
+        worker.add_done_callback(batch.resolve)
+
+    def health(self) -> dict:
+        with self.lock:
+            self._refresh()
+            return {
+                "games": len(re.get_all_games()),
+                "cached": sum(f.done() for f in self.results.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "batched": self.batched,
+                "repository": re.cache_stats(),
+            }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+def _handler(service: PredictionService) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            try:
+                self._get()
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def _get(self) -> None:
+            url = urlparse(self.path)
+            query = {k: v[-1] for (k, v) in parse_qs(url.query).items()}
+            if url.path == "/health":
+                self._send(200, service.health())
+                return
+            if url.path != "/predict":
+                self._send(404, {"error": f"Unknown path '{url.path}'."})
+                return
+            try:
+                game_id = int(query.get("game", -1))
+                round_num = int(query.get("round", -1))
+            except ValueError:
+                self._send(400, {"error": "The game and round must be integers."})
+                return
+            engine = query.get("engine", "batch")
+            if engine not in engines.ENGINES:
+                self._send(400, {"error": f"Invalid engine '{engine}'."})
+                return
+            try:
+                self._send(200, service.predict(game_id, round_num, engine))
+            except (IndexError, ValueError) as e:
+                self._send(404, {"error": str(e)})
+
+        def log_message(self, format: str, *args) -> None:
+            # Polling dashboards would flood the output with one line per request
+            pass
+
+    return Handler
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def serve(args: Namespace) -> None:
+    service = PredictionService(args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), _handler(service))
+    with service.lock:
+        service._refresh()
+    print(f"Serving predictions on http://{args.host}:{args.port}. Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+        service.shutdown()
+
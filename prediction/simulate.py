@@ -0,0 +1,303 @@
+"""
+Generates synthetic games by sampling from the probability model.
+
+Roles are dealt at random and the 17 policies are shuffled into a real deck. Governments are picked uniformly at random among the eligible players and are elected with a fixed probability. The policies passed, the claims, the peeks and the investigations are then sampled from the model tables (with the same parameters as the prediction), so the simulated games follow the model's assumptions about how each role plays.
+"""
+
+from argparse import Namespace
+from contextlib import nullcontext
+from data.models import Game, LegislativeOutcome, LegislativeSession, Party, Player, PresidentAction, PresidentActionType, Role, WinReason
+from datetime import datetime, timedelta
+from functools import cache
+from prediction.pmodel.game_context import GameContext
+from prediction.pmodel.investigate import _get_investigation_tensor
+from prediction.pmodel.legislative_session import Regime, _get_leg_session_parameters, _get_leg_session_table
+from prediction.pmodel.peek import _get_peek_index
+from utils.game import num_players_with_role
+from utils.progress_bar import ProgressBar
+
+import data.repository as re
+import math
+import os
+import prediction.parallel as parallel
+import prediction.pmodel.utils as utils
+import random
+
+
+# Probability that a proposed government is elected
+ELECTION_PROBABILITY = 0.7
+
+# Date of the first simulated game (each game is one day after the previous one)
+START_DATE = datetime(2000, 1, 1)
+
+# Number of Liberal policies in the deck
+NUM_LIB_POLICIES = 6
+
+# Number of games simulated by a worker at a time
+CHUNK_SIZE = 1000
+
+# Presidential power granted by each Fascist policy, depending on the number of players
+POWERS = {
+    5: {3: PresidentActionType.PEEK, 4: PresidentActionType.SHOOT, 5: PresidentActionType.SHOOT},
+    7: {2: PresidentActionType.INVESTIGATE, 3: PresidentActionType.ELECT, 4: PresidentActionType.SHOOT, 5: PresidentActionType.SHOOT},
+    9: {1: PresidentActionType.INVESTIGATE, 2: PresidentActionType.INVESTIGATE, 3: PresidentActionType.ELECT, 4: PresidentActionType.SHOOT, 5: PresidentActionType.SHOOT},
+}
+POWERS[6] = POWERS[5]
+POWERS[8] = POWERS[7]
+POWERS[10] = POWERS[9]
+
+SimulatedGame = tuple[Game, list[Player], list[LegislativeSession], list[PresidentAction]]
+
+
+# ------------------------------------------------------------------------------
+# Distributions
+# ------------------------------------------------------------------------------
+@cache
+def _leg_session_distributions(regime: Regime) -> dict[tuple[Role, Role, int], tuple[list[tuple], list[float]]]:
+    """
+    Returns the possible legislative sessions and their cumulative probabilities, keyed by (president, chancellor, pres_get_actual). Each session is (chan_get_actual, outcome, pres_get_claim, pres_give_claim, chan_get_claim).
+    """
+    param = _get_leg_session_parameters(regime)
+    sessions = {}
+    for row in _get_leg_session_table().itertuples(index=False):
+        prob = utils.eval_probability(row.prob_str, param)
+        if prob <= 0:
+            continue
+        key = (Role(row.president), Role(row.chancellor), int(row.pres_get_actual))
+        session = (int(row.chan_get_actual), LegislativeOutcome(row.outcome), int(row.pres_get_claim), int(row.pres_give_claim), int(row.chan_get_claim))
+        sessions.setdefault(key, ([], []))
+        sessions[key][0].append(session)
+        sessions[key][1].append(prob)
+    return {key: (outcomes, _cumulative(weights)) for (key, (outcomes, weights)) in sessions.items()}
+
+
+@cache
+def _peek_distributions() -> dict[tuple[Role, int], tuple[list[int], list[float]]]:
+    """
+    Returns the possible peek claims and their cumulative probabilities, keyed by (president, number of Liberal policies seen).
+    """
+    claims = {}
+    for ((pres, pres_get_actual, pres_get_claim), prob) in _get_peek_index().items():
+        claims.setdefault((pres, pres_get_actual), ([], []))
+        claims[(pres, pres_get_actual)][0].append(pres_get_claim)
+        claims[(pres, pres_get_actual)][1].append(prob)
+    return {key: (outcomes, _cumulative(weights)) for (key, (outcomes, weights)) in claims.items()}
+
+
+def _cumulative(weights: list[float]) -> list[float]:
+    cum_weights = []
+    total = 0
+    for w in weights:
+        total += w
+        cum_weights.append(total)
+    return cum_weights
+
+
+def _sample(rng: random.Random, distribution: tuple[list, list[float]]):
+    outcomes, cum_weights = distribution
+    return rng.choices(outcomes, cum_weights=cum_weights)[0]
+
+
+# ------------------------------------------------------------------------------
+# Game
+# ------------------------------------------------------------------------------
+class _Game:
+    """
+    State of a game being simulated.
+    """
+
+    def __init__(self, game_id: int, num_players: int, rng: random.Random):
+        self.game_id = game_id
+        self.num_players = num_players
+        self.rng = rng
+        self.seats = [f"Player {i}" for i in range(1, num_players + 1)]
+        # Deal the roles
+        num_fas = num_players_with_role(Role.FAS, num_players)
+        roles = [Role.HIT] + [Role.FAS] * num_fas + [Role.LIB] * num_players_with_role(Role.LIB, num_players)
+        rng.shuffle(roles)
+        self.role = dict(zip(self.seats, roles))
+        self.fas_players = num_fas
+        # Shuffle the deck (the top of the deck is the end of the list)
+        self.deck = [Party.LIB] * NUM_LIB_POLICIES + [Party.FAS] * (GameContext.TOTAL_POLICIES - NUM_LIB_POLICIES)
+        rng.shuffle(self.deck)
+        self.discard = []
+        self.fas_passed = 0
+        self.lib_passed = 0
+        self.alive = set(self.seats)
+        self.last_pres = None
+        self.last_chan = None
+        self.pres_seat = rng.randrange(num_players) - 1
+        self.special_pres = None
+        self.election_tracker = 0
+        self.investigated = set()
+        self.leg_sessions = []
+        self.pres_actions = []
+        self.winner = None
+
+    def _next_president(self) -> str:
+        if self.special_pres is not None:
+            pres = self.special_pres
+            self.special_pres = None
+            return pres
+        self.pres_seat = (self.pres_seat + 1) % self.num_players
+        while self.seats[self.pres_seat] not in self.alive:
+            self.pres_seat = (self.pres_seat + 1) % self.num_players
+        return self.seats[self.pres_seat]
+
+    def _eligible_chancellors(self, pres: str) -> list[str]:
+        term_limited = {self.last_chan}
+        if len(self.alive) > 5:
+            term_limited.add(self.last_pres)
+        return [name for name in self.seats if name in self.alive and name != pres and name not in term_limited]
+
+    def _end(self, winning_team: Party, win_reason: WinReason) -> None:
+        self.winner = (winning_team, win_reason)
+        self.leg_sessions[-1].last_round = True
+
+    def _reshuffle_if_needed(self) -> None:
+        if len(self.deck) < 3:
+            self.deck += self.discard
+            self.discard = []
+            self.rng.shuffle(self.deck)
+
+    def _enact(self, policy: Party) -> None:
+        if policy == Party.FAS:
+            self.fas_passed += 1
+        else:
+            self.lib_passed += 1
+
+    def _check_policy_win(self) -> None:
+        if self.lib_passed == 5:
+            self._end(Party.LIB, WinReason.POLICY)
+        elif self.fas_passed == 6:
+            self._end(Party.FAS, WinReason.POLICY)
+
+    def _investigate(self, pres: str) -> PresidentAction:
+        candidates = [name for name in self.seats if name in self.alive and name != pres and name not in self.investigated]
+        # Iterate over the roles in a fixed order so that the game only depends on the seed
+        available = [role for role in utils.ROLES if any(self.role[name] == role for name in candidates)]
+        prob = _get_investigation_tensor(self.num_players, self.fas_players)[utils.ROLE_INDEX[self.role[pres]]]
+        outcomes = []
+        weights = []
+        for target_role in available:
+            for accuse in (False, True):
+                p = prob[utils.ROLE_INDEX[target_role], int(accuse)]
+                if not math.isnan(p) and p > 0:
+                    outcomes.append((target_role, accuse))
+                    weights.append(p)
+        target_role, accuse = self.rng.choices(outcomes, weights=weights)[0]
+        target = self.rng.choice([name for name in candidates if self.role[name] == target_role])
+        self.investigated.add(target)
+        return PresidentAction(self.game_id, len(self.leg_sessions), PresidentActionType.INVESTIGATE, target, None, accuse)
+
+    def _president_action(self, action: PresidentActionType, pres: str) -> None:
+        round_num = len(self.leg_sessions)
+        others = [name for name in self.seats if name in self.alive and name != pres]
+        if action == PresidentActionType.PEEK:
+            pres_get_actual = self.deck[-3:].count(Party.LIB)
+            claim = _sample(self.rng, _peek_distributions()[(self.role[pres], pres_get_actual)])
+            self.pres_actions.append(PresidentAction(self.game_id, round_num, action, None, claim, None))
+        elif action == PresidentActionType.INVESTIGATE:
+            self.pres_actions.append(self._investigate(pres))
+        elif action == PresidentActionType.ELECT:
+            target = self.rng.choice(others)
+            self.special_pres = target
+            self.pres_actions.append(PresidentAction(self.game_id, round_num, action, target, None, None))
+        elif action == PresidentActionType.SHOOT:
+            target = self.rng.choice(others)
+            self.alive.remove(target)
+            self.pres_actions.append(PresidentAction(self.game_id, round_num, action, target, None, None))
+            if self.role[target] == Role.HIT:
+                self._end(Party.LIB, WinReason.HITLER)
+
+    def _failed_election(self, pres: str, chan: str) -> None:
+        self.election_tracker += 1
+        top_deck = None
+        if self.election_tracker == 3:
+            top_deck = self.deck.pop()
+            self._enact(top_deck)
+            self.election_tracker = 0
+            self.last_pres = None
+            self.last_chan = None
+            self._reshuffle_if_needed()
+        self.leg_sessions.append(LegislativeSession(self.game_id, len(self.leg_sessions) + 1, pres, chan, LegislativeOutcome.REJECTED, top_deck, None, None, None, None, None, False, False))
+        if top_deck is not None:
+            self._check_policy_win()
+
+    def _legislative_session(self, pres: str, chan: str) -> None:
+        round_num = len(self.leg_sessions) + 1
+        self.election_tracker = 0
+        self.last_pres = pres
+        self.last_chan = chan
+        if self.fas_passed >= 3 and self.role[chan] == Role.HIT:
+            self.leg_sessions.append(LegislativeSession(self.game_id, round_num, pres, chan, LegislativeOutcome.HITLER, None, None, None, None, None, None, False, False))
+            self._end(Party.FAS, WinReason.HITLER)
+            return
+        regime = Regime(self.fas_passed < 3, self.lib_passed < 4, self.num_players < 7)
+        drawn = [self.deck.pop() for _ in range(3)]
+        pres_get_actual = drawn.count(Party.LIB)
+        key = (self.role[pres], self.role[chan], pres_get_actual)
+        chan_get_actual, outcome, pres_get_claim, pres_give_claim, chan_get_claim = _sample(self.rng, _leg_session_distributions(regime)[key])
+        policy = Party(outcome.value)
+        drawn.remove(policy)
+        self.discard += drawn
+        self._enact(policy)
+        self._reshuffle_if_needed()
+        self.leg_sessions.append(LegislativeSession(self.game_id, round_num, pres, chan, outcome, None, pres_get_claim, pres_give_claim, chan_get_claim, pres_get_actual, chan_get_actual, False, False))
+        self._check_policy_win()
+        if self.winner is None and policy == Party.FAS and self.fas_passed in POWERS[self.num_players]:
+            self._president_action(POWERS[self.num_players][self.fas_passed], pres)
+
+    def play(self) -> None:
+        while self.winner is None:
+            pres = self._next_president()
+            chan = self.rng.choice(self._eligible_chancellors(pres))
+            if self.rng.random() < ELECTION_PROBABILITY:
+                self._legislative_session(pres, chan)
+            else:
+                self._failed_election(pres, chan)
+
+    def result(self) -> SimulatedGame:
+        game = Game(self.game_id, START_DATE + timedelta(days=self.game_id - 1), *self.winner)
+        players = [Player(self.game_id, name, self.role[name]) for name in self.seats]
+        return game, players, self.leg_sessions, self.pres_actions
+
+
+# ------------------------------------------------------------------------------
+# Interface
+# ------------------------------------------------------------------------------
+def simulate_game(game_id: int, num_players: int, seed: int) -> SimulatedGame:
+    """
+    Simulates a single game. The result only depends on the arguments.
+    """
+    game = _Game(game_id, num_players, random.Random(f"{seed}-{game_id}"))
+    game.play()
+    return game.result()
+
+
+def simulate_games(start_id: int, num_games: int, seed: int, player_counts: list[int]) -> list[SimulatedGame]:
+    """
+    Simulates the games with IDs `start_id` to `start_id + num_games - 1`. The number of players in each game is picked from `player_counts`.
+    """
+    games = []
+    for game_id in range(start_id, start_id + num_games):
+        num_players = random.Random(f"{seed}-{game_id}-players").choice(player_counts)
+        games.append(simulate_game(game_id, num_players, seed))
+    return games
+
+
+def main(args: Namespace) -> None:
+    chunks = [(start, min(CHUNK_SIZE, args.games - start + 1), args.seed, args.players) for start in range(1, args.games + 1, CHUNK_SIZE)]
+    if not args.replace_data:
+        os.makedirs(args.output, exist_ok=True)
+    print(f"Simulating {args.games} games.")
+    with re.use_folder(args.output) if not args.replace_data else nullcontext():
+        progress_bar = ProgressBar(len(chunks))
+        with re.bulk_write() as add:
+            for (i, games) in enumerate(parallel.imap(simulate_games, chunks, parallel.num_workers(args.workers)), start=1):
+                for (g, players, leg_sessions, pres_actions) in games:
+                    add([g], players, leg_sessions, pres_actions)
+                progress_bar.update(i)
+    print()
+    destination = "in place of the imported data" if args.replace_data else f"in {args.output}"
+    print(f"Simulation complete. The games were saved {destination}.")
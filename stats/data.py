@@ -14,7 +14,7 @@ import data.repository as repo
 # Helper functions
 # ------------------------------------------------------------------------------
 def _num_players(gid: int) -> int:
-    return len([p for p in repo.get_all_players() if p.game_id == gid])
+    return len(repo.get_players_in_game(gid))
 
 
 def _get_games_by_num_players(n: int) -> list[Game]:
@@ -35,7 +35,7 @@ def _count_wins_by_role(history: list[tuple[Role, bool]], role: Role) -> tuple[i
 
 def _count_games_by_num_players(player_name: str) -> dict[int, int]:
     num_games = {n: 0 for n in range(5, 11)}
-    game_ids = [p.game_id for p in repo.get_all_players() if p.name == player_name]
+    game_ids = [p.game_id for p in repo.get_players_by_name(player_name)]
     for gid in game_ids:
         num_games[_num_players(gid)] += 1
     return num_games
@@ -77,7 +77,7 @@ def _p_value(player_name: str, role: Role) -> float:
     probabilities = _prob_x_games_in_role(num_games, role)
     # Expected value and observed deviation from the expectation
     mu = sum(x*probabilities[x] for x in range(tot_num_games + 1))
-    num_games_in_role = len([p for p in repo.get_all_players() if p.name == player_name and p.role == role])
+    num_games_in_role = len([p for p in repo.get_players_by_name(player_name) if p.role == role])
     deviation = abs(num_games_in_role - mu)
     # Probability of being at least as far from the mean on the lower side
     p = 0
@@ -101,11 +101,12 @@ def _investigations() -> pd.DataFrame:
     lib_target_accuse = [0, 0, 0]
     investigations = [x for x in repo.get_all_pres_actions() if x.action == PresidentActionType.INVESTIGATE]
     for inv in investigations:
-        leg_session = unique([ls for ls in repo.get_all_leg_sessions() if ls.game_id == inv.game_id and ls.round_num == inv.round_num])
+        leg_session = unique([ls for ls in repo.get_leg_sessions_in_game(inv.game_id) if ls.round_num == inv.round_num])
         pres_name = leg_session.pres_name
-        president = unique([p for p in repo.get_all_players() if p.game_id == inv.game_id and p.name == pres_name])
+        players = repo.get_players_in_game(inv.game_id)
+        president = unique([p for p in players if p.name == pres_name])
         pres_role = president.role
-        target = unique([p for p in repo.get_all_players() if p.game_id == inv.game_id and p.name == inv.target_name])
+        target = unique([p for p in players if p.name == inv.target_name])
         target_role = target.role
         col = 0 if pres_role == Role.FAS else 1 if pres_role == Role.HIT else 2
         if target_role == Role.FAS and not inv.accuse:
@@ -167,11 +168,11 @@ def _player_win_rates() -> pd.DataFrame:
     player_names = {p.name for p in players}
     for name in player_names:
         # Collect relevant data
-        player_history = [(p.role, p.game_id) for p in players if p.name == name]
+        player_history = [(p.role, p.game_id) for p in repo.get_players_by_name(name)]
         history = []
         for ph in player_history:
             game_id = ph[1]
-            game = unique([g for g in repo.get_all_games() if g.game_id == game_id])
+            game = unique(repo.get_games_by_id(game_id))
             history.append((ph[0], _player_won(ph[0], game.winning_team)))
         # Analyse data
         num_games = len(history)
@@ -0,0 +1,81 @@
+"""
+Shared fixtures. The example games in "data/example.xlsx" serve as sample data, and each test which stores data gets its own folder.
+"""
+
+from __future__ import annotations
+
+from prediction.history import max_round
+
+import config
+import data.repository as re
+import data.sync as sync
+import numpy as np
+import prediction.assignments as assignments
+import prediction.engines as engines
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def root(request: pytest.FixtureRequest) -> str:
+    """
+    Runs the tests from the root of the repository, since the paths in `config` are relative to it.
+    """
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(request.config.rootpath)
+        yield str(request.config.rootpath)
+
+
+@pytest.fixture(scope="session")
+def sample() -> tuple[list, list, list, list]:
+    """
+    Returns the games, players, legislative sessions and president actions of the example spreadsheet.
+    """
+    return sync._parse_data(sync._read_spreadsheet(config.WORKBOOK_NAME))
+
+
+@pytest.fixture(scope="session")
+def sample_games(sample: tuple[list, list, list, list]) -> dict[int, tuple[list, list, list[str]]]:
+    """
+    Returns the legislative sessions, president actions and player names of each example game, by game ID. As in `predict`, the rounds from the one which ends the game are left out.
+    """
+    games, players, leg_sessions, pres_actions = sample
+    result = {}
+    for g in games:
+        game_leg_sessions = [ls for ls in leg_sessions if ls.game_id == g.game_id]
+        last = max_round(list(game_leg_sessions))
+        result[g.game_id] = (
+            [ls for ls in game_leg_sessions if ls.round_num <= last],
+            [a for a in pres_actions if a.game_id == g.game_id and a.round_num <= last],
+            [p.name for p in players if p.game_id == g.game_id],
+        )
+    return result
+
+
+def _scalar(game: tuple[list, list, list[str]]) -> tuple[np.ndarray, np.ndarray]:
+    leg_sessions, pres_actions, player_names = game
+    codes = assignments.code_array(len(player_names))
+    probabilities, _ = engines.ENGINES["scalar"](leg_sessions, pres_actions, player_names, codes, None)
+    return codes, np.array(probabilities)
+
+
+@pytest.fixture(scope="session")
+def scalar(sample_games: dict) -> dict[int, tuple[np.ndarray, np.ndarray] | str]:
+    """
+    Returns the role assignments and their probability from the scalar model for each example game, or the message of the error it raised.
+    """
+    results = {}
+    for (game_id, game) in sample_games.items():
+        try:
+            results[game_id] = _scalar(game)
+        except ValueError as e:
+            results[game_id] = str(e)
+    return results
+
+
+@pytest.fixture
+def folder(tmp_path) -> str:
+    """
+    Points the repository at an empty folder for the duration of the test.
+    """
+    with re.use_folder(str(tmp_path)):
+        yield str(tmp_path)
@@ -0,0 +1,28 @@
+"""
+Helpers shared by the tests which store data.
+"""
+
+from __future__ import annotations
+
+import data.repository as re
+
+
+def rows(objects) -> list[dict]:
+    """
+    Returns the fields of each object. The CSV backend reads the missing Chancellor of a rejected government back as an empty name, so it is compared as one.
+    """
+    return [{k: "" if k == "chan_name" and v is None else v for (k, v) in vars(obj).items()} for obj in objects]
+
+
+def load_all() -> list[list[dict]]:
+    """
+    Returns the fields of every stored object, table by table.
+    """
+    return [rows(re.get_all_games()), rows(re.get_all_players()), rows(re.get_all_leg_sessions()), rows(re.get_all_pres_actions())]
+
+
+def expected(sample: tuple) -> list[list[dict]]:
+    """
+    Returns the fields of the given games, players, legislative sessions and president actions, as `load_all` does.
+    """
+    return [rows(objects) for objects in sample]
@@ -0,0 +1,73 @@
+"""
+Enumeration, ranking and encoding of role assignments.
+"""
+
+from __future__ import annotations
+from data.models import Role
+from prediction.pmodel.utils import ROLE_INDEX
+
+import itertools
+import math
+import prediction.assignments as assignments
+import pytest
+
+
+@pytest.mark.parametrize("num_players", [5, 7, 10])
+def test_rank_matches_enumeration_order(num_players: int):
+    codes = list(assignments.iter_codes(num_players))
+    assert len(codes) == len(set(codes)) == assignments.num_role_assignments(num_players)
+    for (index, code) in enumerate(codes):
+        assert assignments.is_valid(code, num_players)
+        assert assignments.rank(code, num_players) == index
+        assert assignments.unrank(index, num_players) == code
+    assert assignments.code_array(num_players).tolist() == codes
+
+
+@pytest.mark.parametrize("num_fas", [0, 1, 3])
+def test_enumeration_covers_every_assignment(num_fas: int):
+    num_players = 6
+    codes = set(assignments.iter_codes(num_players, num_fas=num_fas))
+    expected = set()
+    for hitler in range(num_players):
+        others = [i for i in range(num_players) if i != hitler]
+        for fascists in itertools.combinations(others, num_fas):
+            expected.add(assignments.encode(hitler, sum(1 << i for i in fascists)))
+    assert codes == expected
+    assert len(codes) == assignments.num_role_assignments(num_players, num_fas) == num_players * math.comb(num_players - 1, num_fas)
+
+
+def test_ranges_of_assignments_can_be_generated_separately():
+    num_players = 8
+    codes = assignments.code_array(num_players).tolist()
+    for (start, stop) in [(0, 1), (5, 40), (27, 28), (100, None), (len(codes) - 3, len(codes) + 10), (len(codes), None)]:
+        assert assignments.code_array(num_players, start, stop).tolist() == codes[start:stop]
+
+
+def test_encode_and_decode():
+    code = assignments.encode(3, 0b10010)
+    assert assignments.decode(code) == (3, 0b10010)
+    assert assignments.is_valid(code, 5, 2)
+    # Hitler cannot also be Fascist, and every player must be in the game
+    assert not assignments.is_valid(assignments.encode(1, 0b00011), 5, 2)
+    assert not assignments.is_valid(assignments.encode(5, 0b00011), 5, 2)
+    assert not assignments.is_valid(assignments.encode(0, 0b100010), 5, 2)
+
+
+def test_dict_round_trip():
+    player_names = ["a", "b", "c", "d", "e", "f", "g"]
+    for code in assignments.iter_codes(len(player_names)):
+        role = assignments.to_dict(code, player_names)
+        assert list(role.values()).count(Role.HIT) == 1
+        assert assignments.from_dict(role, player_names) == code
+    assert len(assignments.get_all_role_assignments(player_names)) == assignments.num_role_assignments(len(player_names))
+    with pytest.raises(ValueError):
+        assignments.from_dict({name: Role.LIB for name in player_names}, player_names)
+
+
+def test_role_matrix_matches_to_dict():
+    player_names = ["a", "b", "c", "d", "e", "f"]
+    codes = assignments.code_array(len(player_names))
+    matrix = assignments.role_matrix(codes, len(player_names))
+    for (code, row) in zip(codes, matrix):
+        role = assignments.to_dict(code, player_names)
+        assert row.tolist() == [ROLE_INDEX[role[name]] for name in player_names]
@@ -0,0 +1,57 @@
+"""
+Scoring predictions against the true roles, and resuming a backtest from its checkpoint.
+"""
+
+from __future__ import annotations
+from argparse import Namespace
+
+import data.repository as re
+import json
+import math
+import numpy as np
+import prediction.assignments as assignments
+import prediction.backtest as backtest
+import pytest
+
+
+def _args(checkpoint: str, **kwargs) -> Namespace:
+    return Namespace(**{"start": 0, "end": 5, "rounds": "last", "engine": "batch", "workers": 1, "no_prune": False, "checkpoint": checkpoint, **kwargs})
+
+
+def _checkpoint(file: str) -> list[dict]:
+    with open(file) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_score():
+    codes = assignments.code_array(5)
+    probabilities = np.zeros(len(codes))
+    probabilities[3] = 3
+    probabilities[7] = 1
+    score = backtest._score(codes, list(probabilities), int(codes[7]), 5)
+    assert score["log_loss"] == pytest.approx(-math.log(0.25))
+    assert score["rank"] == 2
+    assert score["assignments"] == len(codes)
+    # A certain and correct prediction is perfect
+    score = backtest._score(codes, list(np.eye(len(codes))[3]), int(codes[3]), 5)
+    assert (score["log_loss"], score["brier"], score["rank"]) == (0, 0, 1)
+
+
+def test_checkpoint_is_resumed_with_the_same_settings(folder: str, sample: tuple, tmp_path):
+    re.save_all(*sample)
+    file = str(tmp_path / "checkpoint.jsonl")
+    backtest.main(_args(file))
+    results = _checkpoint(file)
+    assert sorted(r["game"] for r in results) == [g.game_id for g in sample[0] if g.game_id <= 5]
+    backtest.main(_args(file))
+    assert _checkpoint(file) == results
+
+
+@pytest.mark.parametrize("option", [{"no_prune": True}, {"engine": "prefix"}, {"rounds": "half"}])
+def test_checkpoint_is_not_reused_with_other_settings(option: dict, folder: str, sample: tuple, tmp_path):
+    re.save_all(*sample)
+    file = str(tmp_path / "checkpoint.jsonl")
+    backtest.main(_args(file))
+    num_results = len(_checkpoint(file))
+    backtest.main(_args(file, **option))
+    assert len(_checkpoint(file)) == 2 * num_results
@@ -0,0 +1,45 @@
+"""
+Beam search over partial role assignments.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import prediction.pmodel.beam as beam
+
+
+def test_wide_beam_matches_scalar(sample_games: dict, scalar: dict):
+    for (game_id, (leg_sessions, pres_actions, player_names)) in sample_games.items():
+        expected = scalar[game_id]
+        if isinstance(expected, str) or not expected[1].any():
+            continue
+        codes, log_probs, stats = beam.beam_search(leg_sessions, pres_actions, player_names, width=10 ** 6)
+        all_codes, probabilities = expected
+        assert stats.discarded == 0
+        assert set(codes.tolist()) == set(all_codes[probabilities > 0].tolist()), f"Game {game_id}"
+        beam_probabilities = np.exp(log_probs - log_probs.max())
+        beam_probabilities /= beam_probabilities.sum()
+        np.testing.assert_allclose(beam_probabilities, probabilities[np.isin(all_codes, codes)] / probabilities.sum(), rtol=1e-9, err_msg=f"Game {game_id}")
+
+
+def test_narrow_beam_bounds_the_discarded_mass(sample_games: dict, scalar: dict):
+    for (game_id, (leg_sessions, pres_actions, player_names)) in sample_games.items():
+        expected = scalar[game_id]
+        if isinstance(expected, str) or not expected[1].any():
+            continue
+        codes, _, stats = beam.beam_search(leg_sessions, pres_actions, player_names, width=5)
+        all_codes, probabilities = expected
+        lost = probabilities[~np.isin(all_codes, codes)].sum() / probabilities.sum()
+        assert lost <= stats.discarded_mass + 1e-9, f"Game {game_id}"
+
+
+def test_log_ratio_bounds_the_discarded_mass(sample_games: dict, scalar: dict):
+    for (game_id, (leg_sessions, pres_actions, player_names)) in sample_games.items():
+        expected = scalar[game_id]
+        if isinstance(expected, str) or not expected[1].any():
+            continue
+        codes, log_probs, stats = beam.beam_search(leg_sessions, pres_actions, player_names, width=10 ** 6, log_ratio=2.0)
+        assert log_probs.max() - log_probs.min() <= 2.0 + 1e-9
+        all_codes, probabilities = expected
+        lost = probabilities[~np.isin(all_codes, codes)].sum() / probabilities.sum()
+        assert lost <= stats.discarded_mass + 1e-9, f"Game {game_id}"
@@ -0,0 +1,60 @@
+"""
+Rewriting every CSV table at once with `bulk_write`.
+"""
+
+from __future__ import annotations
+
+import config
+import data.repository as re
+import json
+import os
+import pytest
+
+from helpers import expected, load_all, rows
+
+
+@pytest.mark.parametrize("backend", re.BACKENDS)
+def test_bulk_write_in_several_calls(backend: str, folder: str, sample: tuple):
+    games, players, leg_sessions, pres_actions = sample
+    with re.use_backend(backend):
+        with re.bulk_write() as add:
+            add(games=games[:10], players=players)
+            add(games=games[10:], leg_sessions=leg_sessions, pres_actions=pres_actions)
+        assert load_all() == expected(sample)
+
+
+@pytest.mark.parametrize("backend", re.BACKENDS)
+def test_failed_bulk_write_keeps_the_old_data(backend: str, folder: str, sample: tuple):
+    with re.use_backend(backend):
+        re.save_all(*sample)
+        load_all()
+        files = set(os.listdir(folder))
+        with pytest.raises(RuntimeError):
+            with re.bulk_write() as add:
+                add(games=sample[0][:1])
+                raise RuntimeError()
+        assert load_all() == expected(sample)
+        assert set(os.listdir(folder)) == files
+
+
+def test_tables_keep_their_names(folder: str, sample: tuple):
+    with re.use_backend("csv"):
+        re.save_all(*sample)
+        re.save_all(*sample)
+    assert set(os.listdir(folder)) == set(re.TABLE_FILES.values())
+
+
+def test_interrupted_swap_is_completed(folder: str, sample: tuple):
+    games = sample[0]
+    with re.use_backend("csv"):
+        re.save_all(*sample)
+        assert len(re.get_all_games()) == len(games)
+        # A writer crashed after listing its new game table in the journal, before moving it into place
+        with open(f"{folder}/game.csv.new.tmp", "w", newline="") as f:
+            f.write(",".join(re.GAME_HEADER) + "\r\n")
+            f.write(f"{games[0].game_id},{games[0].date:%Y-%m-%d},{games[0].winning_team},{games[0].win_reason}\r\n")
+        with open(f"{folder}/{re.TABLES_JOURNAL_FILE}", "w") as f:
+            json.dump({"game.csv": "game.csv.new.tmp"}, f)
+        assert rows(re.get_all_games()) == rows(games[:1])
+        assert set(os.listdir(folder)) == set(re.TABLE_FILES.values()) | {"snapshot"}
+        assert os.path.samefile(config.GAME_FILE_PATH, f"{folder}/game.csv")
@@ -0,0 +1,51 @@
+"""
+The checks which keep the cached tables up to date when the data files change.
+"""
+
+from __future__ import annotations
+
+import config
+import data.repository as re
+
+from helpers import rows
+
+
+def test_appended_rows_are_parsed_alone(folder: str, sample: tuple):
+    games = sample[0]
+    with re.use_backend("csv"):
+        re.save_all(games[:-1], [], [], [])
+        assert len(re.get_all_games()) == len(games) - 1
+        appends = re.cache_stats()["appends"]
+        re.save_game(games[-1])
+        assert rows(re.get_all_games()) == rows(games)
+        assert re.cache_stats()["appends"] == appends + 1
+
+
+def test_edit_of_an_earlier_row_with_appended_rows_is_seen(folder: str, sample: tuple):
+    games = sample[0]
+    with re.use_backend("csv"):
+        re.save_all(games[:-1], [], [], [])
+        re.get_all_games()
+        appends = re.cache_stats()["appends"]
+        # Another process edits the first game in place (keeping the length of the file) and appends a game
+        with open(config.GAME_FILE_PATH, "rb") as f:
+            data = f.read()
+        old = f"{games[0].game_id},{games[0].date:%Y-%m-%d},".encode()
+        assert data.count(old) == 1
+        new = f"{games[0].game_id},{games[0].date.replace(year=games[0].date.year - 1):%Y-%m-%d},".encode()
+        with open(config.GAME_FILE_PATH, "wb") as f:
+            f.write(data.replace(old, new))
+            f.write(f"{games[-1].game_id},{games[-1].date:%Y-%m-%d},{games[-1].winning_team},{games[-1].win_reason}\r\n".encode())
+        loaded = re.get_all_games()
+        assert loaded[0].date.year == games[0].date.year - 1
+        assert vars(loaded[-1]) == vars(games[-1])
+        assert re.cache_stats()["appends"] == appends
+
+
+def test_rewritten_file_is_reloaded(folder: str, sample: tuple):
+    games = sample[0]
+    with re.use_backend("csv"):
+        re.save_all(games, [], [], [])
+        re.get_all_games()
+        re.save_all(games[:5], [], [], [])
+        assert rows(re.get_all_games()) == rows(games[:5])
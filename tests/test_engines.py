@@ -0,0 +1,24 @@
+"""
+The batch and prefix engines must agree with the scalar model on the example games.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import prediction.assignments as assignments
+import prediction.engines as engines
+
+
+@pytest.mark.parametrize("engine", ["batch", "prefix"])
+def test_engine_matches_scalar(engine: str, sample_games: dict, scalar: dict):
+    for (game_id, (leg_sessions, pres_actions, player_names)) in sample_games.items():
+        codes = assignments.code_array(len(player_names))
+        expected = scalar[game_id]
+        if isinstance(expected, str):
+            with pytest.raises(ValueError, match="No .* model"):
+                engines.ENGINES[engine](leg_sessions, pres_actions, player_names, codes, None)
+            continue
+        probabilities, _ = engines.ENGINES[engine](leg_sessions, pres_actions, player_names, codes, None)
+        np.testing.assert_allclose(probabilities, expected[1], rtol=1e-9, atol=0, err_msg=f"Game {game_id}")
@@ -0,0 +1,41 @@
+"""
+The precomputed draw probabilities.
+"""
+
+from __future__ import annotations
+
+import math
+import numpy as np
+import prediction.pmodel.hypergeometric as hyper
+import pytest
+
+
+def _draw_probability(n: int, x: int, k: int, a: int) -> float:
+    return math.comb(x, a) * math.comb(n - x, k - a) / math.comb(n, k)
+
+
+def test_draw_probabilities_match_direct_computation():
+    for n in range(hyper.MAX_DRAW_PILE_SIZE + 1):
+        for x in range(min(hyper.MAX_LIB, n) + 1):
+            for k in range(min(hyper.MAX_DRAWN, n) + 1):
+                probabilities = hyper.draw_probabilities(n, k)[x]
+                assert probabilities == pytest.approx([_draw_probability(n, x, k, a) for a in range(k + 1)])
+                assert probabilities.sum() == pytest.approx(1)
+
+
+def test_update_matrices_move_drawn_policies_out_of_the_pile():
+    for (n, k, a) in [(17, 3, 0), (17, 3, 2), (9, 2, 1), (5, 3, 3), (3, 1, 1)]:
+        matrix = hyper.UPDATE[n, k, a]
+        for x in range(hyper.MAX_LIB + 1):
+            for y in range(hyper.MAX_LIB + 1):
+                expected = _draw_probability(n, y, k, a) if y == x + a and y <= n else 0
+                assert matrix[x, y] == pytest.approx(expected)
+
+
+def test_posterior_matrix_weights_the_updates_by_the_likelihood():
+    n, k = 12, 3
+    likelihood = np.array([0.1, 0.4, 0.0, 0.5])
+    expected = sum(likelihood[a] * hyper.UPDATE[n, k, a] for a in range(k + 1))
+    assert np.allclose(hyper.posterior_matrix(n, k, likelihood), expected)
+    # With a uniform likelihood, the draws from a pile with y Liberal policies have total probability 1
+    assert np.allclose(hyper.posterior_matrix(n, k, np.ones(k + 1)).sum(axis=0), 1)
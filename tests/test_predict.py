@@ -0,0 +1,65 @@
+"""
+The predict subcommand, in particular follow mode.
+"""
+
+from __future__ import annotations
+from argparse import Namespace
+
+import data.repository as re
+import json
+import prediction.predict as predict
+import pytest
+
+
+def _args(**kwargs) -> Namespace:
+    defaults = {
+        "game": -1, "round": -1, "engine": None, "workers": 1, "fascists": None, "samples": 0, "beam": 0, "chains": None, "beam_ratio": None,
+        "seed": None, "no_prune": False, "follow": False, "interval": 0, "output": "none", "file": None,
+    }
+    return Namespace(**{**defaults, **kwargs})
+
+
+def _probabilities(prediction: dict) -> dict[str, float]:
+    return {f"{a['hitler']}: {', '.join(a['fascists'])}": a["probability"] for a in prediction["assignments"]}
+
+
+@pytest.mark.parametrize(("options", "flag"), [
+    ({"round": 3}, "--round"), ({"engine": "batch"}, "--engine"), ({"workers": 2}, "--workers"), ({"samples": 100}, "--samples"), ({"beam": 10}, "--beam"),
+    ({"chains": 4}, "--chains"), ({"seed": 0}, "--seed"), ({"beam_ratio": 5.0}, "--beam-ratio"), ({"no_prune": True}, "--no-prune"), ({"output": "show"}, "--output show"),
+])
+def test_follow_rejects_ignored_options(options: dict, flag: str, folder: str, sample: tuple, monkeypatch, capsys):
+    re.save_all(*sample)
+    monkeypatch.setattr(predict, "_follow", None)
+    predict.main(_args(follow=True, **options))
+    assert f"--follow cannot be combined with {flag}." in capsys.readouterr().out
+
+
+def test_follow_updates_when_rounds_are_saved(folder: str, sample: tuple, tmp_path, monkeypatch, capsys):
+    games, players, leg_sessions, pres_actions = sample
+    game_id = games[0].game_id
+    # Only the first rounds of the game are saved at first
+    later = [ls for ls in leg_sessions if ls.game_id == game_id and ls.round_num > 3]
+    re.save_all(games, players, [ls for ls in leg_sessions if ls not in later], [a for a in pres_actions if a.game_id != game_id or a.round_num <= 3])
+    file = str(tmp_path / "prediction.json")
+    saved = []
+    def sleep(seconds: float) -> None:
+        with open(file) as f:
+            saved.append(json.load(f))
+        if len(saved) == 1:
+            for ls in later:
+                re.save_leg_session(ls)
+            for a in pres_actions:
+                if a.game_id == game_id and a.round_num > 3:
+                    re.save_pres_action(a)
+        else:
+            raise KeyboardInterrupt()
+    monkeypatch.setattr(predict.time, "sleep", sleep)
+    predict.main(_args(game=game_id, follow=True, output="json", file=file))
+    assert [prediction["round"] for prediction in saved] == [3, predict.get_game(game_id, -1)[2][-1].round_num]
+    # The last update matches a prediction made from scratch
+    expected_file = str(tmp_path / "expected.json")
+    predict.main(_args(game=game_id, output="json", file=expected_file))
+    with open(expected_file) as f:
+        expected = json.load(f)
+    assert _probabilities(saved[-1]) == pytest.approx(_probabilities(expected))
+    assert capsys.readouterr().out.count(f"Prediction for game {game_id} up to and including round") == 2
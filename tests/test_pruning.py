@@ -0,0 +1,31 @@
+"""
+Pruning the role assignments ruled out by the game record.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import prediction.pruning as pruning
+import pytest
+
+
+def test_pruning_keeps_every_possible_assignment(sample_games: dict, scalar: dict):
+    for (game_id, (leg_sessions, pres_actions, player_names)) in sample_games.items():
+        expected = scalar[game_id]
+        if isinstance(expected, str):
+            continue
+        codes, stats = pruning.surviving_codes(leg_sessions, pres_actions, player_names)
+        all_codes, probabilities = expected
+        kept = np.isin(all_codes, codes)
+        assert not probabilities[~kept].any(), f"Game {game_id}"
+        assert stats.num_pruned == (~kept).sum()
+
+
+def test_pruning_raises_the_model_error(sample_games: dict, scalar: dict):
+    for (game_id, (leg_sessions, pres_actions, player_names)) in sample_games.items():
+        expected = scalar[game_id]
+        if not isinstance(expected, str) or not expected.startswith("No investigation model"):
+            continue
+        with pytest.raises(ValueError) as error:
+            pruning.surviving_codes(leg_sessions, pres_actions, player_names)
+        assert str(error.value) == expected
@@ -0,0 +1,88 @@
+"""
+Round trips through each storage backend, and the SQLite schema.
+"""
+
+from __future__ import annotations
+from argparse import Namespace
+from data.models import Game
+
+import config
+import data.migrate as migrate
+import data.repository as re
+import data.sqlite_repository as sql
+import os
+import pytest
+import sqlite3
+
+from helpers import expected, load_all, rows
+
+
+# ------------------------------------------------------------------------------
+# Round trips
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize("backend", re.BACKENDS)
+def test_save_all_round_trip(backend: str, folder: str, sample: tuple):
+    with re.use_backend(backend):
+        re.save_all(*sample)
+        assert load_all() == expected(sample)
+        games, players, leg_sessions, pres_actions = sample
+        game_id = games[3].game_id
+        assert vars(re.get_game_by_id(game_id)) == vars(games[3])
+        assert rows(re.get_games_by_id(game_id)) == [vars(games[3])]
+        assert re.get_game_by_id(10 ** 6) is None
+        assert rows(re.get_players_in_game(game_id)) == rows(p for p in players if p.game_id == game_id)
+        assert rows(re.get_leg_sessions_in_game(game_id)) == rows(ls for ls in leg_sessions if ls.game_id == game_id)
+        assert rows(re.get_pres_actions_in_game(game_id)) == rows(a for a in pres_actions if a.game_id == game_id)
+        name = players[0].name
+        assert rows(re.get_players_by_name(name)) == rows(p for p in players if p.name == name)
+        assert re.count_games() == len(games)
+
+
+def test_migrate_round_trip(folder: str, sample: tuple):
+    with re.use_backend("csv"):
+        re.save_all(*sample)
+    migrate.main(Namespace(to="sqlite"))
+    with re.use_backend("sqlite"):
+        assert load_all() == expected(sample)
+        re.clear_games()
+    with re.use_backend("csv"):
+        re.clear_games()
+    migrate.main(Namespace(to="csv"))
+    with re.use_backend("csv"):
+        assert load_all()[0] == []
+
+
+# ------------------------------------------------------------------------------
+# SQLite
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize("backend", re.BACKENDS)
+def test_duplicate_game_ids_are_kept(backend: str, folder: str, sample: tuple):
+    games = sample[0]
+    duplicate = Game(games[0].game_id, games[1].date, games[1].winning_team, games[1].win_reason)
+    with re.use_backend(backend):
+        re.save_all(games, [], [], [])
+        re.save_game(duplicate)
+        assert rows(re.get_games_by_id(duplicate.game_id)) == rows([games[0], duplicate])
+        assert vars(re.get_game_by_id(duplicate.game_id)) == vars(duplicate)
+
+
+def test_deleted_database_is_created_again(folder: str, sample: tuple):
+    with re.use_backend("sqlite"):
+        re.save_all(*sample)
+        os.remove(config.SQLITE_FILE_PATH)
+        assert re.count_games() == 0
+        re.save_game(sample[0][0])
+        assert rows(re.get_all_games()) == rows(sample[0][:1])
+
+
+def test_old_database_is_upgraded(folder: str, sample: tuple):
+    games = sample[0]
+    conn = sqlite3.connect(config.SQLITE_FILE_PATH)
+    with conn:
+        conn.executescript(sql.SCHEMA.replace("id INTEGER NOT NULL", "id INTEGER PRIMARY KEY"))
+        conn.executemany(f"INSERT INTO game ({sql.GAME_COLUMNS}) VALUES (?, ?, ?, ?)", map(sql._game_row, games[:3]))
+    conn.close()
+    with re.use_backend("sqlite"):
+        assert rows(re.get_all_games()) == rows(games[:3])
+        re.save_game(games[0])
+        assert len(re.get_games_by_id(games[0].game_id)) == 2
@@ -0,0 +1,40 @@
+"""
+Sampling role assignments with Metropolis chains.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import prediction.sampling as sampling
+import pytest
+
+
+def test_sampling_visits_possible_assignments(sample_games: dict, scalar: dict):
+    game_id = next(g for (g, expected) in scalar.items() if not isinstance(expected, str) and expected[1].any())
+    leg_sessions, pres_actions, player_names = sample_games[game_id]
+    all_codes, probabilities = scalar[game_id]
+    codes, chain_probabilities, stats = sampling.sample(leg_sessions, pres_actions, player_names, 400, 4, seed=1)
+    assert stats.samples == 400
+    assert stats.burn_in == 4 * int(sampling.BURN_IN * 100)
+    assert np.allclose(chain_probabilities.sum(axis=1), 1)
+    assert probabilities[np.isin(all_codes, codes)].all()
+    # The result only depends on the seed
+    again, again_probabilities, _ = sampling.sample(leg_sessions, pres_actions, player_names, 400, 4, seed=1)
+    assert np.array_equal(codes, again) and np.array_equal(chain_probabilities, again_probabilities)
+
+
+def test_sampling_rejects_invalid_number_of_fascists(sample_games: dict):
+    leg_sessions, pres_actions, player_names = sample_games[2]
+    with pytest.raises(ValueError):
+        sampling.sample(leg_sessions, pres_actions, player_names, 100, 2, num_fas=len(player_names) - 1)
+
+
+def test_samples_are_split_exactly_between_chains(sample_games: dict, scalar: dict):
+    game_id = next(g for (g, expected) in scalar.items() if not isinstance(expected, str) and expected[1].any())
+    leg_sessions, pres_actions, player_names = sample_games[game_id]
+    _, chain_probabilities, stats = sampling.sample(leg_sessions, pres_actions, player_names, 10, 4, seed=1)
+    assert stats.samples == 10
+    assert stats.chains == len(chain_probabilities) == 4
+    # There are never more chains than samples
+    _, chain_probabilities, stats = sampling.sample(leg_sessions, pres_actions, player_names, 3, 8, seed=1)
+    assert stats.samples == stats.chains == len(chain_probabilities) == 3
@@ -0,0 +1,89 @@
+"""
+The prediction server and its client.
+"""
+
+from __future__ import annotations
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from prediction.history import get_game
+
+import data.repository as re
+import json
+import prediction.client as client
+import prediction.server as server
+import pytest
+import threading
+import urllib.error
+import urllib.request
+
+
+@pytest.fixture
+def url(folder: str, sample: tuple):
+    """
+    Serves predictions for the example games from a local port, and returns its URL.
+    """
+    re.save_all(*sample)
+    service = server.PredictionService(1)
+    http_server = server.ThreadingHTTPServer(("127.0.0.1", 0), server._handler(service))
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{http_server.server_address[1]}"
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+        service.shutdown()
+
+
+def _get(url: str) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def _expected(game_id: int, round_num: int, engine: str = "batch") -> dict:
+    _, players, leg_sessions, pres_actions = get_game(game_id, round_num)
+    max_round = max(ls.round_num for ls in leg_sessions)
+    return server._predict(game_id, max_round, engine, leg_sessions, pres_actions, [p.name for p in players])
+
+
+def test_prediction_matches_predict(url: str, sample: tuple):
+    game_id = sample[0][0].game_id
+    status, body = _get(f"{url}/predict?game={game_id}&round=4&engine=prefix")
+    assert status == 200
+    assert body == json.loads(json.dumps(_expected(game_id, 4, "prefix")))
+
+
+def test_requests_for_one_game_are_batched(url: str, sample: tuple, monkeypatch):
+    # Leave enough time for every request to join the batch
+    monkeypatch.setattr(server, "BATCH_DELAY", 0.5)
+    game_id = sample[0][0].game_id
+    rounds = [3, 4, 5, 6]
+    with ThreadPoolExecutor(len(rounds)) as executor:
+        responses = list(executor.map(lambda r: _get(f"{url}/predict?game={game_id}&round={r}"), rounds))
+    assert [body for (_, body) in responses] == [json.loads(json.dumps(_expected(game_id, r))) for r in rounds]
+    health = _get(f"{url}/health")[1]
+    assert health["misses"] == len(rounds)
+    assert health["batched"] == len(rounds) - 1
+    # Repeated requests are answered from the cache
+    _get(f"{url}/predict?game={game_id}&round=3")
+    assert _get(f"{url}/health")[1]["hits"] == 1
+
+
+@pytest.mark.parametrize(("query", "status"), [("game=1000000", 404), ("game=x", 400), ("engine=fast", 400)])
+def test_invalid_requests(query: str, status: int, url: str):
+    code, body = _get(f"{url}/predict?{query}")
+    assert code == status
+    assert "error" in body
+
+
+def test_client(url: str, sample: tuple, capsys):
+    host, port = url.removeprefix("http://").split(":")
+    game_id = sample[0][0].game_id
+    client.main(Namespace(game=game_id, round=4, engine="batch", host=host, port=int(port)))
+    assert json.loads(capsys.readouterr().out) == json.loads(json.dumps(_expected(game_id, 4)))
+    with pytest.raises(SystemExit):
+        client.main(Namespace(game=10 ** 6, round=-1, engine="batch", host=host, port=int(port)))
+    assert "No game with ID" in capsys.readouterr().out
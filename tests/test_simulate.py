@@ -0,0 +1,43 @@
+"""
+Simulated games, and where `simulate` saves them.
+"""
+
+from __future__ import annotations
+from argparse import Namespace
+
+import data.repository as re
+import os
+import prediction.simulate as simulate
+
+
+def _args(**kwargs) -> Namespace:
+    return Namespace(**{"games": 3, "seed": 1, "players": [5, 7], "workers": 1, "replace_data": False, **kwargs})
+
+
+def _fields(games: list) -> list[list[dict]]:
+    return [[vars(o) for o in [g, *players, *leg_sessions, *pres_actions]] for (g, players, leg_sessions, pres_actions) in games]
+
+
+def test_games_only_depend_on_the_seed():
+    games = simulate.simulate_games(1, 5, 1, [5, 10])
+    assert _fields(games) == _fields(simulate.simulate_games(1, 5, 1, [5, 10]))
+    assert _fields(games) != _fields(simulate.simulate_games(1, 5, 2, [5, 10]))
+    for (g, players, leg_sessions, _) in games:
+        assert len(players) in [5, 10]
+        assert leg_sessions and all(ls.game_id == g.game_id for ls in leg_sessions)
+
+
+def test_output_folder_leaves_the_data_alone(folder: str, sample: tuple, tmp_path):
+    re.save_all(*sample)
+    output = str(tmp_path / "simulated")
+    simulate.main(_args(output=output))
+    assert re.count_games() == len(sample[0])
+    with re.use_folder(output):
+        assert [g.game_id for g in re.get_all_games()] == [1, 2, 3]
+
+
+def test_replace_data(folder: str, sample: tuple):
+    re.save_all(*sample)
+    simulate.main(_args(output=None, replace_data=True))
+    assert [g.game_id for g in re.get_all_games()] == [1, 2, 3]
+    assert sorted(os.listdir(folder)) == sorted([*re.TABLE_FILES.values(), "snapshot"])
@@ -0,0 +1,77 @@
+"""
+Loading the CSV tables from their snapshots.
+"""
+
+from __future__ import annotations
+
+import data.repository as re
+import data.snapshot as snapshot
+import os
+
+from helpers import expected, load_all, rows
+
+
+def _fail_to_parse(*args):
+    raise AssertionError("The CSV file was parsed.")
+
+
+def test_snapshot_round_trip(folder: str, sample: tuple, monkeypatch):
+    with re.use_backend("csv"):
+        re.save_all(*sample)
+        # The first read parses the CSV files and saves the snapshots, which the next one loads
+        assert load_all() == expected(sample)
+        assert not any(f.endswith(".tmp") for f in os.listdir(f"{folder}/snapshot"))
+        re.clear_cache()
+        with monkeypatch.context() as m:
+            # The tables can only come from their snapshots
+            m.setattr(re, "_parse_csv", _fail_to_parse)
+            assert load_all() == expected(sample)
+            games, players, _, _ = sample
+            assert rows(re.get_players_in_game(games[5].game_id)) == rows(p for p in players if p.game_id == games[5].game_id)
+            name = players[-1].name
+            assert rows(re.get_players_by_name(name)) == rows(p for p in players if p.name == name)
+            assert re.get_players_by_name("Nobody") == []
+
+
+def test_get_all_returns_the_same_list(folder: str, sample: tuple):
+    with re.use_backend("csv"):
+        re.save_all(*sample)
+        re.get_all_players()
+        re.clear_cache()
+        players = re.get_all_players()
+        assert type(players) is list
+        assert re.get_all_players() is players
+        # The per-game queries return the objects which were already decoded
+        game_id = sample[0][0].game_id
+        assert all(any(p is q for q in players) for p in re.get_players_in_game(game_id))
+
+
+def test_lookups_only_decode_the_rows_they_need(folder: str, sample: tuple, monkeypatch):
+    games, players, _, _ = sample
+    with re.use_backend("csv"):
+        re.save_all(*sample)
+        re.get_all_games()
+        re.get_all_players()
+        re.clear_cache()
+        decoded = []
+        decode_rows = snapshot._decode_rows
+        def count_rows(matrix, table, strings):
+            decoded.append(len(matrix))
+            return decode_rows(matrix, table, strings)
+        monkeypatch.setattr(snapshot, "_decode_rows", count_rows)
+        assert vars(re.get_game_by_id(games[3].game_id)) == vars(games[3])
+        assert rows(re.get_players_in_game(games[3].game_id)) == rows(p for p in players if p.game_id == games[3].game_id)
+        assert sum(decoded) == 1 + sum(p.game_id == games[3].game_id for p in players)
+
+
+def test_rows_appended_after_loading_a_snapshot(folder: str, sample: tuple):
+    games = sample[0]
+    with re.use_backend("csv"):
+        re.save_all(games[:-1], [], [], [])
+        re.get_all_games()
+        re.clear_cache()
+        assert len(re.get_all_games()) == len(games) - 1
+        appends = re.cache_stats()["appends"]
+        re.save_game(games[-1])
+        assert rows(re.get_all_games()) == rows(games)
+        assert re.cache_stats()["appends"] == appends + 1
@@ -0,0 +1,138 @@
+"""
+Importing the example spreadsheet, in full, incrementally and from several worksheets.
+"""
+
+from __future__ import annotations
+from data.models import Game, WinReason
+from openpyxl import Workbook
+
+import config
+import data.repository as re
+import data.sync as sync
+import os
+import pytest
+
+from helpers import rows
+
+
+@pytest.fixture(scope="module")
+def game_data() -> list[sync.GameData]:
+    """
+    Returns what was parsed from each game of the example spreadsheet.
+    """
+    return list(sync._validate(sync._parse_rows(sync._read_spreadsheet(config.WORKBOOK_NAME))))
+
+
+def _stored(game_data: list[sync.GameData]) -> list[list[dict]]:
+    """
+    Returns the fields of the objects of each table, sorted by game, as they would be stored by a full import of the games.
+    """
+    return [sorted(rows(obj for g in game_data for obj in g[i]), key=lambda r: r["game_id"]) for i in range(len(sync.GameData._fields))]
+
+
+def _load_sorted() -> list[list[dict]]:
+    return [sorted(rows(objects), key=lambda r: r["game_id"]) for objects in [re.get_all_games(), re.get_all_players(), re.get_all_leg_sessions(), re.get_all_pres_actions()]]
+
+
+@pytest.mark.parametrize("backend", re.BACKENDS)
+def test_incremental_import_saves_only_changed_games(backend: str, folder: str, game_data: list):
+    with re.use_backend(backend):
+        sync.import_all(game_data)
+        old_hashes = sync._load_manifest()
+        assert old_hashes is not None and len(old_hashes) == len(game_data)
+        changed, deleted, unchanged = game_data[1], game_data[2], game_data[3:]
+        g = changed.games[0]
+        changed = sync.GameData([Game(g.game_id, g.date, g.winning_team, WinReason.CONCEDE)], changed.players, changed.leg_sessions, changed.pres_actions)
+        new = sync.GameData([Game(10 ** 6, g.date, g.winning_team, g.win_reason)], [], [], [])
+        new_data = [game_data[0], changed, *unchanged, new]
+        report = sync.import_incremental(new_data, old_hashes)
+        assert (report.inserted, report.replaced, report.deleted, report.unchanged) == ([10 ** 6], [g.game_id], [deleted.games[0].game_id], len(game_data) - 2)
+        assert _load_sorted() == _stored(new_data)
+        # The manifest is up to date, so importing the same games again changes nothing
+        report = sync.import_incremental(new_data, sync._load_manifest())
+        assert (report.inserted, report.replaced, report.deleted) == ([], [], [])
+
+
+def test_manifest_is_ignored_after_other_changes(folder: str, game_data: list):
+    sync.import_all(game_data)
+    assert sync._load_manifest() is not None
+    assert not [f for f in os.listdir(folder) if f.endswith(".tmp")]
+    # Another command saves a game
+    stat = os.stat(config.GAME_FILE_PATH)
+    re.save_game(game_data[0].games[0])
+    os.utime(config.GAME_FILE_PATH, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert sync._load_manifest() is None
+
+
+@pytest.mark.parametrize("backend", re.BACKENDS)
+def test_replace_games(backend: str, folder: str, sample: tuple):
+    games, players, leg_sessions, pres_actions = sample
+    replaced = games[1].game_id
+    new_game = Game(replaced, games[1].date, games[1].winning_team, WinReason.CONCEDE)
+    added = Game(10 ** 6, games[0].date, games[0].winning_team, games[0].win_reason)
+    with re.use_backend(backend):
+        re.save_all(*sample)
+        re.replace_games([replaced, added.game_id], [new_game, added], [], [], [])
+        expected = [vars(new_game) if g.game_id == replaced else vars(g) for g in games] + [vars(added)]
+        assert sorted(rows(re.get_all_games()), key=lambda g: g["game_id"]) == sorted(expected, key=lambda g: g["game_id"])
+        assert re.get_players_in_game(replaced) == []
+        assert rows(re.get_players_in_game(games[0].game_id)) == rows(p for p in players if p.game_id == games[0].game_id)
+
+
+# ------------------------------------------------------------------------------
+# Several worksheets
+# ------------------------------------------------------------------------------
+def _game_blocks() -> list[list[tuple]]:
+    """
+    Splits the rows of the example spreadsheet into one block per game, each starting with the date of the game and the header.
+    """
+    blocks = []
+    date_row = None
+    for row in sync._read_spreadsheet(config.WORKBOOK_NAME):
+        if sync._is_date_row(row):
+            date_row = row
+        elif sync._is_header_row(row):
+            blocks.append([date_row, row])
+        elif blocks and not sync._is_empty(row):
+            blocks[-1].append(row)
+    return blocks
+
+
+def _write_workbook(file: str, sheets: dict[str, list[tuple]]) -> None:
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for (sheet, rows) in sheets.items():
+        worksheet = workbook.create_sheet(sheet)
+        for row in rows:
+            worksheet.append(list(row))
+    workbook.save(file)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_worksheets_are_merged_by_game_id(tmp_path, game_data: list, workers: int):
+    blocks = _game_blocks()
+    assert len(blocks) == len(game_data)
+    # Every other game goes to the second workbook, whose games are split between two worksheets
+    first, second = blocks[::2], blocks[1::2]
+    _write_workbook(f"{tmp_path}/a.xlsx", {config.WORKSHEET_NAME: [r for b in first for r in b]})
+    _write_workbook(f"{tmp_path}/b.xlsx", {config.WORKSHEET_NAME: [r for b in second[:2] for r in b], "More": [r for b in second[2:] for r in b]})
+    sources = sync._find_sources([f"{tmp_path}/*.xlsx"], [config.WORKSHEET_NAME, "More"])
+    assert sources == [(f"{tmp_path}/a.xlsx", config.WORKSHEET_NAME), (f"{tmp_path}/a.xlsx", "More"), (f"{tmp_path}/b.xlsx", config.WORKSHEET_NAME), (f"{tmp_path}/b.xlsx", "More")]
+    # The first workbook has no second worksheet
+    with pytest.raises(KeyError):
+        list(sync._read_sources(sources, workers))
+    sources = [sources[0], *sources[2:]]
+    merged = list(sync._read_sources(sources, workers))
+    assert [g.games[0].game_id for g in merged] == sorted(g.games[0].game_id for g in game_data)
+    assert _stored(merged) == _stored(game_data)
+
+
+def test_duplicate_game_ids_in_worksheets_are_rejected(tmp_path):
+    blocks = _game_blocks()
+    _write_workbook(f"{tmp_path}/a.xlsx", {config.WORKSHEET_NAME: [r for b in blocks[:3] for r in b]})
+    _write_workbook(f"{tmp_path}/b.xlsx", {config.WORKSHEET_NAME: [r for b in blocks[2:4] for r in b]})
+    sources = sync._find_sources([f"{tmp_path}/a.xlsx", f"{tmp_path}/b.xlsx"], [config.WORKSHEET_NAME])
+    with pytest.raises(ValueError, match=f"Game {blocks[2][2][0]} is in both"):
+        list(sync._read_sources(sources, 1))
+    with pytest.raises(ValueError):
+        sync._find_sources([f"{tmp_path}/*.csv"], [config.WORKSHEET_NAME])